@@ -0,0 +1,185 @@
+"""
+Admission control by request class.
+
+Requests are sorted into three classes, each with its own concurrency
+budget and wait queue:
+
+- ingest: sensor readings (POST /api/bins/data)
+- bulk: exports, fleet-wide analytics, provisioning and backfill uploads
+- interactive: every other API call, mostly dashboard reads
+
+A request waits in its class queue while the budget is in use. When the
+queue is full, or the wait exceeds admission_queue_timeout_seconds, it is
+answered 503 with a Retry-After header. Bulk has no queue by default, so
+extra bulk work is shed at once instead of piling up. The class also sets
+the database priority of the request (see database.priority), so ingest
+statements go first and bulk reads use their own connection. Background
+jobs run at bulk priority too. However much read traffic arrives, ingest
+only competes with other ingest.
+"""
+
+import asyncio
+import json
+import re
+import time
+
+from config import settings
+from database import Priority, current_priority
+from monitoring import ADMISSION_IN_FLIGHT, ADMISSION_WAIT_SECONDS, ADMISSION_REJECTED
+
+_BULK_PATTERNS = [
+    (None, re.compile(r"^/api/export/")),
+    ("GET", re.compile(r"^/api/analytics/(trends|aggregate|consumption)$")),
+    ("POST", re.compile(r"^/api/bins/provision(/upload)?$")),
+    ("POST", re.compile(r"^/api/bins/backfill$"))
+]
+
+_INGEST_ROUTES = {("POST", "/api/bins/data")}
+
+
+def classify(method: str, path: str) -> Priority | None:
+    """Request class of an HTTP request, or None when it bypasses admission"""
+    if method == "OPTIONS" or not path.startswith("/api/"):
+        # Health checks, metrics, docs and CORS preflights are never queued
+        return None
+    path = path.rstrip("/")
+    if (method, path) in _INGEST_ROUTES:
+        return Priority.INGEST
+    for bulk_method, pattern in _BULK_PATTERNS:
+        if (bulk_method is None or bulk_method == method) and pattern.match(path):
+            return Priority.BULK
+    return Priority.INTERACTIVE
+
+
+class ClassBudget:
+    """Concurrency limit and bounded FIFO wait queue for one request class"""
+    
+    def __init__(self, name: str, concurrency: int, queue_limit: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_limit = queue_limit
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+    
+    async def acquire(self, timeout: float) -> bool:
+        """Take a slot, waiting in the queue if needed; False when the request is shed"""
+        if self._semaphore.locked():
+            if self.waiting >= self.queue_limit:
+                ADMISSION_REJECTED.inc(1, self.name, "full")
+                return False
+            
+            self.waiting += 1
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout)
+            except asyncio.TimeoutError:
+                ADMISSION_REJECTED.inc(1, self.name, "timeout")
+                return False
+            finally:
+                self.waiting -= 1
+            ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start, self.name)
+        else:
+            await self._semaphore.acquire()
+        
+        self.in_flight += 1
+        ADMISSION_IN_FLIGHT.set(self.in_flight, self.name)
+        return True
+    
+    def release(self) -> None:
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.set(self.in_flight, self.name)
+        self._semaphore.release()
+    
+    def status(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting
+        }
+
+
+class AdmissionController:
+    """Per-class budgets for ingest, interactive and bulk requests"""
+    
+    def __init__(self):
+        self.budgets = {
+            Priority.INGEST: ClassBudget(
+                "ingest", settings.admission_ingest_concurrency, settings.admission_ingest_queue
+            ),
+            Priority.INTERACTIVE: ClassBudget(
+                "interactive", settings.admission_interactive_concurrency, settings.admission_interactive_queue
+            ),
+            Priority.BULK: ClassBudget(
+                "bulk", settings.admission_bulk_concurrency, settings.admission_bulk_queue
+            )
+        }
+    
+    async def acquire(self, request_class: Priority) -> bool:
+        return await self.budgets[request_class].acquire(settings.admission_queue_timeout_seconds)
+    
+    def release(self, request_class: Priority) -> None:
+        self.budgets[request_class].release()
+    
+    def status(self) -> dict:
+        """Current load of every class budget"""
+        return {budget.name: budget.status() for budget in self.budgets.values()}
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware admitting each HTTP request against its class budget.
+    
+    Added before CORSMiddleware so it runs inside it and shed responses
+    still carry CORS headers the browser can read.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        request_class = classify(scope["method"], scope["path"])
+        if request_class is None:
+            await self.app(scope, receive, send)
+            return
+        
+        token = current_priority.set(request_class)
+        try:
+            if not settings.admission_enabled:
+                await self.app(scope, receive, send)
+                return
+            
+            if not await admission.acquire(request_class):
+                await _send_busy(send, request_class)
+                return
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                admission.release(request_class)
+        finally:
+            current_priority.reset(token)
+
+
+async def _send_busy(send, request_class: Priority) -> None:
+    body = json.dumps({
+        "detail": f"Server is at capacity for {request_class.name.lower()} requests; retry later"
+    }).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(settings.admission_retry_after_seconds).encode())
+        ]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+# Singleton instance
+admission = AdmissionController()
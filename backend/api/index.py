@@ -2,6 +2,7 @@
 Vercel Serverless Function Entry Point for FastAPI
 """
 
+import os
 import sys
 from pathlib import Path
 
@@ -9,6 +10,10 @@ from pathlib import Path
 backend_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_dir))
 
+# Serverless mode must be set before settings are loaded: the lifespan never
+# runs here, so the database is initialized lazily on the first request
+os.environ.setdefault("SERVERLESS", "true")
+
 # Import the FastAPI app
 from main import app
 
@@ -0,0 +1 @@
+"""Performance benchmarks for the inventory dashboard backend"""
@@ -0,0 +1,112 @@
+"""
+Cold-start benchmark for the serverless entry point.
+
+Each run spawns a fresh interpreter (a new "container"), imports
+``api/index.py`` and sends a first request through the Mangum handler,
+reporting import time, first-request latency (including lazy database
+initialization) and which heavy modules were loaded along the way.
+
+Usage (from the backend directory):
+    python -m benchmarks.cold_start --runs 5 --path /api/bins/summary
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Modules that should not be imported until a route actually needs them
+HEAVY_MODULES = ("openpyxl", "httpx")
+
+# Executed inside the child interpreter; prints a single JSON line
+_CHILD_SCRIPT = r"""
+import json, os, sys, time
+t0 = time.perf_counter()
+from api.index import handler
+t1 = time.perf_counter()
+event = {
+    "version": "2.0",
+    "routeKey": "$default",
+    "rawPath": PATH,
+    "rawQueryString": "",
+    "headers": {"host": "localhost", "accept": "application/json"},
+    "requestContext": {
+        "http": {"method": "GET", "path": PATH, "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1"},
+        "stage": "$default",
+    },
+    "isBase64Encoded": False,
+}
+response = handler(event, None)
+t2 = time.perf_counter()
+response = handler(event, None)
+t3 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "first_request_ms": (t2 - t1) * 1000,
+    "warm_request_ms": (t3 - t2) * 1000,
+    "status_code": response["statusCode"],
+    "heavy_modules_loaded": [m for m in HEAVY if m in sys.modules],
+}), flush=True)
+# The lazily opened SQLite worker thread is never closed in serverless mode
+os._exit(0)
+"""
+
+
+def run_once(path: str, db_dir: str) -> dict:
+    """Run a single cold start in a fresh interpreter"""
+    env = dict(os.environ)
+    env["DATABASE_URL"] = os.path.join(db_dir, f"cold_start_{os.getpid()}.db")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    
+    script = f"PATH = {path!r}\nHEAVY = {HEAVY_MODULES!r}\n" + _CHILD_SCRIPT
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples: list[dict]) -> dict:
+    """Aggregate per-run samples into medians"""
+    return {
+        "runs": len(samples),
+        "import_ms_median": round(statistics.median(s["import_ms"] for s in samples), 2),
+        "first_request_ms_median": round(statistics.median(s["first_request_ms"] for s in samples), 2),
+        "warm_request_ms_median": round(statistics.median(s["warm_request_ms"] for s in samples), 2),
+        "status_codes": sorted({s["status_code"] for s in samples}),
+        "heavy_modules_loaded": sorted({m for s in samples for m in s["heavy_modules_loaded"]}),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure serverless cold-start cost")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters to start")
+    parser.add_argument("--path", default="/api/bins/summary", help="Route used for the first request")
+    parser.add_argument("--output", help="Write the summary as JSON to this file")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as db_dir:
+        samples = []
+        for _ in range(args.runs):
+            # First run in each directory creates the DB; later runs reuse it like a warm volume
+            samples.append(run_once(args.path, db_dir))
+    
+    summary = summarize(samples)
+    print(json.dumps(summary, indent=2))
+    
+    if args.output:
+        Path(args.output).write_text(json.dumps({"summary": summary, "samples": samples}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
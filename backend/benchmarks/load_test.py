@@ -0,0 +1,369 @@
+"""
+Load test simulating a sensor fleet and dashboard clients.
+
+Starts the app with uvicorn on a local port in a background thread of
+this process, against a throwaway database. It provisions N bins, then:
+
+- posts readings to ``POST /api/bins/data`` at a fixed total rate
+  (open loop, so a slow server shows up as latency rather than a lower
+  send rate), with weight curves that drain, refill and jitter like
+  real bins;
+- connects M WebSocket dashboard clients that receive broadcasts and
+  poll the dashboard REST endpoints.
+
+Reports ingest throughput and latency percentiles, REST latency per
+endpoint, sensor-to-WebSocket delivery delay and the server's event loop
+lag, so runs before and after a change can be compared.
+
+Usage (from the backend directory):
+    python -m benchmarks.load_test --bins 200 --rate 200 --duration 30 --ws-clients 10
+    python -m benchmarks.load_test --rate 500 --output results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Endpoints a dashboard client polls, in rotation
+POLLED_ENDPOINTS = ("/api/bins", "/api/bins/summary", "/api/alerts/active", "/api/analytics/status-distribution")
+
+
+def percentiles(values: list[float]) -> dict:
+    """p50/p95/p99/max in milliseconds for a list of seconds"""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+    
+    return {
+        "count": len(ordered),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 2)
+    }
+
+
+class SimulatedBin:
+    """Sensor with a sawtooth stock curve: steady picks, occasional refills, scale noise"""
+    
+    ARTICLE_WEIGHT = 2.5
+    
+    def __init__(self, bin_id: str, row: int, position: int, capacity: int, rng: random.Random):
+        self.bin_id = bin_id
+        self.row = row
+        self.position = position
+        self.capacity = capacity
+        self.quantity = rng.randint(capacity // 4, capacity)
+        self.rng = rng
+    
+    def next_reading(self) -> dict:
+        if self.quantity <= 0 or self.rng.random() < 0.01:
+            self.quantity = self.capacity
+        else:
+            self.quantity = max(0, self.quantity - self.rng.choice((0, 0, 1, 1, 2, 5)))
+        weight = max(0.0, self.quantity * self.ARTICLE_WEIGHT + self.rng.gauss(0, 0.4))
+        return {
+            "bin_id": self.bin_id,
+            "row": self.row,
+            "position": self.position,
+            "weight_grams": round(weight, 2),
+            "article_weight_grams": self.ARTICLE_WEIGHT,
+            "calculated_quantity": round(weight / self.ARTICLE_WEIGHT),
+            "timestamp": datetime.now().isoformat()
+        }
+
+
+def build_fleet(count: int, seed: int) -> list[SimulatedBin]:
+    rng = random.Random(seed)
+    per_row = 10
+    return [
+        SimulatedBin(f"BIN-R{i // per_row + 1}P{i % per_row + 1}", i // per_row + 1, i % per_row + 1,
+                     rng.choice((50, 100, 200)), rng)
+        for i in range(count)
+    ]
+
+
+class ServerThread:
+    """Runs the FastAPI app under uvicorn on its own event loop thread"""
+    
+    def __init__(self, app, port: int):
+        import uvicorn
+        
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, name="load-test-server", daemon=True)
+    
+    def __enter__(self) -> "ServerThread":
+        self.thread.start()
+        deadline = time.monotonic() + 30
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.thread.is_alive():
+                raise RuntimeError("Server did not start")
+            time.sleep(0.05)
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+class LoadTest:
+    """Drives sensors and dashboard clients against a running server"""
+    
+    def __init__(self, base_url: str, fleet: list[SimulatedBin], rate: float, duration: float,
+                 ws_clients: int, poll_interval: float, max_in_flight: int, ingest_messages: dict[str, str]):
+        self.base_url = base_url
+        self.ws_url = base_url.replace("http://", "ws://") + "/ws"
+        self.fleet = fleet
+        self.rate = rate
+        self.duration = duration
+        self.ws_clients = ws_clients
+        self.poll_interval = poll_interval
+        self.max_in_flight = max_in_flight
+        # Ingest responses name their outcome only through the message
+        self.outcomes_by_message = {message: outcome for outcome, message in ingest_messages.items()}
+        
+        self.sent_at: dict[tuple[str, str], float] = {}
+        self.ingest_latencies: list[float] = []
+        self.ingest_outcomes: dict[str, int] = {}
+        self.ingest_errors: dict[str, int] = {}
+        self.ingest_skipped = 0
+        self.rest_latencies: dict[str, list[float]] = {path: [] for path in POLLED_ENDPOINTS}
+        self.rest_errors = 0
+        self.delivery_delays: list[float] = []
+        self.deliveries = 0
+        self.ws_connected = 0
+        self._in_flight = 0
+        self._stop = asyncio.Event()
+    
+    async def provision(self, client) -> None:
+        layout = [
+            {"bin_id": b.bin_id, "row": b.row, "position": b.position, "article_type": "part",
+             "article_name": f"Part {b.bin_id}", "article_weight_grams": SimulatedBin.ARTICLE_WEIGHT,
+             "min_threshold": b.capacity // 5, "critical_threshold": b.capacity // 10,
+             "max_capacity": b.capacity}
+            for b in self.fleet
+        ]
+        response = await client.post("/api/bins/provision", json={"bins": layout}, timeout=120)
+        response.raise_for_status()
+    
+    async def _post_reading(self, client, sim: SimulatedBin) -> None:
+        payload = sim.next_reading()
+        started = time.perf_counter()
+        self.sent_at[(payload["bin_id"], payload["timestamp"])] = started
+        try:
+            response = await client.post("/api/bins/data", json=payload)
+            if response.status_code == 200:
+                self.ingest_latencies.append(time.perf_counter() - started)
+                outcome = self.outcomes_by_message.get(response.json().get("message"), "unknown")
+                self.ingest_outcomes[outcome] = self.ingest_outcomes.get(outcome, 0) + 1
+            else:
+                key = str(response.status_code)
+                self.ingest_errors[key] = self.ingest_errors.get(key, 0) + 1
+        except Exception as e:
+            key = type(e).__name__
+            self.ingest_errors[key] = self.ingest_errors.get(key, 0) + 1
+        finally:
+            self._in_flight -= 1
+    
+    async def sensors(self, client) -> None:
+        """Open-loop sender: one reading every 1/rate seconds, round-robin over bins"""
+        interval = 1 / self.rate
+        tasks = set()
+        start = time.perf_counter()
+        sequence = 0
+        
+        while not self._stop.is_set():
+            due = start + sequence * interval
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            
+            if self._in_flight >= self.max_in_flight:
+                self.ingest_skipped += 1
+            else:
+                self._in_flight += 1
+                task = asyncio.create_task(self._post_reading(client, self.fleet[sequence % len(self.fleet)]))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            sequence += 1
+        
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def dashboard(self, client, index: int) -> None:
+        """One dashboard: a WebSocket subscriber that also polls REST endpoints"""
+        import websockets
+        
+        async with websockets.connect(self.ws_url, max_size=None) as ws:
+            self.ws_connected += 1
+            poller = asyncio.create_task(self._poll(client, index))
+            try:
+                while not self._stop.is_set():
+                    try:
+                        raw = await asyncio.wait_for(ws.recv(), timeout=0.5)
+                    except asyncio.TimeoutError:
+                        continue
+                    received = time.perf_counter()
+                    message = json.loads(raw)
+                    if message.get("type") != "bin_update":
+                        continue
+                    payload = message["payload"]
+                    sent = self.sent_at.get((payload["bin_id"], payload["last_updated"]))
+                    if sent is not None:
+                        self.deliveries += 1
+                        self.delivery_delays.append(received - sent)
+            finally:
+                poller.cancel()
+                await asyncio.gather(poller, return_exceptions=True)
+    
+    async def _poll(self, client, index: int) -> None:
+        # Stagger clients so polls don't arrive in bursts
+        await asyncio.sleep(self.poll_interval * index / max(1, self.ws_clients))
+        turn = index
+        while not self._stop.is_set():
+            path = POLLED_ENDPOINTS[turn % len(POLLED_ENDPOINTS)]
+            turn += 1
+            started = time.perf_counter()
+            try:
+                response = await client.get(path)
+                if response.status_code == 200:
+                    self.rest_latencies[path].append(time.perf_counter() - started)
+                else:
+                    self.rest_errors += 1
+            except Exception:
+                self.rest_errors += 1
+            await asyncio.sleep(self.poll_interval)
+    
+    async def run(self) -> dict:
+        import httpx
+        
+        limits = httpx.Limits(max_connections=self.max_in_flight + self.ws_clients + 10)
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=30) as client:
+            await self.provision(client)
+            
+            dashboards = [asyncio.create_task(self.dashboard(client, i)) for i in range(self.ws_clients)]
+            # Let the dashboards connect before sensors start
+            await asyncio.sleep(0.5)
+            
+            started = time.perf_counter()
+            sensors = asyncio.create_task(self.sensors(client))
+            await asyncio.sleep(self.duration)
+            self._stop.set()
+            await sensors
+            elapsed = time.perf_counter() - started
+            await asyncio.gather(*dashboards, return_exceptions=True)
+            
+            loop_health = (await client.get("/api/admin/loop")).json().get("data", {})
+        
+        processed = len(self.ingest_latencies)
+        # Readings that moved their bin's snapshot, and so were broadcast
+        applied = self.ingest_outcomes.get("accepted", 0) + self.ingest_outcomes.get("flagged", 0)
+        return {
+            "config": {
+                "bins": len(self.fleet),
+                "target_rate": self.rate,
+                "duration_s": self.duration,
+                "ws_clients": self.ws_clients,
+                "poll_interval_s": self.poll_interval
+            },
+            "ingest": {
+                "sent": len(self.sent_at),
+                "processed": processed,
+                "outcomes": self.ingest_outcomes,
+                "errors": self.ingest_errors,
+                "skipped_backpressure": self.ingest_skipped,
+                "throughput_rps": round(processed / elapsed, 1),
+                "latency": percentiles(self.ingest_latencies)
+            },
+            "rest": {path: percentiles(values) for path, values in self.rest_latencies.items()},
+            "rest_errors": self.rest_errors,
+            "websocket": {
+                "connected": self.ws_connected,
+                "deliveries": self.deliveries,
+                "expected_deliveries": applied * self.ws_connected,
+                "sensor_to_client": percentiles(self.delivery_delays)
+            },
+            "server_loop_lag": loop_health.get("lag")
+        }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _print_report(result: dict) -> None:
+    ingest = result["ingest"]
+    ws = result["websocket"]
+    
+    def fmt(p: dict) -> str:
+        if not p.get("count"):
+            return "no samples"
+        return f"p50 {p['p50_ms']}ms  p95 {p['p95_ms']}ms  p99 {p['p99_ms']}ms  max {p['max_ms']}ms  (n={p['count']})"
+    
+    print(f"\nIngest: {ingest['processed']}/{ingest['sent']} processed, "
+          f"{ingest['throughput_rps']} readings/s (target {result['config']['target_rate']})")
+    print(f"  outcomes  {ingest['outcomes']}")
+    if ingest["errors"] or ingest["skipped_backpressure"]:
+        print(f"  errors {ingest['errors']}, skipped (too many in flight) {ingest['skipped_backpressure']}")
+    print(f"  latency   {fmt(ingest['latency'])}")
+    print("\nDashboard REST:")
+    for path, stats in result["rest"].items():
+        print(f"  {path:<38} {fmt(stats)}")
+    print(f"\nWebSocket: {ws['connected']} clients, {ws['deliveries']}/{ws['expected_deliveries']} updates delivered")
+    print(f"  sensor -> client {fmt(ws['sensor_to_client'])}")
+    if result["server_loop_lag"]:
+        lag = result["server_loop_lag"]
+        print(f"\nServer loop lag: p50 {lag['p50_ms']}ms  p99 {lag['p99_ms']}ms  max {lag['max_ms']}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test with simulated sensors and dashboards")
+    parser.add_argument("--bins", type=int, default=200, help="Number of simulated bins")
+    parser.add_argument("--rate", type=float, default=100, help="Total sensor readings per second")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of sensor traffic")
+    parser.add_argument("--ws-clients", type=int, default=10, help="WebSocket dashboard clients")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between REST polls per client")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Cap on outstanding sensor requests")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # Configure the app before it is imported: fresh database, no background jobs
+        os.environ["DATABASE_URL"] = os.path.join(tmp, "load_test.db")
+        os.environ["SCHEDULER_ENABLED"] = "false"
+        os.environ.setdefault("LOG_LEVEL", "ERROR")
+        sys.path.insert(0, str(BACKEND_DIR))
+        from main import app
+        from routers.bins import INGEST_MESSAGES
+        
+        port = _free_port()
+        fleet = build_fleet(args.bins, args.seed)
+        test = LoadTest(f"http://127.0.0.1:{port}", fleet, args.rate, args.duration,
+                        args.ws_clients, args.poll_interval, args.max_in_flight, INGEST_MESSAGES)
+        
+        with ServerThread(app, port):
+            result = asyncio.run(test.run())
+    
+    _print_report(result)
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
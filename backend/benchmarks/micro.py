@@ -0,0 +1,383 @@
+"""
+Microbenchmarks for service methods and the SQLite adapter.
+
+Each benchmark runs against a throwaway database at fixed sizes: 10, 1k
+and 10k bins with 50 readings per bin over the last 30 days, plus one hot
+bin with 100, 1k or 10k readings for the per-bin history benchmarks.
+Results are written as JSON. ``compare`` checks a run against a stored
+baseline and exits non-zero when any benchmark's median slowed down by
+more than the threshold.
+
+Usage (from the backend directory):
+    python -m benchmarks.micro run --save-baseline main
+    python -m benchmarks.micro run --sizes 10,1000 --filter inventory --output current.json
+    python -m benchmarks.micro compare main current.json --threshold 15
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+BIN_COUNTS = (10, 1_000, 10_000)
+READINGS_PER_BIN = 50
+HOT_BIN_HISTORY = (100, 1_000, 10_000)
+HOT_BIN = "BIN-R1P1"
+
+# History reads cover the hot bin's whole 29-day span, downsampled to a chart's width
+HISTORY_START, HISTORY_END = "2000-01-01", "2100-01-01"
+CHART_MAX_POINTS = 500
+
+
+@dataclass
+class Benchmark:
+    """A named async call measured at one dataset size"""
+    name: str
+    call: Callable[[], Awaitable]
+    sync: bool = False
+
+
+def measure(
+    loop: asyncio.AbstractEventLoop,
+    func: Callable,
+    is_async: bool,
+    min_time: float,
+    min_rounds: int,
+    max_rounds: int
+) -> dict:
+    """Time repeated calls until both min_rounds and min_time are reached"""
+    
+    def once() -> float:
+        started = time.perf_counter()
+        if is_async:
+            loop.run_until_complete(func())
+        else:
+            func()
+        return time.perf_counter() - started
+    
+    once()  # Warm caches and lazy imports
+    timings: list[float] = []
+    budget_end = time.perf_counter() + min_time
+    while len(timings) < max_rounds and (len(timings) < min_rounds or time.perf_counter() < budget_end):
+        timings.append(once())
+    
+    return {
+        "rounds": len(timings),
+        "min_ms": round(min(timings) * 1000, 4),
+        "median_ms": round(statistics.median(timings) * 1000, 4),
+        "mean_ms": round(statistics.fmean(timings) * 1000, 4),
+        "stdev_ms": round(statistics.stdev(timings) * 1000, 4) if len(timings) > 1 else 0.0
+    }
+
+
+async def populate(db, bins: int, seed: int = 1) -> None:
+    """Provision bins and fill snapshots and history for one dataset size"""
+    from database import run_migrations, rebuild_inventory_summary
+    from services import provisioning_service
+    
+    rng = random.Random(seed)
+    await run_migrations(db)
+    
+    per_row = 100
+    layout = [
+        {
+            "bin_id": f"BIN-R{i // per_row + 1}P{i % per_row + 1}",
+            "row": i // per_row + 1,
+            "position": i % per_row + 1,
+            "article_type": "part",
+            "article_name": f"Part {i}",
+            "article_weight_grams": 2.5,
+            "min_threshold": 10,
+            "critical_threshold": 5,
+            "max_capacity": 100
+        }
+        for i in range(bins)
+    ]
+    await provisioning_service.provision(layout)
+    
+    now = datetime.now()
+    span = timedelta(days=29)
+    snapshots = []
+    history = []
+    for entry in layout:
+        quantity = rng.randint(0, 100)
+        snapshots.append((quantity * 2.5, quantity, now.isoformat(), entry["bin_id"]))
+        for k in range(READINGS_PER_BIN):
+            ts = now - span + span * k / READINGS_PER_BIN
+            q = rng.randint(0, 100)
+            history.append((entry["bin_id"], q * 2.5, q, ts.isoformat()))
+    
+    async with db.transaction():
+        await db.execute_many(
+            """UPDATE current_inventory
+               SET weight_grams = ?, calculated_quantity = ?, last_updated = ?
+               WHERE bin_id = ?""",
+            snapshots
+        )
+        await db.execute_many(
+            "INSERT INTO inventory_data (bin_id, weight_grams, calculated_quantity, timestamp) VALUES (?, ?, ?, ?)",
+            history
+        )
+    await rebuild_inventory_summary(db)
+    await db.execute("ANALYZE")
+
+
+async def set_hot_bin_history(db, readings: int, seed: int = 2) -> None:
+    """Replace the hot bin's history with a fixed number of readings"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    span = timedelta(days=29)
+    async with db.transaction():
+        await db.execute("DELETE FROM inventory_data WHERE bin_id = ?", (HOT_BIN,))
+        quantity = 100
+        rows = []
+        for k in range(readings):
+            quantity = 100 if quantity <= 0 else quantity - rng.choice((0, 1, 2))
+            rows.append((HOT_BIN, quantity * 2.5, quantity, (now - span + span * k / readings).isoformat()))
+        await db.execute_many(
+            "INSERT INTO inventory_data (bin_id, weight_grams, calculated_quantity, timestamp) VALUES (?, ?, ?, ?)",
+            rows
+        )
+
+
+def size_benchmarks(db, bins: int) -> tuple[list[Benchmark], Callable[[], Awaitable]]:
+    """Benchmarks that depend on the number of bins, and a setup coroutine for them"""
+    from models import BinDisplayData, bin_display_from_rows, dump_models
+    from services import inventory_service, alert_service, export_service
+    from services.inventory_service import DISPLAY_DATA_SELECT
+    
+    suffix = f"[bins={bins}]"
+    state: dict = {}
+    
+    async def check_alerts():
+        if "bin" not in state:
+            state["bin"] = await inventory_service.get_bin_display_data(HOT_BIN)
+        await alert_service.check_alerts(state["bin"])
+    
+    def create_excel():
+        return export_service._create_excel(state["rows"], "Current Inventory")
+    
+    async def prepare():
+        # Row mapping runs on already-fetched rows so only model work is timed
+        state["display_rows"] = await db.fetch_all(DISPLAY_DATA_SELECT)
+        bin_display_from_rows(state["display_rows"])
+        inventory = await inventory_service.get_current_inventory()
+        state["inventory"] = inventory
+        state["rows"] = [
+            {"Bin ID": b.bin_id, "Article Name": b.article_name, "Current Quantity": b.current_quantity,
+             "Max Capacity": b.max_capacity, "Fill %": b.fill_percentage, "Status": b.status.value.upper(),
+             "Last Updated": b.last_updated}
+            for b in inventory
+        ]
+    
+    async def execute_many():
+        async with db.transaction():
+            await db.execute_many(
+                "INSERT INTO inventory_data (bin_id, weight_grams, calculated_quantity, timestamp) VALUES (?, ?, ?, ?)",
+                [(HOT_BIN, 25.0, 10, "2000-01-01T00:00:00")] * 100
+            )
+    
+    return [
+        Benchmark(f"inventory.get_current_inventory{suffix}", inventory_service.get_current_inventory),
+        Benchmark(f"inventory.get_inventory_summary{suffix}", inventory_service.get_inventory_summary),
+        Benchmark(f"alerts.check_alerts{suffix}", check_alerts),
+        Benchmark(f"export._create_excel{suffix}", create_excel, sync=True),
+        # One model constructor call per row against one adapter call per result set
+        Benchmark(f"models.construct_each_row{suffix}", lambda: [
+            BinDisplayData(**row) for row in state["display_rows"]
+        ], sync=True),
+        Benchmark(f"models.bin_display_from_rows{suffix}", lambda: bin_display_from_rows(state["display_rows"]), sync=True),
+        Benchmark(f"models.model_dump_each{suffix}", lambda: [b.model_dump() for b in state["inventory"]], sync=True),
+        Benchmark(f"models.dump_models{suffix}", lambda: dump_models(state["inventory"]), sync=True),
+        Benchmark(f"sqlite.fetch_one{suffix}", lambda: db.fetch_one(
+            "SELECT * FROM bin_configurations WHERE bin_id = ?", (HOT_BIN,))),
+        Benchmark(f"sqlite.fetch_all{suffix}", lambda: db.fetch_all(DISPLAY_DATA_SELECT)),
+        Benchmark(f"sqlite.execute{suffix}", lambda: db.execute(
+            "UPDATE current_inventory SET weight_grams = weight_grams WHERE bin_id = ?", (HOT_BIN,))),
+        Benchmark(f"sqlite.execute_many_100{suffix}", execute_many),
+    ], prepare
+
+
+async def _connect(path: str):
+    import database.connection as connection
+    from database import SQLiteAdapter
+    
+    db = SQLiteAdapter(path)
+    await db.connect()
+    connection._db = db
+    return db
+
+
+def run_suite(sizes: tuple[int, ...], histories: tuple[int, ...], name_filter: Optional[str],
+              min_time: float, min_rounds: int) -> dict:
+    import database.connection as connection
+    from services import inventory_service
+    
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    results: dict[str, dict] = {}
+    
+    def record(bench: Benchmark) -> None:
+        if name_filter and name_filter not in bench.name:
+            return
+        stats = measure(loop, bench.call, not bench.sync, min_time, min_rounds, max_rounds=10_000)
+        results[bench.name] = stats
+        print(f"  {bench.name:<58} median {stats['median_ms']:>10.3f} ms  ({stats['rounds']} rounds)")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for bins in sizes:
+            print(f"\nDataset: {bins} bins, {bins * READINGS_PER_BIN} readings")
+            db = loop.run_until_complete(_connect(str(Path(tmp) / f"micro_{bins}.db")))
+            try:
+                loop.run_until_complete(populate(db, bins))
+                benchmarks, prepare = size_benchmarks(db, bins)
+                loop.run_until_complete(prepare())
+                for bench in benchmarks:
+                    record(bench)
+                
+                for readings in histories:
+                    loop.run_until_complete(set_hot_bin_history(db, readings))
+                    record(Benchmark(
+                        f"inventory.get_consumption_rate[bins={bins},history={readings}]",
+                        lambda: inventory_service.get_consumption_rate(HOT_BIN)
+                    ))
+                    for max_points in (None, CHART_MAX_POINTS):
+                        record(Benchmark(
+                            f"inventory.get_historical_data[bins={bins},history={readings},max_points={max_points}]",
+                            lambda max_points=max_points: inventory_service.get_historical_data(
+                                HOT_BIN, HISTORY_START, HISTORY_END, 10_000, max_points
+                            )
+                        ))
+                    record(Benchmark(
+                        f"inventory.get_historical_points[bins={bins},history={readings}]",
+                        lambda: inventory_service.get_historical_points(HOT_BIN, HISTORY_START, HISTORY_END, 10_000)
+                    ))
+            finally:
+                loop.run_until_complete(db.disconnect())
+                connection._db = None
+    
+    loop.close()
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _resolve(path_or_name: str) -> Path:
+    """A baseline name from benchmarks/baselines or a path to a results file"""
+    path = Path(path_or_name)
+    if path.exists():
+        return path
+    return BASELINE_DIR / f"{path_or_name}.json"
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> int:
+    """Print per-benchmark change and return the number of regressions"""
+    regressions = 0
+    base_results = baseline["results"]
+    print(f"{'benchmark':<60} {'baseline':>11} {'current':>11} {'change':>8}")
+    for name, stats in current["results"].items():
+        base = base_results.get(name)
+        if base is None:
+            print(f"{name:<60} {'-':>11} {stats['median_ms']:>9.3f}ms {'new':>8}")
+            continue
+        change = (stats["median_ms"] - base["median_ms"]) / base["median_ms"] * 100 if base["median_ms"] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"{name:<60} {base['median_ms']:>9.3f}ms {stats['median_ms']:>9.3f}ms {change:>+7.1f}%{flag}")
+    for name in base_results.keys() - current["results"].keys():
+        print(f"{name:<60} missing from current run")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Service and adapter microbenchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    
+    run_parser = sub.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument("--sizes", default=",".join(map(str, BIN_COUNTS)), help="Comma-separated bin counts")
+    run_parser.add_argument("--history", default=",".join(map(str, HOT_BIN_HISTORY)),
+                            help="Comma-separated hot-bin history sizes")
+    run_parser.add_argument("--filter", help="Only run benchmarks whose name contains this")
+    run_parser.add_argument("--min-time", type=float, default=0.5, help="Minimum seconds per benchmark")
+    run_parser.add_argument("--min-rounds", type=int, default=5)
+    run_parser.add_argument("--output", help="Write results to this JSON file")
+    run_parser.add_argument("--save-baseline", metavar="NAME", help="Store results as benchmarks/baselines/NAME.json")
+    
+    compare_parser = sub.add_parser("compare", help="Compare a run against a baseline")
+    compare_parser.add_argument("baseline", help="Baseline name or results file")
+    compare_parser.add_argument("current", help="Results file (or baseline name) to check")
+    compare_parser.add_argument("--threshold", type=float, default=10.0,
+                                help="Percent slowdown of the median that counts as a regression")
+    
+    args = parser.parse_args()
+    
+    if args.command == "compare":
+        baseline = json.loads(_resolve(args.baseline).read_text())
+        current = json.loads(_resolve(args.current).read_text())
+        regressions = compare(baseline, current, args.threshold)
+        print(f"\n{regressions} regression(s) above {args.threshold:g}%")
+        sys.exit(1 if regressions else 0)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the app from touching a real database or spending time on logs
+        os.environ["DATABASE_URL"] = os.path.join(tmp, "unused.db")
+        os.environ.setdefault("LOG_LEVEL", "ERROR")
+        os.environ.setdefault("TRACE_SAMPLE_RATE", "0")
+        sys.path.insert(0, str(BACKEND_DIR))
+        import logging
+        logging.basicConfig(level=logging.ERROR)
+        
+        results = run_suite(
+            tuple(int(s) for s in args.sizes.split(",")),
+            tuple(int(s) for s in args.history.split(",")),
+            args.filter,
+            args.min_time,
+            args.min_rounds
+        )
+    
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform()
+        },
+        "results": results
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        path = BASELINE_DIR / f"{args.save_baseline}.json"
+        path.write_text(json.dumps(report, indent=2))
+        print(f"\nBaseline saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,9 @@ class Settings(BaseSettings):
     port: int = 8000
     debug: bool = True
     
+    # Serverless mode: no lifespan, database initialized lazily on first use
+    serverless: bool = False
+    
     # Database
     database_url: str = "./data/inventory.db"
     
@@ -24,11 +27,76 @@ class Settings(BaseSettings):
     # Logging
     log_level: str = "INFO"
     
+    # Observability
+    metrics_enabled: bool = True
+    server_timing_enabled: bool = True
+    trace_sample_rate: float = 0.0
+    trace_export_path: str = "./data/traces.jsonl"
+    loop_monitor_enabled: bool = True
+    loop_monitor_interval_ms: float = 100
+    loop_stall_threshold_ms: float = 100
+    
     # Alert Configuration
     default_low_stock_threshold: int = 10
     default_critical_stock_threshold: int = 5
     alert_cooldown_minutes: int = 30
     
+    # Ingest Deduplication (recently stored reading keys kept in memory)
+    ingest_dedup_window: int = 65536
+    
+    # Streaming Ingest (binary WebSocket frames on /api/bins/stream)
+    ingest_stream_window: int = 8
+    ingest_stream_max_readings: int = 1000
+    
+    # Backfill Uploads (gzip NDJSON or CSV on /api/bins/backfill; rows per transaction)
+    backfill_batch_size: int = 5000
+    
+    # Anomaly Detection (Hampel filter over each bin's recent readings)
+    anomaly_detection_enabled: bool = True
+    anomaly_window: int = 15
+    anomaly_threshold: float = 3.5
+    anomaly_confirm_readings: int = 2
+    
+    # Stockout Forecasting
+    forecast_lookback_days: float = 7
+    forecast_half_life_hours: float = 72
+    forecast_refit_interval_minutes: float = 60
+    
+    # Query Cache (analytics and export results; TTLs in seconds)
+    cache_enabled: bool = True
+    cache_max_entries: int = 256
+    cache_trends_ttl_seconds: float = 30
+    cache_consumption_ttl_seconds: float = 60
+    cache_status_ttl_seconds: float = 5
+    cache_export_ttl_seconds: float = 30
+    
+    # Admission Control (concurrency and queue budgets per request class)
+    admission_enabled: bool = True
+    admission_ingest_concurrency: int = 64
+    admission_ingest_queue: int = 512
+    admission_interactive_concurrency: int = 16
+    admission_interactive_queue: int = 64
+    admission_bulk_concurrency: int = 2
+    admission_bulk_queue: int = 0
+    admission_queue_timeout_seconds: float = 5
+    admission_retry_after_seconds: int = 5
+    # Exports and analytics read on their own connection so they never hold up ingest
+    bulk_read_connection: bool = True
+    
+    # Data Retention (days come from the data_retention_days system setting)
+    retention_batch_size: int = 500
+    retention_batch_pause_ms: int = 50
+    retention_max_batches: int = 200
+    retention_interval_hours: float = 6
+    
+    # Background Maintenance Scheduler
+    scheduler_enabled: bool = True
+    scheduler_jitter_seconds: float = 30
+    wal_checkpoint_interval_minutes: float = 5
+    summary_rebuild_interval_minutes: float = 60
+    optimize_cron: str = "17 * * * *"
+    analyze_cron: str = "43 3 * * 0"
+    
     @property
     def cors_origins_list(self) -> List[str]:
         """Get list of allowed CORS origins from environment variables"""
@@ -1,20 +1,27 @@
 from database.connection import (
     get_database,
     init_database,
+    ensure_database,
     close_database,
     DatabaseAdapter,
     SQLiteAdapter,
     D1Adapter
 )
-from database.migrate import run_migrations, seed_default_bins
+from database.priority import Priority, PriorityGate, current_priority
+from database.migrate import run_migrations, seed_default_bins, rebuild_inventory_summary
 
 __all__ = [
     "get_database",
     "init_database", 
+    "ensure_database",
     "close_database",
     "DatabaseAdapter",
     "SQLiteAdapter",
     "D1Adapter",
+    "Priority",
+    "PriorityGate",
+    "current_priority",
     "run_migrations",
-    "seed_default_bins"
+    "seed_default_bins",
+    "rebuild_inventory_summary"
 ]
@@ -1,11 +1,18 @@
+import asyncio
 import aiosqlite
-import httpx
 import os
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Optional, TYPE_CHECKING
 import logging
 
 from config import settings
+from database.priority import Priority, PriorityGate, current_priority
+from monitoring.metrics import timed_query
+
+if TYPE_CHECKING:
+    import httpx
 
 logger = logging.getLogger(__name__)
 
@@ -13,12 +20,14 @@ logger = logging.getLogger(__name__)
 class DatabaseAdapter:
     """Abstract database adapter interface"""
     
+    db_system = "unknown"
+    
     async def execute(self, sql: str, params: tuple = ()) -> int:
         """Execute SQL and return last row id"""
         raise NotImplementedError
     
-    async def execute_many(self, sql: str, params_list: list) -> None:
-        """Execute SQL with multiple parameter sets"""
+    async def execute_many(self, sql: str, params_list: list) -> int:
+        """Execute SQL with multiple parameter sets and return the number of rows changed"""
         raise NotImplementedError
     
     async def fetch_one(self, sql: str, params: tuple = ()) -> Optional[dict]:
@@ -29,17 +38,57 @@ class DatabaseAdapter:
         """Fetch all rows as list of dicts"""
         raise NotImplementedError
     
+    async def fetch_rows(self, sql: str, params: tuple = ()) -> list[tuple]:
+        """Fetch all rows as plain tuples in column order, for bulk numeric reads"""
+        raise NotImplementedError
+    
     async def executescript(self, sql: str) -> None:
         """Execute SQL script"""
         raise NotImplementedError
+    
+    def transaction(self) -> Any:
+        """
+        Async context manager grouping writes into a single transaction.
+        
+        Writes issued inside the block are committed together on exit and
+        rolled back if the block raises.
+        """
+        raise NotImplementedError
+    
+    async def reclaim_space(self, vacuum_pages: int = 1000) -> dict:
+        """Release free pages and checkpoint the journal after large deletes"""
+        return {}
+    
+    async def checkpoint(self) -> dict:
+        """Checkpoint the write-ahead log without blocking other connections"""
+        return {}
+    
+    async def optimize(self, analyze: bool = False) -> None:
+        """Refresh query planner statistics"""
+        return None
+
+
+# Set while the current task holds an open SQLite transaction
+_in_transaction: ContextVar[bool] = ContextVar("_in_transaction", default=False)
 
 
 class SQLiteAdapter(DatabaseAdapter):
     """SQLite adapter for local development"""
     
+    db_system = "sqlite"
+    
     def __init__(self, db_path: str):
         self.db_path = db_path
         self._connection: Optional[aiosqlite.Connection] = None
+        # Bulk reads (exports, analytics) run here so they never occupy the main connection
+        self._read_connection: Optional[aiosqlite.Connection] = None
+        # All requests share one connection, so writes are serialized to keep
+        # an open transaction from being committed by an unrelated request.
+        # Queued writes and transactions are let in by priority too, so an
+        # ingest write waits for at most the one bulk transaction running.
+        self._write_lock = PriorityGate()
+        # Statements queued for the main connection run in priority order
+        self._gate = PriorityGate()
         
         # Ensure directory exists
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
@@ -48,12 +97,23 @@ class SQLiteAdapter(DatabaseAdapter):
         """Initialize database connection"""
         self._connection = await aiosqlite.connect(self.db_path)
         self._connection.row_factory = aiosqlite.Row
+        # Only takes effect on a new database; lets retention hand pages back incrementally
+        await self._connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
         await self._connection.execute("PRAGMA journal_mode=WAL")
         await self._connection.execute("PRAGMA foreign_keys=ON")
+        
+        # WAL lets a second connection read while the first one writes
+        if settings.bulk_read_connection and self.db_path != ":memory:":
+            self._read_connection = await aiosqlite.connect(self.db_path)
+            self._read_connection.row_factory = aiosqlite.Row
+            await self._read_connection.execute("PRAGMA query_only=ON")
         logger.info(f"SQLite database connected at {self.db_path}")
     
     async def disconnect(self) -> None:
         """Close database connection"""
+        if self._read_connection:
+            await self._read_connection.close()
+            self._read_connection = None
         if self._connection:
             await self._connection.close()
             self._connection = None
@@ -64,42 +124,144 @@ class SQLiteAdapter(DatabaseAdapter):
             raise RuntimeError("Database not connected")
         return self._connection
     
+    def _reader(self) -> Optional[aiosqlite.Connection]:
+        """The read connection for bulk work outside a transaction, else None"""
+        if self._read_connection and current_priority.get() is Priority.BULK and not _in_transaction.get():
+            return self._read_connection
+        return None
+    
+    @timed_query("execute")
     async def execute(self, sql: str, params: tuple = ()) -> int:
-        cursor = await self.connection.execute(sql, params)
-        await self.connection.commit()
-        return cursor.lastrowid or 0
+        if _in_transaction.get():
+            async with self._gate:
+                cursor = await self.connection.execute(sql, params)
+            return cursor.lastrowid or 0
+        
+        async with self._write_lock, self._gate:
+            cursor = await self.connection.execute(sql, params)
+            await self.connection.commit()
+            return cursor.lastrowid or 0
     
-    async def execute_many(self, sql: str, params_list: list) -> None:
-        await self.connection.executemany(sql, params_list)
-        await self.connection.commit()
+    @timed_query("execute_many")
+    async def execute_many(self, sql: str, params_list: list) -> int:
+        if _in_transaction.get():
+            async with self._gate:
+                cursor = await self.connection.executemany(sql, params_list)
+            return max(cursor.rowcount, 0)
+        
+        async with self._write_lock, self._gate:
+            cursor = await self.connection.executemany(sql, params_list)
+            await self.connection.commit()
+            return max(cursor.rowcount, 0)
     
+    @timed_query("fetch_one")
     async def fetch_one(self, sql: str, params: tuple = ()) -> Optional[dict]:
-        cursor = await self.connection.execute(sql, params)
-        row = await cursor.fetchone()
+        reader = self._reader()
+        if reader:
+            cursor = await reader.execute(sql, params)
+            row = await cursor.fetchone()
+            return dict(row) if row else None
+        
+        async with self._gate:
+            cursor = await self.connection.execute(sql, params)
+            row = await cursor.fetchone()
         return dict(row) if row else None
     
+    @timed_query("fetch_all")
     async def fetch_all(self, sql: str, params: tuple = ()) -> list[dict]:
-        cursor = await self.connection.execute(sql, params)
-        rows = await cursor.fetchall()
+        reader = self._reader()
+        if reader:
+            cursor = await reader.execute(sql, params)
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows]
+        
+        async with self._gate:
+            cursor = await self.connection.execute(sql, params)
+            rows = await cursor.fetchall()
         return [dict(row) for row in rows]
     
+    @timed_query("fetch_rows")
+    async def fetch_rows(self, sql: str, params: tuple = ()) -> list[tuple]:
+        reader = self._reader()
+        if reader:
+            cursor = await reader.execute(sql, params)
+            # Skip the Row wrapper; sqlite3 hands back its own tuples
+            cursor.row_factory = None
+            return await cursor.fetchall()
+        
+        async with self._gate:
+            cursor = await self.connection.execute(sql, params)
+            cursor.row_factory = None
+            return await cursor.fetchall()
+    
     async def executescript(self, sql: str) -> None:
-        await self.connection.executescript(sql)
-        await self.connection.commit()
+        async with self._write_lock:
+            await self.connection.executescript(sql)
+            await self.connection.commit()
+    
+    async def reclaim_space(self, vacuum_pages: int = 1000) -> dict:
+        async with self._write_lock:
+            cursor = await self.connection.execute("PRAGMA freelist_count")
+            free_before = (await cursor.fetchone())[0]
+            # No-op unless the database was created with auto_vacuum=INCREMENTAL
+            # executescript steps the pragma to completion; execute() would free a single page
+            await self.connection.executescript(f"PRAGMA incremental_vacuum({int(vacuum_pages)});")
+            cursor = await self.connection.execute("PRAGMA freelist_count")
+            free_after = (await cursor.fetchone())[0]
+        
+        return {"pages_freed": free_before - free_after, **await self.checkpoint()}
+    
+    async def checkpoint(self) -> dict:
+        # PASSIVE never waits on readers or writers, so ingest is not blocked
+        cursor = await self.connection.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        busy, log_frames, checkpointed = await cursor.fetchone()
+        return {"wal_frames": log_frames, "wal_checkpointed": checkpointed}
+    
+    async def optimize(self, analyze: bool = False) -> None:
+        async with self._write_lock:
+            if analyze:
+                await self.connection.execute("ANALYZE")
+            await self.connection.execute("PRAGMA optimize")
+            await self.connection.commit()
+    
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator["SQLiteAdapter"]:
+        if _in_transaction.get():
+            # Nested blocks join the outer transaction
+            yield self
+            return
+        
+        async with self._write_lock:
+            await self.connection.execute("BEGIN IMMEDIATE")
+            token = _in_transaction.set(True)
+            try:
+                yield self
+            except BaseException:
+                await self.connection.rollback()
+                raise
+            else:
+                await self.connection.commit()
+            finally:
+                _in_transaction.reset(token)
 
 
 class D1Adapter(DatabaseAdapter):
     """Cloudflare D1 adapter for production"""
     
+    db_system = "cloudflare_d1"
+    
     def __init__(self, account_id: str, api_token: str, database_id: str):
         self.account_id = account_id
         self.api_token = api_token
         self.database_id = database_id
         self.base_url = f"https://api.cloudflare.com/client/v4/accounts/{account_id}/d1/database/{database_id}"
-        self._client: Optional[httpx.AsyncClient] = None
+        self._client: Optional["httpx.AsyncClient"] = None
     
     async def connect(self) -> None:
         """Initialize HTTP client"""
+        # Imported here so SQLite deployments never pay for httpx at startup
+        import httpx
+        
         self._client = httpx.AsyncClient(
             headers={
                 "Authorization": f"Bearer {self.api_token}",
@@ -116,7 +278,7 @@ class D1Adapter(DatabaseAdapter):
             self._client = None
     
     @property
-    def client(self) -> httpx.AsyncClient:
+    def client(self) -> "httpx.AsyncClient":
         if not self._client:
             raise RuntimeError("D1 client not connected")
         return self._client
@@ -130,60 +292,124 @@ class D1Adapter(DatabaseAdapter):
         response.raise_for_status()
         return response.json()
     
+    @timed_query("execute")
     async def execute(self, sql: str, params: tuple = ()) -> int:
         result = await self._query(sql, list(params))
         meta = result.get("result", [{}])[0].get("meta", {})
         return meta.get("last_row_id", 0)
     
-    async def execute_many(self, sql: str, params_list: list) -> None:
+    @timed_query("execute_many")
+    async def execute_many(self, sql: str, params_list: list) -> int:
+        changes = 0
         for params in params_list:
-            await self._query(sql, list(params))
+            result = await self._query(sql, list(params))
+            changes += result.get("result", [{}])[0].get("meta", {}).get("changes", 0)
+        return changes
     
+    @timed_query("fetch_one")
     async def fetch_one(self, sql: str, params: tuple = ()) -> Optional[dict]:
         result = await self._query(sql, list(params))
         results = result.get("result", [{}])[0].get("results", [])
         return results[0] if results else None
     
+    @timed_query("fetch_all")
     async def fetch_all(self, sql: str, params: tuple = ()) -> list[dict]:
         result = await self._query(sql, list(params))
         return result.get("result", [{}])[0].get("results", [])
     
+    @timed_query("fetch_rows")
+    async def fetch_rows(self, sql: str, params: tuple = ()) -> list[tuple]:
+        result = await self._query(sql, list(params))
+        return [tuple(row.values()) for row in result.get("result", [{}])[0].get("results", [])]
+    
     async def executescript(self, sql: str) -> None:
         # Split by semicolons and execute each statement
         statements = [s.strip() for s in sql.split(';') if s.strip()]
         for stmt in statements:
             await self._query(stmt)
+    
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator["D1Adapter"]:
+        # The D1 HTTP API has no interactive transactions; statements inside
+        # the block are applied one request at a time
+        yield self
 
 
 # Global database instance
 _db: Optional[DatabaseAdapter] = None
 
+# Serverless lazy-initialization guard (one initialization per container)
+_init_lock: Optional[asyncio.Lock] = None
+
 
 async def get_database() -> DatabaseAdapter:
     """Get database adapter instance"""
     global _db
     if _db is None:
+        if settings.serverless:
+            return await ensure_database()
         raise RuntimeError("Database not initialized")
     return _db
 
 
-async def init_database() -> DatabaseAdapter:
-    """Initialize database adapter"""
-    global _db
-    
+def _create_adapter() -> DatabaseAdapter:
+    """Create the configured database adapter"""
     if settings.use_d1:
-        _db = D1Adapter(
+        return D1Adapter(
             settings.cloudflare_account_id,
             settings.cloudflare_api_token,
             settings.d1_database_id
         )
-    else:
-        _db = SQLiteAdapter(settings.database_url)
+    return SQLiteAdapter(settings.database_url)
+
+
+async def init_database() -> DatabaseAdapter:
+    """Initialize database adapter"""
+    global _db
     
+    _db = _create_adapter()
     await _db.connect()
     return _db
 
 
+async def ensure_database() -> DatabaseAdapter:
+    """
+    Lazily connect, migrate and seed the database on first use.
+    
+    Serverless handlers run without a lifespan, so the first request in a
+    container pays for initialization and every later request reuses it.
+    Concurrent first requests wait on the same lock instead of racing.
+    """
+    global _db, _init_lock
+    
+    if _db is not None:
+        return _db
+    
+    if _init_lock is None:
+        _init_lock = asyncio.Lock()
+    
+    async with _init_lock:
+        if _db is not None:
+            return _db
+        
+        from database.migrate import run_migrations, seed_default_bins
+        
+        db = _create_adapter()
+        await db.connect()
+        try:
+            await run_migrations(db)
+            await seed_default_bins(db)
+        except Exception:
+            await db.disconnect()
+            raise
+        
+        # Publish only once fully migrated so other requests never see a half-built schema
+        _db = db
+        logger.info("Database lazily initialized for serverless container")
+    
+    return _db
+
+
 async def close_database() -> None:
     """Close database connection"""
     global _db
@@ -2,14 +2,87 @@ import logging
 from pathlib import Path
 import random
 
-from database.connection import get_database
+from typing import Optional
+
+from database.connection import get_database, DatabaseAdapter
 
 logger = logging.getLogger(__name__)
 
+# SQL mirror of InventoryService._calculate_status; {qty} is the quantity
+# expression and {bc} the bin_configurations alias
+STATUS_CASE_SQL = """CASE
+    WHEN {qty} <= 0 THEN 'empty'
+    WHEN {qty} > {bc}.max_capacity THEN 'overfill'
+    WHEN {qty} <= {bc}.critical_threshold THEN 'critical'
+    WHEN {qty} <= {bc}.min_threshold THEN 'low'
+    ELSE 'normal'
+END"""
+
+# Columns added after the initial schema: (table, column, definition)
+COLUMN_MIGRATIONS = [
+    ('current_inventory', 'status', "TEXT NOT NULL DEFAULT 'empty'"),
+    ('inventory_data', 'dedup_key', "TEXT"),
+]
+
+# Indexes on migrated columns; created after _ensure_columns so older databases have the column
+INDEX_MIGRATIONS = [
+    # Retried readings carry the same key and timestamp; rows without a key are not indexed
+    """CREATE UNIQUE INDEX IF NOT EXISTS idx_inventory_dedup
+       ON inventory_data(bin_id, dedup_key, timestamp) WHERE dedup_key IS NOT NULL""",
+]
+
+
+async def _ensure_columns(db: DatabaseAdapter) -> None:
+    """Add columns missing from tables created by older schema versions"""
+    for table, column, definition in COLUMN_MIGRATIONS:
+        columns = await db.fetch_all(f"PRAGMA table_info({table})")
+        if any(c['name'] == column for c in columns):
+            continue
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        logger.info(f"Added column {table}.{column}")
+
 
-async def run_migrations() -> None:
+async def rebuild_inventory_summary(db: Optional[DatabaseAdapter] = None) -> None:
+    """
+    Recompute every bin's stored status and the summary counters from scratch.
+    
+    Normal writes adjust the counters by delta; this full pass runs at
+    startup and after bulk changes to self-heal any drift.
+    """
+    db = db or await get_database()
+    
+    async with db.transaction():
+        await db.execute("INSERT OR IGNORE INTO inventory_summary (id) VALUES (1)")
+        await db.execute(f"""
+            UPDATE current_inventory SET status = (
+                SELECT {STATUS_CASE_SQL.format(qty='current_inventory.calculated_quantity', bc='bc')}
+                FROM bin_configurations bc WHERE bc.bin_id = current_inventory.bin_id
+            )
+            WHERE bin_id IN (SELECT bin_id FROM bin_configurations)
+        """)
+        
+        # Bins without a snapshot row display as empty with zero items
+        await db.execute("""
+            UPDATE inventory_summary SET
+                total_bins = (SELECT COUNT(*) FROM bin_configurations),
+                normal_count = (SELECT COUNT(*) FROM current_inventory WHERE status = 'normal'),
+                low_count = (SELECT COUNT(*) FROM current_inventory WHERE status = 'low'),
+                critical_count = (SELECT COUNT(*) FROM current_inventory WHERE status = 'critical'),
+                overfill_count = (SELECT COUNT(*) FROM current_inventory WHERE status = 'overfill'),
+                empty_count = (SELECT COUNT(*) FROM bin_configurations bc
+                               LEFT JOIN current_inventory ci ON bc.bin_id = ci.bin_id
+                               WHERE ci.bin_id IS NULL OR ci.status = 'empty'),
+                total_items = (SELECT COALESCE(SUM(calculated_quantity), 0) FROM current_inventory
+                               WHERE bin_id IN (SELECT bin_id FROM bin_configurations)),
+                alerts_active = (SELECT COUNT(*) FROM alert_logs WHERE is_acknowledged = 0),
+                updated_at = datetime('now')
+            WHERE id = 1
+        """)
+
+
+async def run_migrations(db: Optional[DatabaseAdapter] = None) -> None:
     """Run database migrations"""
-    db = await get_database()
+    db = db or await get_database()
     
     logger.info("Running database migrations...")
     
@@ -24,6 +97,10 @@ async def run_migrations() -> None:
     except Exception as e:
         logger.warning(f"Schema execution warning (may be normal for existing tables): {e}")
     
+    await _ensure_columns(db)
+    for statement in INDEX_MIGRATIONS:
+        await db.execute(statement)
+    
     # Insert default settings
     default_settings = [
         ('default_low_threshold', '10', 'Default low stock threshold for new bins'),
@@ -42,12 +119,14 @@ async def run_migrations() -> None:
         except Exception:
             pass
     
+    await rebuild_inventory_summary(db)
+    
     logger.info("Database migrations completed successfully")
 
 
-async def seed_default_bins() -> None:
+async def seed_default_bins(db: Optional[DatabaseAdapter] = None) -> None:
     """Seed default bin configurations"""
-    db = await get_database()
+    db = db or await get_database()
     
     logger.info("Checking for existing bins...")
     
@@ -73,43 +152,46 @@ async def seed_default_bins() -> None:
         ('rivets', 'Pop Rivets', 1.5),
     ]
     
+    bins = []
+    inventory = []
+    alert_configs = []
     article_index = 0
     for row in range(1, 3):  # 2 rows
         for position in range(1, 6):  # 5 positions
             bin_id = f"BIN-R{row}P{position}"
             article_type, article_name, article_weight = article_types[article_index]
             
-            # Insert bin configuration
-            await db.execute(
-                """INSERT INTO bin_configurations 
-                   (bin_id, row, position, article_type, article_name, article_weight_grams, 
-                    min_threshold, critical_threshold, max_capacity)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (bin_id, row, position, article_type, article_name, article_weight, 10, 5, 100)
-            )
+            bins.append((bin_id, row, position, article_type, article_name, article_weight, 10, 5, 100))
             
             # Initialize current inventory with random starting quantity
             initial_qty = random.randint(20, 80)
-            initial_weight = initial_qty * article_weight
-            
-            await db.execute(
-                """INSERT INTO current_inventory (bin_id, weight_grams, calculated_quantity, last_updated)
-                   VALUES (?, ?, ?, datetime('now'))""",
-                (bin_id, initial_weight, initial_qty)
-            )
+            inventory.append((bin_id, initial_qty * article_weight, initial_qty))
             
-            # Create default alert configurations
-            await db.execute(
-                """INSERT INTO alert_configurations (bin_id, alert_type, threshold_value, is_enabled)
-                   VALUES (?, 'low_stock', 10, 1)""",
-                (bin_id,)
-            )
-            await db.execute(
-                """INSERT INTO alert_configurations (bin_id, alert_type, threshold_value, is_enabled)
-                   VALUES (?, 'critical_stock', 5, 1)""",
-                (bin_id,)
-            )
+            # Default alert configurations
+            alert_configs.append((bin_id, 'low_stock', 10))
+            alert_configs.append((bin_id, 'critical_stock', 5))
             
             article_index += 1
     
+    async with db.transaction():
+        await db.execute_many(
+            """INSERT INTO bin_configurations 
+               (bin_id, row, position, article_type, article_name, article_weight_grams, 
+                min_threshold, critical_threshold, max_capacity)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            bins
+        )
+        await db.execute_many(
+            """INSERT INTO current_inventory (bin_id, weight_grams, calculated_quantity, last_updated)
+               VALUES (?, ?, ?, datetime('now'))""",
+            inventory
+        )
+        await db.execute_many(
+            """INSERT INTO alert_configurations (bin_id, alert_type, threshold_value, is_enabled)
+               VALUES (?, ?, ?, 1)""",
+            alert_configs
+        )
+    
+    await rebuild_inventory_summary(db)
+    
     logger.info("Default bin configurations seeded successfully")
@@ -0,0 +1,72 @@
+"""
+Priority ordering of database calls.
+
+Every request runs under one of three priorities, set by the admission
+middleware (see admission.py) and by the scheduler for background jobs.
+The SQLite adapter runs one statement at a time on its connection; calls
+waiting for it are served lowest priority value first, so a sensor
+reading never queues behind a backlog of dashboard reads. Writes and
+whole transactions take a second gate of the same kind, so a reading
+also never queues behind a backlog of bulk transactions. Bulk reads go
+to a separate read connection altogether when one is configured.
+"""
+
+import asyncio
+import heapq
+from contextvars import ContextVar
+from enum import IntEnum
+from itertools import count
+
+
+class Priority(IntEnum):
+    """Request classes, most urgent first"""
+    INGEST = 0
+    INTERACTIVE = 1
+    BULK = 2
+
+
+# Priority of the current request or job; anything unclassified counts as interactive
+current_priority: ContextVar[Priority] = ContextVar("current_priority", default=Priority.INTERACTIVE)
+
+
+class PriorityGate:
+    """Mutex whose waiters are woken by priority, then in arrival order"""
+    
+    def __init__(self):
+        self._busy = False
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._order = count()
+    
+    async def acquire(self) -> None:
+        if not self._busy and not self._waiters:
+            self._busy = True
+            return
+        
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (current_priority.get(), next(self._order), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Ownership may already have been handed over; pass it on
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+    
+    def release(self) -> None:
+        """Hand the gate to the most urgent waiter, or free it"""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._busy = False
+    
+    async def __aenter__(self) -> None:
+        await self.acquire()
+    
+    async def __aexit__(self, *exc) -> None:
+        self.release()
+    
+    def waiting(self) -> int:
+        """Calls queued for the gate"""
+        return len(self._waiters)
@@ -26,6 +26,7 @@ CREATE TABLE IF NOT EXISTS inventory_data (
     calculated_quantity INTEGER NOT NULL,
     timestamp TEXT NOT NULL,
     created_at TEXT DEFAULT (datetime('now')),
+    dedup_key TEXT,
     FOREIGN KEY (bin_id) REFERENCES bin_configurations(bin_id) ON DELETE CASCADE
 );
 
@@ -41,9 +42,26 @@ CREATE TABLE IF NOT EXISTS current_inventory (
     weight_grams REAL NOT NULL,
     calculated_quantity INTEGER NOT NULL,
     last_updated TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'empty',
     FOREIGN KEY (bin_id) REFERENCES bin_configurations(bin_id) ON DELETE CASCADE
 );
 
+-- Dashboard summary counters (single row, maintained by delta on every write)
+CREATE TABLE IF NOT EXISTS inventory_summary (
+    id INTEGER PRIMARY KEY CHECK(id = 1),
+    total_bins INTEGER NOT NULL DEFAULT 0,
+    normal_count INTEGER NOT NULL DEFAULT 0,
+    low_count INTEGER NOT NULL DEFAULT 0,
+    critical_count INTEGER NOT NULL DEFAULT 0,
+    empty_count INTEGER NOT NULL DEFAULT 0,
+    overfill_count INTEGER NOT NULL DEFAULT 0,
+    total_items INTEGER NOT NULL DEFAULT 0,
+    alerts_active INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT DEFAULT (datetime('now'))
+);
+
+INSERT OR IGNORE INTO inventory_summary (id) VALUES (1);
+
 -- Alert configurations table
 CREATE TABLE IF NOT EXISTS alert_configurations (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -73,9 +91,42 @@ CREATE TABLE IF NOT EXISTS alert_logs (
 );
 
 -- Create index for alert logs
-CREATE INDEX IF NOT EXISTS idx_alert_logs_bin_id ON alert_logs(bin_id);
 CREATE INDEX IF NOT EXISTS idx_alert_logs_created_at ON alert_logs(created_at);
-CREATE INDEX IF NOT EXISTS idx_alert_logs_acknowledged ON alert_logs(is_acknowledged);
+CREATE INDEX IF NOT EXISTS idx_alert_logs_bin_created ON alert_logs(bin_id, created_at);
+
+-- Cooldown lookup (bin_id, alert_type, created_at >= ?) answered from the index alone
+CREATE INDEX IF NOT EXISTS idx_alert_logs_cooldown ON alert_logs(bin_id, alert_type, created_at);
+
+-- Active alerts are a tiny slice of the history; index only unacknowledged rows
+CREATE INDEX IF NOT EXISTS idx_alert_logs_active ON alert_logs(created_at) WHERE is_acknowledged = 0;
+
+-- Superseded by the composite and partial indexes above
+DROP INDEX IF EXISTS idx_alert_logs_bin_id;
+DROP INDEX IF EXISTS idx_alert_logs_acknowledged;
+
+-- Readings held back by the anomaly detector; kept out of history and current_inventory
+CREATE TABLE IF NOT EXISTS quarantined_readings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    bin_id TEXT NOT NULL,
+    weight_grams REAL NOT NULL,
+    calculated_quantity INTEGER NOT NULL,
+    expected_quantity REAL NOT NULL,
+    score REAL NOT NULL,
+    direction TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    created_at TEXT DEFAULT (datetime('now')),
+    FOREIGN KEY (bin_id) REFERENCES bin_configurations(bin_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_quarantined_bin_created ON quarantined_readings(bin_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_quarantined_created ON quarantined_readings(created_at);
+
+-- Scheduler leases so only one worker runs each maintenance job
+CREATE TABLE IF NOT EXISTS scheduler_locks (
+    job_name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
 
 -- System settings table
 CREATE TABLE IF NOT EXISTS system_settings (
@@ -1,12 +1,19 @@
 from fastapi import FastAPI, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 import logging
 
 from config import settings
+from admission import AdmissionMiddleware
 from database import init_database, close_database, run_migrations, seed_default_bins
-from routers import bins_router, alerts_router, export_router, analytics_router, set_broadcast_bin_update
-from services import set_broadcast_alert
+from routers import (
+    bins_router, alerts_router, export_router, analytics_router, admin_router,
+    set_broadcast_bin_update
+)
+from services import set_broadcast_alert, set_broadcast_anomaly, maintenance_service, forecast_service, query_cache
+from scheduler import scheduler
+from monitoring import registry, tracer, loop_monitor, MetricsMiddleware, ServerTimingMiddleware, TracingMiddleware
 from websocket import websocket_endpoint, manager
 
 # Configure logging
@@ -31,6 +38,18 @@ async def lifespan(app: FastAPI):
     # Set up WebSocket broadcast functions
     set_broadcast_bin_update(manager.broadcast_bin_update)
     set_broadcast_alert(manager.broadcast_alert)
+    set_broadcast_anomaly(manager.broadcast_anomaly)
+    
+    # Fit the stockout forecast from history without delaying startup
+    forecast_service.warm_up()
+    
+    if settings.loop_monitor_enabled:
+        loop_monitor.start(settings.loop_monitor_interval_ms, settings.loop_stall_threshold_ms)
+    
+    # Maintenance (retention, checkpoints, statistics) runs off the request path
+    if settings.scheduler_enabled:
+        maintenance_service.register_jobs(scheduler)
+        scheduler.start()
     
     logger.info("🚀 Server started successfully")
     
@@ -38,6 +57,9 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down...")
+    await scheduler.stop()
+    await loop_monitor.stop()
+    tracer.flush()
     await close_database()
     logger.info("Server stopped")
 
@@ -52,6 +74,9 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Request-class budgets; added first so CORS headers also reach shed 503 responses
+app.add_middleware(AdmissionMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -61,11 +86,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Every metric in the registry (DB queries, broadcasts, ingest, cache, admission) follows the flag
+registry.set_enabled(settings.metrics_enabled)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+    registry.gauge("ws_clients", "Connected WebSocket clients", callback=manager.get_connection_count)
+    registry.gauge("cache_entries", "Results held by the query cache", callback=query_cache.size)
+
+if settings.server_timing_enabled:
+    app.add_middleware(ServerTimingMiddleware)
+
+# Tracing is off unless TRACE_SAMPLE_RATE is above zero
+tracer.configure(settings.trace_sample_rate, settings.trace_export_path)
+app.add_middleware(TracingMiddleware)
+
 # Include routers
 app.include_router(bins_router)
 app.include_router(alerts_router)
 app.include_router(export_router)
 app.include_router(analytics_router)
+app.include_router(admin_router)
 
 
 # Health check endpoint
@@ -78,6 +118,13 @@ async def health_check():
     }
 
 
+# Prometheus metrics endpoint
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Metrics in Prometheus text exposition format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 # WebSocket endpoint
 @app.websocket("/ws")
 async def websocket_route(websocket: WebSocket):
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, TypeAdapter, field_validator, model_validator
 from typing import Optional, Literal, List
 from datetime import datetime
 from enum import Enum
@@ -22,13 +22,14 @@ class AlertType(str, Enum):
 # Request Models
 class BinDataPayload(BaseModel):
     """Payload received from hardware sensors"""
-    bin_id: str = Field(..., pattern=r"^BIN-R[1-2]P[1-5]$", description="Bin identifier")
-    row: int = Field(..., ge=1, le=2, description="Row number (1-2)")
-    position: int = Field(..., ge=1, le=5, description="Position in row (1-5)")
+    bin_id: str = Field(..., pattern=r"^BIN-R\d+P\d+$", description="Bin identifier")
+    row: int = Field(..., ge=1, description="Row number")
+    position: int = Field(..., ge=1, description="Position in row")
     weight_grams: float = Field(..., ge=0, description="Total weight in grams")
     article_weight_grams: float = Field(..., gt=0, description="Single article weight")
     calculated_quantity: int = Field(..., ge=0, description="Calculated quantity")
     timestamp: datetime = Field(..., description="ISO8601 timestamp")
+    seq: Optional[int] = Field(None, ge=0, description="Per-device sequence number; a retry resends the same value")
 
 
 class BinConfigUpdate(BaseModel):
@@ -41,6 +42,35 @@ class BinConfigUpdate(BaseModel):
     max_capacity: Optional[int] = Field(None, gt=0)
 
 
+class BinLayoutEntry(BaseModel):
+    """Single bin in a warehouse layout used for bulk provisioning"""
+    bin_id: str = Field(..., pattern=r"^BIN-R\d+P\d+$", description="Bin identifier")
+    row: int = Field(..., ge=1)
+    position: int = Field(..., ge=1)
+    article_type: str = Field("general", min_length=1, max_length=50)
+    article_name: str = Field("Unknown Article", min_length=1, max_length=100)
+    article_weight_grams: float = Field(100, gt=0)
+    min_threshold: int = Field(10, ge=0)
+    critical_threshold: int = Field(5, ge=0)
+    max_capacity: int = Field(100, gt=0)
+    
+    @model_validator(mode="after")
+    def check_consistency(self) -> "BinLayoutEntry":
+        if self.bin_id != f"BIN-R{self.row}P{self.position}":
+            raise ValueError(f"bin_id {self.bin_id} does not match row {self.row}, position {self.position}")
+        if self.critical_threshold > self.min_threshold:
+            raise ValueError("critical_threshold must not exceed min_threshold")
+        if self.min_threshold > self.max_capacity:
+            raise ValueError("min_threshold must not exceed max_capacity")
+        return self
+
+
+class BinLayoutRequest(BaseModel):
+    """Bulk provisioning request"""
+    bins: List[dict] = Field(..., min_length=1)
+    dry_run: bool = False
+
+
 class AlertConfigUpdate(BaseModel):
     """Update alert configuration"""
     threshold_value: Optional[int] = Field(None, ge=0)
@@ -122,6 +152,19 @@ class AlertConfiguration(BaseModel):
     updated_at: str
 
 
+class QuarantinedReading(BaseModel):
+    """Sensor reading flagged by the anomaly detector"""
+    id: int
+    bin_id: str
+    weight_grams: float
+    calculated_quantity: int
+    expected_quantity: float
+    score: float
+    direction: Literal["spike", "drop"]
+    timestamp: str
+    created_at: str
+
+
 class HistoricalDataPoint(BaseModel):
     """Single historical data point"""
     timestamp: str
@@ -165,6 +208,9 @@ class PaginatedResponse(BaseModel):
 class WSMessageType(str, Enum):
     BIN_UPDATE = "bin_update"
     ALERT = "alert"
+    ANOMALY = "anomaly"
+    INGEST_READY = "ingest_ready"
+    INGEST_ACK = "ingest_ack"
     CONNECTION = "connection"
     HEARTBEAT = "heartbeat"
     ERROR = "error"
@@ -175,3 +221,54 @@ class WSMessage(BaseModel):
     type: WSMessageType
     payload: dict
     timestamp: str
+
+
+# Row mapping for trusted database rows
+# A whole result set is validated by one compiled TypeAdapter call into
+# pydantic-core instead of one constructor call per row. model_construct
+# is slower than compiled validation for models this small, so it is not used.
+_alert_logs = TypeAdapter(List[AlertLog])
+_bin_display_data = TypeAdapter(List[BinDisplayData])
+_historical_points = TypeAdapter(List[HistoricalDataPoint])
+_alert_configurations = TypeAdapter(List[AlertConfiguration])
+
+_LIST_ADAPTERS = {
+    AlertLog: _alert_logs,
+    AlertConfiguration: _alert_configurations,
+    BinDisplayData: _bin_display_data,
+    HistoricalDataPoint: _historical_points,
+}
+
+
+def alert_logs_from_rows(rows: list[dict]) -> list[AlertLog]:
+    """AlertLog for each alert_logs row; joined extra columns are ignored"""
+    return _alert_logs.validate_python(rows)
+
+
+def alert_configurations_from_rows(rows: list[dict]) -> list[AlertConfiguration]:
+    """AlertConfiguration for each alert_configurations row"""
+    return _alert_configurations.validate_python(rows)
+
+
+def bin_display_from_rows(rows: list[dict]) -> list[BinDisplayData]:
+    """BinDisplayData for each row of the inventory display query"""
+    for row in rows:
+        quantity = row['calculated_quantity']
+        row['current_quantity'] = quantity
+        row['fill_percentage'] = min(100, round((quantity / row['max_capacity']) * 100))
+    return _bin_display_data.validate_python(rows)
+
+
+def historical_points_from_rows(rows: list[dict]) -> list[HistoricalDataPoint]:
+    """HistoricalDataPoint for each (timestamp, quantity, weight_grams) row"""
+    return _historical_points.validate_python(rows)
+
+
+def dump_models(items: list[BaseModel]) -> list[dict]:
+    """Dump a list of models in one serializer call when the type has a list adapter"""
+    if not items:
+        return []
+    adapter = _LIST_ADAPTERS.get(type(items[0]))
+    if adapter is None:
+        return [item.model_dump() for item in items]
+    return adapter.dump_python(items)
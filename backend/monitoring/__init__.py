@@ -0,0 +1,54 @@
+from monitoring.metrics import (
+    registry,
+    statement_fingerprint,
+    timed_query,
+    HTTP_REQUEST_SECONDS,
+    DB_QUERY_SECONDS,
+    WS_BROADCAST_SECONDS,
+    WS_BROADCAST_CLIENTS,
+    ALERTS_FIRED,
+    ALERT_EVALUATION_SECONDS,
+    INGEST_READINGS,
+    INGEST_IN_FLIGHT,
+    CACHE_REQUESTS,
+    CACHE_EVICTIONS,
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_WAIT_SECONDS,
+    ADMISSION_REJECTED
+)
+from monitoring.middleware import MetricsMiddleware, ServerTimingMiddleware, TracingMiddleware
+from monitoring.profiler import profiler, SamplingProfiler
+from monitoring.timing import TimedRoute, current_timing
+from monitoring.tracing import tracer, traced, current_span
+from monitoring.loop_monitor import loop_monitor, LoopLagMonitor
+
+__all__ = [
+    "registry",
+    "statement_fingerprint",
+    "timed_query",
+    "HTTP_REQUEST_SECONDS",
+    "DB_QUERY_SECONDS",
+    "WS_BROADCAST_SECONDS",
+    "WS_BROADCAST_CLIENTS",
+    "ALERTS_FIRED",
+    "ALERT_EVALUATION_SECONDS",
+    "INGEST_READINGS",
+    "INGEST_IN_FLIGHT",
+    "CACHE_REQUESTS",
+    "CACHE_EVICTIONS",
+    "ADMISSION_IN_FLIGHT",
+    "ADMISSION_WAIT_SECONDS",
+    "ADMISSION_REJECTED",
+    "MetricsMiddleware",
+    "ServerTimingMiddleware",
+    "profiler",
+    "SamplingProfiler",
+    "TimedRoute",
+    "current_timing",
+    "TracingMiddleware",
+    "tracer",
+    "traced",
+    "current_span",
+    "loop_monitor",
+    "LoopLagMonitor"
+]
@@ -0,0 +1,164 @@
+"""
+Event-loop lag monitor and blocking-call detector.
+
+A coroutine wakes up every interval and records how late it was
+scheduled; that delay is the time other callbacks held the loop. A
+watchdog thread watches the coroutine's heartbeat. When the heartbeat is
+older than the stall threshold, the loop is stuck in some callback right
+now, and the watchdog captures the loop thread's stack, which names the
+blocking code.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+from monitoring.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_SECONDS = registry.histogram(
+    "event_loop_lag_seconds", "Delay between when the loop monitor was due and when it ran",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+LOOP_STALLS = registry.counter(
+    "event_loop_stalls_total", "Times the event loop was blocked past the stall threshold"
+)
+
+
+class LoopLagMonitor:
+    """Measures event-loop scheduling delay and captures stacks of stalls"""
+    
+    def __init__(self, window: int = 3000, max_stalls: int = 50):
+        self.interval = 0.1
+        self.threshold = 0.1
+        self._lags: deque = deque(maxlen=window)
+        self.stalls: deque = deque(maxlen=max_stalls)
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._current_stall: Optional[dict] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self, interval_ms: float = 100, threshold_ms: float = 100) -> None:
+        """Start monitoring the running loop; call from the loop thread"""
+        if self.running:
+            return
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._measure(), name="loop-lag-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Event loop monitor started (stall threshold {threshold_ms:g}ms)")
+    
+    async def stop(self) -> None:
+        self._stop_event.set()
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+    
+    async def _measure(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._heartbeat = now
+            self._lags.append(lag)
+            LOOP_LAG_SECONDS.observe(lag)
+            
+            stall = self._current_stall
+            if stall is not None:
+                # The watchdog saw this stall while it was happening; record how long it lasted
+                stall["duration_ms"] = round(lag * 1000, 1)
+                self._current_stall = None
+                logger.warning(
+                    f"Event loop blocked for {stall['duration_ms']}ms in {stall['location']}"
+                )
+    
+    def _watch(self) -> None:
+        check_every = min(self.interval, self.threshold) / 2
+        while not self._stop_event.wait(check_every):
+            if self._current_stall is not None:
+                continue
+            # The heartbeat is due every interval; anything later is time the loop was blocked
+            blocked = time.monotonic() - self._heartbeat - self.interval
+            if blocked < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            top = stack[-1] if stack else None
+            stall = {
+                "detected_at": datetime.now().isoformat(),
+                "blocked_ms_at_capture": round(blocked * 1000, 1),
+                "duration_ms": None,
+                "location": f"{top.name} ({top.filename}:{top.lineno})" if top else "unknown",
+                "stack": traceback.format_list(stack)
+            }
+            self.stalls.append(stall)
+            self._current_stall = stall
+            LOOP_STALLS.inc()
+    
+    def percentiles(self) -> dict:
+        """Lag percentiles in milliseconds over the recent window"""
+        lags = sorted(self._lags)
+        if not lags:
+            return {"samples": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+        
+        def pick(q: float) -> float:
+            return round(lags[min(len(lags) - 1, int(q * len(lags)))] * 1000, 2)
+        
+        return {
+            "samples": len(lags),
+            "p50_ms": pick(0.50),
+            "p95_ms": pick(0.95),
+            "p99_ms": pick(0.99),
+            "max_ms": round(lags[-1] * 1000, 2)
+        }
+    
+    def get_status(self) -> dict:
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "stall_threshold_ms": self.threshold * 1000,
+            "lag": self.percentiles(),
+            "recent_stalls": list(reversed(self.stalls))
+        }
+
+
+# Global monitor instance
+loop_monitor = LoopLagMonitor()
+
+
+def _collect_lag_quantiles() -> list[str]:
+    """Windowed lag percentiles at /metrics, alongside the cumulative histogram"""
+    stats = loop_monitor.percentiles()
+    if not stats["samples"]:
+        return []
+    lines = [
+        "# HELP event_loop_lag_quantile_seconds Event loop lag percentiles over the recent window",
+        "# TYPE event_loop_lag_quantile_seconds gauge",
+    ]
+    for key, quantile in (("p50_ms", "0.5"), ("p95_ms", "0.95"), ("p99_ms", "0.99")):
+        lines.append(f'event_loop_lag_quantile_seconds{{quantile="{quantile}"}} {stats[key] / 1000}')
+    return lines
+
+
+registry.add_collector(_collect_lag_quantiles)
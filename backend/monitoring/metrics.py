@@ -0,0 +1,301 @@
+"""
+Minimal Prometheus-compatible metrics.
+
+Counters, gauges and histograms with labels, rendered in the Prometheus
+text exposition format. Everything runs on the event loop thread, so
+observations are plain dict and list updates with no locking.
+"""
+
+import hashlib
+import re
+import time
+from bisect import bisect_left
+from functools import lru_cache, wraps
+from typing import Callable, Iterable, Optional
+
+from monitoring.timing import current_timing
+from monitoring.tracing import tracer, current_span, SPAN_KIND_CLIENT
+
+# Latency buckets in seconds, from sub-millisecond DB calls to slow exports
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Cleared by Registry.set_enabled; a disabled metric ignores observations
+        self.enabled = True
+    
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+    
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        if self.enabled:
+            self._values[labels] = self._values.get(labels, 0) + amount
+    
+    def render(self) -> list[str]:
+        lines = super().render()
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be read from a callback at scrape time"""
+    kind = "gauge"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        callback: Optional[Callable[[], float]] = None
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+        self._callback = callback
+    
+    def set(self, value: float, *labels: str) -> None:
+        if self.enabled:
+            self._values[labels] = value
+    
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        if self.enabled:
+            self._values[labels] = self._values.get(labels, 0) + amount
+    
+    def dec(self, amount: float = 1, *labels: str) -> None:
+        if self.enabled:
+            self._values[labels] = self._values.get(labels, 0) - amount
+    
+    def render(self) -> list[str]:
+        lines = super().render()
+        if self._callback and self.enabled:
+            lines.append(f"{self.name} {_format_value(self._callback())}")
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observations"""
+    kind = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: dict[tuple, list[float]] = {}
+    
+    def observe(self, value: float, *labels: str) -> None:
+        if not self.enabled:
+            return
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+    
+    def time(self, *labels: str) -> "_Timer":
+        """Context manager observing the elapsed time of its block"""
+        return _Timer(self, labels)
+    
+    def render(self) -> list[str]:
+        lines = super().render()
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_labels", "_start")
+    
+    def __init__(self, histogram: Histogram, labels: tuple):
+        self._histogram = histogram
+        self._labels = labels
+    
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self._histogram.observe(time.perf_counter() - self._start, *self._labels)
+
+
+class Registry:
+    """Collection of metrics rendered together at /metrics"""
+    
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Callable[[], list[str]]] = []
+        self.enabled = True
+    
+    def set_enabled(self, enabled: bool) -> None:
+        """Turn recording on or off for every metric, registered now or later"""
+        self.enabled = enabled
+        for metric in self._metrics.values():
+            metric.enabled = enabled
+    
+    def register(self, metric: _Metric) -> _Metric:
+        metric.enabled = self.enabled
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+    
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = (), callback=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+    
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+    
+    def add_collector(self, collector: Callable[[], list[str]]) -> None:
+        """Register a callback producing extra exposition lines at scrape time"""
+        self._collectors.append(collector)
+    
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        if self.enabled:
+            for collector in self._collectors:
+                lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+@lru_cache(maxsize=1024)
+def statement_fingerprint(sql: str) -> str:
+    """
+    Short, stable label for a SQL statement: verb, main table and a hash.
+    
+    Statements are fixed strings in the code base, so the label set stays
+    small; the cache keeps fingerprinting off the hot path.
+    """
+    normalized = re.sub(r"\s+", " ", sql).strip()
+    verb = normalized.split(" ", 1)[0].lower() if normalized else "unknown"
+    match = re.search(r"\b(?:FROM|INTO|UPDATE|TABLE)\s+(\w+)", normalized, re.IGNORECASE)
+    table = match.group(1) if match else "-"
+    digest = hashlib.sha1(normalized.encode()).hexdigest()[:8]
+    return f"{verb}:{table}:{digest}"
+
+
+def timed_query(method: str):
+    """
+    Decorator recording adapter call latency by method and statement fingerprint.
+    
+    Inside a sampled trace each call also gets its own client span.
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(self, sql: str, *args, **kwargs):
+            timing = current_timing()
+            if not DB_QUERY_SECONDS.enabled and timing is None and current_span() is None:
+                # Nothing would record this call
+                return await func(self, sql, *args, **kwargs)
+            start = time.perf_counter()
+            try:
+                if current_span() is None:
+                    return await func(self, sql, *args, **kwargs)
+                attributes = {
+                    "db.system": self.db_system,
+                    "db.operation": method,
+                    "db.statement": re.sub(r"\s+", " ", sql).strip()[:500]
+                }
+                with tracer.start_span(f"db.{method}", SPAN_KIND_CLIENT, attributes):
+                    return await func(self, sql, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                if DB_QUERY_SECONDS.enabled:
+                    DB_QUERY_SECONDS.observe(elapsed, method, statement_fingerprint(sql))
+                if timing is not None:
+                    timing.add_db(elapsed)
+        return wrapper
+    return decorator
+
+
+# Global registry and the application's metrics
+registry = Registry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+DB_QUERY_SECONDS = registry.histogram(
+    "db_query_duration_seconds", "Database adapter call latency", ("method", "statement")
+)
+WS_BROADCAST_SECONDS = registry.histogram(
+    "ws_broadcast_duration_seconds", "WebSocket broadcast fan-out time", ("type",)
+)
+WS_BROADCAST_CLIENTS = registry.histogram(
+    "ws_broadcast_clients", "Clients reached per broadcast", (),
+    buckets=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+ALERTS_FIRED = registry.counter(
+    "alerts_fired_total", "Alerts created", ("alert_type",)
+)
+ALERT_EVALUATION_SECONDS = registry.histogram(
+    "alert_evaluation_duration_seconds", "Time spent evaluating alerts for one reading"
+)
+INGEST_READINGS = registry.counter(
+    "ingest_readings_total", "Sensor readings received", ("outcome",)
+)
+INGEST_IN_FLIGHT = registry.gauge(
+    "ingest_queue_depth", "Sensor readings currently being processed"
+)
+CACHE_REQUESTS = registry.counter(
+    "cache_requests_total", "Cached call lookups by outcome (hit, miss, coalesced)", ("cache", "result")
+)
+CACHE_EVICTIONS = registry.counter(
+    "cache_evictions_total", "Cache entries dropped by reason (expired, lru, invalidated)", ("cache", "reason")
+)
+ADMISSION_IN_FLIGHT = registry.gauge(
+    "admission_in_flight", "Admitted requests currently running per request class", ("class",)
+)
+ADMISSION_WAIT_SECONDS = registry.histogram(
+    "admission_wait_seconds", "Time requests queued for their class budget", ("class",)
+)
+ADMISSION_REJECTED = registry.counter(
+    "admission_rejected_total", "Requests shed with 503 by reason (full, timeout)", ("class", "reason")
+)
@@ -0,0 +1,115 @@
+import time
+
+from monitoring.metrics import HTTP_REQUEST_SECONDS
+from monitoring.profiler import profiler
+from monitoring.timing import start_request_timing
+from monitoring.tracing import tracer, SPAN_KIND_SERVER
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency per route template.
+    
+    Implemented as plain ASGI rather than BaseHTTPMiddleware to keep the
+    per-request overhead to a couple of dict lookups.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Route templates keep label cardinality bounded; unmatched paths share one label
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, scope["method"], route, str(status_code)
+            )
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware adding a Server-Timing header to every HTTP response.
+    
+    The header splits the request into db, handler and serialize time
+    (see monitoring.timing), which browser dev tools show per request.
+    Completed requests also count toward an active profiling session.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        timing = start_request_timing()
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                value = timing.header_value(time.perf_counter())
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", value.encode("latin-1"))]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.request_finished()
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the root server span of each HTTP request.
+    
+    An incoming W3C traceparent header is continued, including its
+    sampling decision; otherwise the tracer samples at its configured rate.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+        
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        attributes = {"http.request.method": scope["method"], "url.path": scope["path"]}
+        with tracer.start_span(scope["method"], SPAN_KIND_SERVER, attributes, traceparent) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if span:
+                    route = getattr(scope.get("route"), "path", None)
+                    if route:
+                        span.name = f"{scope['method']} {route}"
+                        span.set_attribute("http.route", route)
+                    span.set_attribute("http.response.status_code", status_code)
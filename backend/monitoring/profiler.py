@@ -0,0 +1,182 @@
+"""
+On-demand sampling profiler for the running server.
+
+A background thread samples the event loop thread's stack at a fixed
+interval and aggregates the samples as collapsed stacks, the input format
+of flamegraph.pl and speedscope. Sampling stops after a time limit or a
+number of completed requests. A tracemalloc snapshot taken at the end
+shows which lines allocated the most memory during the session.
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+MAX_PROFILE_SECONDS = 300
+MAX_STACK_DEPTH = 128
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples one thread's stack from a helper thread; one session at a time"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stacks: Counter = Counter()
+        self._session: Optional[dict] = None
+        self._requests_remaining: Optional[int] = None
+        self._started_tracemalloc = False
+        self.last_result: Optional[dict] = None
+        self.last_folded: str = ""
+    
+    @property
+    def active(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(
+        self,
+        seconds: Optional[float] = None,
+        requests: Optional[int] = None,
+        interval_ms: float = 5.0,
+        trace_memory: bool = True
+    ) -> dict:
+        """
+        Start sampling the calling thread (the event loop).
+        
+        Stops after ``seconds`` or after ``requests`` completed requests,
+        whichever comes first; the session never runs longer than
+        MAX_PROFILE_SECONDS.
+        """
+        with self._lock:
+            if self.active:
+                raise RuntimeError("A profiling session is already running")
+            
+            seconds = min(seconds or MAX_PROFILE_SECONDS, MAX_PROFILE_SECONDS)
+            self._stacks = Counter()
+            self._stop_event.clear()
+            self._requests_remaining = requests
+            self._started_tracemalloc = trace_memory and not tracemalloc.is_tracing()
+            if self._started_tracemalloc:
+                tracemalloc.start(16)
+            
+            self._session = {
+                "started_at": datetime.now().isoformat(),
+                "max_seconds": seconds,
+                "max_requests": requests,
+                "interval_ms": interval_ms,
+                "trace_memory": trace_memory,
+                "requests": 0
+            }
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(threading.get_ident(), seconds, interval_ms / 1000, trace_memory),
+                name="sampling-profiler",
+                daemon=True
+            )
+            self._thread.start()
+            return dict(self._session)
+    
+    def stop(self) -> None:
+        """Ask the running session to finish; results appear shortly after"""
+        self._stop_event.set()
+    
+    def request_finished(self) -> None:
+        """Count a completed request against the session's request budget"""
+        session = self._session
+        if session is None or not self.active:
+            return
+        session["requests"] += 1
+        if self._requests_remaining is not None:
+            self._requests_remaining -= 1
+            if self._requests_remaining <= 0:
+                self._stop_event.set()
+    
+    def _run(self, thread_id: int, seconds: float, interval: float, trace_memory: bool) -> None:
+        started = time.perf_counter()
+        deadline = started + seconds
+        samples = 0
+        
+        while not self._stop_event.wait(interval) and time.perf_counter() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            self._stacks[";".join(reversed(stack))] += 1
+            samples += 1
+        
+        self._finish(samples, time.perf_counter() - started, trace_memory)
+    
+    def _finish(self, samples: int, elapsed: float, trace_memory: bool) -> None:
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in self._stacks.items():
+            frames = stack.split(";")
+            self_counts[frames[-1]] += count
+            for label in set(frames):
+                total_counts[label] += count
+        
+        memory = None
+        if trace_memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ))
+            current, peak = tracemalloc.get_traced_memory()
+            memory = {
+                "current_kb": round(current / 1024, 1),
+                "peak_kb": round(peak / 1024, 1),
+                "top_allocations": [
+                    {
+                        "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                        "size_kb": round(stat.size / 1024, 1),
+                        "count": stat.count
+                    }
+                    for stat in snapshot.statistics("lineno")[:25]
+                ]
+            }
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        
+        self.last_folded = "\n".join(f"{stack} {count}" for stack, count in self._stacks.most_common())
+        self.last_result = {
+            **(self._session or {}),
+            "finished_at": datetime.now().isoformat(),
+            "duration_seconds": round(elapsed, 2),
+            "samples": samples,
+            "top_self": [
+                {"function": label, "samples": count, "percent": round(100 * count / samples, 1)}
+                for label, count in self_counts.most_common(25)
+            ] if samples else [],
+            "top_total": [
+                {"function": label, "samples": count, "percent": round(100 * count / samples, 1)}
+                for label, count in total_counts.most_common(25)
+            ] if samples else [],
+            "memory": memory
+        }
+    
+    def get_status(self) -> dict:
+        """Running session, if any, and the last finished result"""
+        return {
+            "active": self.active,
+            "session": dict(self._session) if self.active and self._session else None,
+            "last_result": self.last_result
+        }
+
+
+# Global profiler instance
+profiler = SamplingProfiler()
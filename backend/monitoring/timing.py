@@ -0,0 +1,94 @@
+"""
+Per-request phase timing for the Server-Timing header.
+
+The middleware opens a RequestTiming for each request and keeps it in a
+context variable. Database adapter calls add their duration to it, and
+TimedRoute marks when the endpoint function starts and returns, so the
+request splits into db, handler (endpoint minus db) and serialize
+(response validation and encoding) time.
+"""
+
+import asyncio
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Optional
+
+from fastapi.routing import APIRoute
+
+
+class RequestTiming:
+    """Phase durations of one request, in seconds"""
+    
+    __slots__ = ("started", "db", "db_calls", "endpoint_started", "endpoint_finished")
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db = 0.0
+        self.db_calls = 0
+        self.endpoint_started: Optional[float] = None
+        self.endpoint_finished: Optional[float] = None
+    
+    def add_db(self, seconds: float) -> None:
+        self.db += seconds
+        self.db_calls += 1
+    
+    def header_value(self, now: float) -> str:
+        """Render the phases as a Server-Timing header value"""
+        entries = [f'db;dur={self.db * 1000:.2f};desc="queries={self.db_calls}"']
+        if self.endpoint_started is not None and self.endpoint_finished is not None:
+            endpoint = self.endpoint_finished - self.endpoint_started
+            entries.append(f"handler;dur={max(0.0, endpoint - self.db) * 1000:.2f}")
+            entries.append(f"serialize;dur={(now - self.endpoint_finished) * 1000:.2f}")
+        entries.append(f"total;dur={(now - self.started) * 1000:.2f}")
+        return ", ".join(entries)
+
+
+_current: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+
+def start_request_timing() -> RequestTiming:
+    timing = RequestTiming()
+    _current.set(timing)
+    return timing
+
+
+def current_timing() -> Optional[RequestTiming]:
+    """Timing of the request being handled, if any"""
+    return _current.get()
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    """Wrap an endpoint so its start and end are recorded on the request timing"""
+    if asyncio.iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            timing = _current.get()
+            if timing is None:
+                return await endpoint(*args, **kwargs)
+            timing.endpoint_started = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                timing.endpoint_finished = time.perf_counter()
+    else:
+        # Sync endpoints run in the threadpool with a copy of the context,
+        # which still refers to the same RequestTiming object
+        @wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            timing = _current.get()
+            if timing is None:
+                return endpoint(*args, **kwargs)
+            timing.endpoint_started = time.perf_counter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                timing.endpoint_finished = time.perf_counter()
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """APIRoute whose endpoint reports its own duration to the request timing"""
+    
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
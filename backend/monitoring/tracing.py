@@ -0,0 +1,306 @@
+"""
+Lightweight span tracing with OpenTelemetry-compatible output.
+
+Spans follow the OTLP data model (trace and span ids, parent links, kind,
+nanosecond timestamps, typed attributes, status) and are written as OTLP
+JSON, one ExportTraceServiceRequest per line. That is the format the
+OpenTelemetry Collector's otlpjsonfile receiver reads, so traces can be
+inspected locally or shipped later without a collector in the request path.
+
+Sampling is decided once per trace at the root span. Child spans are only
+created when their trace is sampled, so unsampled requests cost one
+context variable lookup per instrumented call.
+"""
+
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+from typing import Any, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+SERVICE_NAME = "inventory-dashboard"
+
+
+class Span:
+    """One timed operation within a trace"""
+    
+    __slots__ = (
+        "trace_id", "span_id", "parent_span_id", "name", "kind",
+        "start_ns", "end_ns", "attributes", "status_code", "status_message", "_token"
+    )
+    
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str], kind: int, attributes: dict):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status_code = STATUS_OK
+        self.status_message = ""
+        self._token = None
+    
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+    
+    @property
+    def traceparent(self) -> str:
+        """W3C trace context header for this span"""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+    
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc is not None:
+            self.status_code = STATUS_ERROR
+            self.status_message = f"{exc_type.__name__}: {exc}"
+        self.end_ns = time.time_ns()
+        _current_span.reset(self._token)
+        tracer.export(self)
+    
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": self.status_code}
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+class _NotSampled:
+    """Context marker for a trace that was not sampled; children skip it too"""
+    
+    __slots__ = ("_token",)
+    
+    def __enter__(self) -> None:
+        self._token = _current_span.set(NOT_SAMPLED)
+    
+    def __exit__(self, *exc) -> None:
+        _current_span.reset(self._token)
+
+
+class _NoopSpan:
+    """Returned when tracing is off or the trace is unsampled"""
+    
+    def __enter__(self) -> None:
+        return None
+    
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+NOT_SAMPLED = object()
+_NOOP = _NoopSpan()
+_current_span: ContextVar[Union[Span, object, None]] = ContextVar("current_span", default=None)
+
+
+def _otlp_attribute(key: str, value: Any) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[tuple[str, str, bool]]:
+    """Split a W3C traceparent into (trace_id, parent_span_id, sampled)"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+class JsonFileExporter:
+    """Appends OTLP JSON batches to a file from a background thread"""
+    
+    def __init__(self, path: str, max_batch: int = 512):
+        self.path = Path(path)
+        self.max_batch = max_batch
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+    
+    def export(self, span: dict) -> None:
+        if self._thread is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+        self._queue.put(span)
+    
+    def flush(self, timeout: float = 2.0) -> None:
+        """Wait for queued spans to be written (used at shutdown)"""
+        deadline = time.monotonic() + timeout
+        while not self._queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.01)
+    
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self.path.open("a", encoding="utf-8") as f:
+                    f.write(json.dumps(_otlp_request(batch), separators=(",", ":")) + "\n")
+            except OSError as e:
+                logger.error(f"Failed to write traces to {self.path}: {e}")
+
+
+def _otlp_request(spans: list[dict]) -> dict:
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": "monitoring.tracing"}, "spans": spans}]
+        }]
+    }
+
+
+class Tracer:
+    """Creates spans, decides sampling and hands finished spans to exporters"""
+    
+    def __init__(self):
+        self.sample_rate = 0.0
+        self.exporter: Optional[JsonFileExporter] = None
+        # Recent spans kept in memory for the admin endpoint
+        self.recent: deque = deque(maxlen=5000)
+    
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+    
+    def configure(self, sample_rate: float, export_path: Optional[str] = None) -> None:
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.exporter = JsonFileExporter(export_path) if export_path and self.enabled else None
+        if self.enabled:
+            logger.info(f"Tracing enabled at sample rate {self.sample_rate:g}")
+    
+    def start_span(
+        self,
+        name: str,
+        kind: int = SPAN_KIND_INTERNAL,
+        attributes: Optional[dict] = None,
+        traceparent: Optional[str] = None
+    ):
+        """
+        Context manager for a span under the current one.
+        
+        With no current span this starts a trace: an incoming traceparent
+        is continued with its sampling decision, otherwise the trace is
+        sampled at sample_rate.
+        """
+        if not self.enabled:
+            return _NOOP
+        
+        parent = _current_span.get()
+        if parent is NOT_SAMPLED:
+            return _NOOP
+        if isinstance(parent, Span):
+            return Span(name, parent.trace_id, parent.span_id, kind, attributes or {})
+        
+        remote = parse_traceparent(traceparent)
+        if remote:
+            trace_id, parent_span_id, sampled = remote
+        else:
+            trace_id, parent_span_id = f"{random.getrandbits(128):032x}", None
+            sampled = random.random() < self.sample_rate
+        if not sampled:
+            return _NotSampled()
+        return Span(name, trace_id, parent_span_id, kind, attributes or {})
+    
+    def export(self, span: Span) -> None:
+        data = span.to_otlp()
+        self.recent.append(data)
+        if self.exporter:
+            self.exporter.export(data)
+    
+    def flush(self) -> None:
+        if self.exporter:
+            self.exporter.flush()
+    
+    def get_traces(self, trace_id: Optional[str] = None, limit: int = 20) -> list[dict]:
+        """Recent traces, newest first, each with its spans in start order"""
+        traces: dict[str, list[dict]] = {}
+        for span in reversed(self.recent):
+            if trace_id and span["traceId"] != trace_id:
+                continue
+            if span["traceId"] not in traces:
+                if len(traces) >= limit:
+                    continue
+                traces[span["traceId"]] = []
+            traces[span["traceId"]].append(span)
+        
+        result = []
+        for tid, spans in traces.items():
+            spans.sort(key=lambda s: int(s["startTimeUnixNano"]))
+            root = next((s for s in spans if not s.get("parentSpanId")), spans[0])
+            result.append({
+                "trace_id": tid,
+                "root": root["name"],
+                "duration_ms": round(
+                    (int(root["endTimeUnixNano"]) - int(root["startTimeUnixNano"])) / 1e6, 3
+                ),
+                "spans": spans
+            })
+        return result
+
+
+def current_span() -> Optional[Span]:
+    """The active sampled span, if any"""
+    span = _current_span.get()
+    return span if isinstance(span, Span) else None
+
+
+def traced(name: str, kind: int = SPAN_KIND_INTERNAL):
+    """Decorator wrapping an async function in a span"""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return await func(*args, **kwargs)
+            with tracer.start_span(name, kind):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Global tracer instance
+tracer = Tracer()
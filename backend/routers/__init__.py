@@ -2,11 +2,13 @@ from routers.bins import router as bins_router, set_broadcast_bin_update
 from routers.alerts import router as alerts_router
 from routers.export import router as export_router
 from routers.analytics import router as analytics_router
+from routers.admin import router as admin_router
 
 __all__ = [
     "bins_router",
     "alerts_router", 
     "export_router",
     "analytics_router",
+    "admin_router",
     "set_broadcast_bin_update"
 ]
@@ -0,0 +1,130 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+import logging
+
+from config import settings
+from models import ApiResponse
+from admission import admission
+from scheduler import scheduler
+from monitoring import TimedRoute, profiler, tracer, loop_monitor
+from monitoring.profiler import MAX_PROFILE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"], route_class=TimedRoute)
+
+
+@router.get("/jobs", response_model=ApiResponse)
+async def get_jobs():
+    """Get status and timing of background maintenance jobs"""
+    return ApiResponse(
+        success=True,
+        data={
+            "worker": scheduler.owner_id,
+            "jobs": scheduler.get_status()
+        }
+    )
+
+
+@router.post("/jobs/{job_name}/run", response_model=ApiResponse)
+async def run_job(job_name: str):
+    """Run a maintenance job now, in the background"""
+    if not await scheduler.trigger(job_name):
+        raise HTTPException(status_code=404, detail=f"Job {job_name} not found")
+    
+    return ApiResponse(
+        success=True,
+        message=f"Job {job_name} started"
+    )
+
+
+@router.post("/profile", response_model=ApiResponse)
+async def start_profile(
+    seconds: Optional[float] = Query(None, gt=0, le=MAX_PROFILE_SECONDS, description="Stop after this many seconds"),
+    requests: Optional[int] = Query(None, ge=1, description="Stop after this many completed requests"),
+    interval_ms: float = Query(5.0, ge=1, le=1000, description="Sampling interval"),
+    memory: bool = Query(True, description="Take a tracemalloc snapshot at the end")
+):
+    """Start a sampling profiler session on the event loop thread"""
+    if seconds is None and requests is None:
+        seconds = 10
+    
+    try:
+        session = profiler.start(seconds, requests, interval_ms, memory)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    logger.info(f"Profiling started: {session}")
+    return ApiResponse(
+        success=True,
+        data=session,
+        message="Profiling started"
+    )
+
+
+@router.post("/profile/stop", response_model=ApiResponse)
+async def stop_profile():
+    """Stop the running profiler session early"""
+    if not profiler.active:
+        raise HTTPException(status_code=409, detail="No profiling session is running")
+    
+    profiler.stop()
+    return ApiResponse(
+        success=True,
+        message="Profiling stopping"
+    )
+
+
+@router.get("/profile", response_model=ApiResponse)
+async def get_profile():
+    """Get the running session and the last profile: hot functions and top allocations"""
+    return ApiResponse(
+        success=True,
+        data=profiler.get_status()
+    )
+
+
+@router.get("/profile/flamegraph", response_class=PlainTextResponse)
+async def get_flamegraph():
+    """Last profile as collapsed stacks, for flamegraph.pl or speedscope"""
+    if not profiler.last_folded:
+        raise HTTPException(status_code=404, detail="No profile has been recorded")
+    
+    return PlainTextResponse(profiler.last_folded)
+
+
+@router.get("/traces", response_model=ApiResponse)
+async def get_traces(
+    trace_id: Optional[str] = Query(None, description="Return only this trace"),
+    limit: int = Query(20, ge=1, le=200)
+):
+    """Get recently sampled traces with their spans"""
+    if not tracer.enabled:
+        raise HTTPException(status_code=409, detail="Tracing is disabled; set TRACE_SAMPLE_RATE above 0")
+    
+    return ApiResponse(
+        success=True,
+        data=tracer.get_traces(trace_id, limit)
+    )
+
+
+@router.get("/loop", response_model=ApiResponse)
+async def get_loop_health():
+    """Get event loop lag percentiles and stacks of recent loop stalls"""
+    return ApiResponse(
+        success=True,
+        data=loop_monitor.get_status()
+    )
+
+
+@router.get("/admission", response_model=ApiResponse)
+async def get_admission():
+    """Get in-flight and queued requests per request class"""
+    return ApiResponse(
+        success=True,
+        data={
+            "enabled": settings.admission_enabled,
+            "classes": admission.status()
+        }
+    )
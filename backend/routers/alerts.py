@@ -4,13 +4,14 @@ import logging
 
 from models import (
     ApiResponse, PaginatedResponse, AcknowledgeRequest,
-    AlertConfigUpdate, AlertLog, AlertConfiguration
+    AlertConfigUpdate, AlertLog, AlertConfiguration, dump_models
 )
 from services import alert_service
+from monitoring import TimedRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api/alerts", tags=["Alerts"])
+router = APIRouter(prefix="/api/alerts", tags=["Alerts"], route_class=TimedRoute)
 
 
 @router.get("/active", response_model=ApiResponse)
@@ -20,7 +21,7 @@ async def get_active_alerts():
     
     return ApiResponse(
         success=True,
-        data=[alert.model_dump() for alert in alerts]
+        data=dump_models(alerts)
     )
 
 
@@ -35,7 +36,7 @@ async def get_alert_history(
     
     return PaginatedResponse(
         success=True,
-        data=[alert.model_dump() for alert in alerts],
+        data=dump_models(alerts),
         pagination={
             "page": page,
             "limit": limit,
@@ -81,7 +82,7 @@ async def get_alert_configurations(bin_id: Optional[str] = Query(None)):
     
     return ApiResponse(
         success=True,
-        data=[config.model_dump() for config in configs]
+        data=dump_models(configs)
     )
 
 
@@ -1,21 +1,36 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from typing import List, Literal, Optional
 import logging
 
 from models import ApiResponse, StatusDistribution
-from services import inventory_service
+from services import inventory_service, forecast_service, aggregation_service, AggregationQueryError
+from services.columnar import COLUMNAR_MEDIA_TYPE, encode_series, wants_columnar
+from monitoring import TimedRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api/analytics", tags=["Analytics"])
+router = APIRouter(prefix="/api/analytics", tags=["Analytics"], route_class=TimedRoute)
 
 
 @router.get("/trends", response_model=ApiResponse)
 async def get_trends(
+    response: Response,
     start_date: str = Query(..., description="Start date (ISO8601)"),
-    end_date: str = Query(..., description="End date (ISO8601)")
+    end_date: str = Query(..., description="End date (ISO8601)"),
+    max_points: Optional[int] = Query(None, ge=2, description="Downsample each bin to at most this many points"),
+    accept: Optional[str] = Header(None)
 ):
-    """Get inventory trends for all bins"""
-    trends = await inventory_service.get_all_historical_data(start_date, end_date)
+    """Get inventory trends for all bins, as JSON or the packed columnar format"""
+    if wants_columnar(accept):
+        series = await inventory_service.get_all_historical_points(start_date, end_date, max_points)
+        return Response(
+            content=encode_series(series),
+            media_type=COLUMNAR_MEDIA_TYPE,
+            headers={"Vary": "Accept"}
+        )
+    
+    response.headers["Vary"] = "Accept"
+    trends = await inventory_service.get_all_historical_data(start_date, end_date, max_points)
     
     return ApiResponse(
         success=True,
@@ -23,19 +38,35 @@ async def get_trends(
     )
 
 
+@router.get("/aggregate", response_model=ApiResponse)
+async def get_aggregate(
+    start_date: str = Query(..., description="Start date (ISO8601)"),
+    end_date: str = Query(..., description="End date (ISO8601)"),
+    bucket: str = Query("1h", description="Bucket width, e.g. 15m, 1h, 1d, 1w"),
+    metrics: str = Query("avg", description="Comma-separated: min, max, avg, last, count, consumption"),
+    group_by: Literal["bin", "row", "article_type"] = Query("bin"),
+    bin_id: Optional[List[str]] = Query(None, description="Only these bins (repeatable)"),
+    row: Optional[int] = Query(None, ge=1),
+    article_type: Optional[str] = Query(None)
+):
+    """Aggregate history per group and time bucket in one grouped query"""
+    try:
+        result = await aggregation_service.aggregate(
+            start_date, end_date, bucket, metrics, group_by, bin_id, row, article_type
+        )
+    except AggregationQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return ApiResponse(
+        success=True,
+        data=result
+    )
+
+
 @router.get("/consumption", response_model=ApiResponse)
 async def get_consumption_rates():
     """Get consumption rates for all bins"""
-    bins = await inventory_service.get_all_bin_configurations()
-    
-    consumption_data = []
-    for bin_config in bins:
-        rate = await inventory_service.get_consumption_rate(bin_config.bin_id)
-        consumption_data.append({
-            "bin_id": bin_config.bin_id,
-            "article_name": bin_config.article_name,
-            **rate
-        })
+    consumption_data = await inventory_service.get_all_consumption_rates()
     
     return ApiResponse(
         success=True,
@@ -43,6 +74,19 @@ async def get_consumption_rates():
     )
 
 
+@router.get("/forecast", response_model=ApiResponse)
+async def get_forecast(limit: Optional[int] = Query(None, ge=1, description="Most urgent bins only")):
+    """Get predicted time-to-empty and reorder date for every bin, most urgent first"""
+    forecast = await forecast_service.get_forecast()
+    if limit:
+        forecast = {**forecast, "bins": forecast["bins"][:limit]}
+    
+    return ApiResponse(
+        success=True,
+        data=forecast
+    )
+
+
 @router.get("/comparison", response_model=ApiResponse)
 async def get_inventory_comparison():
     """Get current inventory levels comparison for chart"""
@@ -69,19 +113,9 @@ async def get_inventory_comparison():
 @router.get("/status-distribution", response_model=ApiResponse)
 async def get_status_distribution():
     """Get distribution of bin statuses for pie chart"""
-    summary = await inventory_service.get_inventory_summary()
-    
-    distribution = [
-        {"status": "Normal", "count": summary.normal_count, "color": "#22c55e"},
-        {"status": "Low", "count": summary.low_count, "color": "#eab308"},
-        {"status": "Critical", "count": summary.critical_count, "color": "#f97316"},
-        {"status": "Empty", "count": summary.empty_count, "color": "#ef4444"}
-    ]
+    distribution = await inventory_service.get_status_distribution()
     
     return ApiResponse(
         success=True,
-        data={
-            "distribution": distribution,
-            "total": summary.total_bins
-        }
+        data=distribution
     )
@@ -1,17 +1,32 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import (
+    APIRouter, Header, HTTPException, Query, Request, Response, UploadFile, File, WebSocket, WebSocketDisconnect
+)
 from typing import Optional
 from datetime import datetime
+import asyncio
 import logging
 
 from models import (
     BinDataPayload, BinConfigUpdate, BinDisplayData,
-    ApiResponse, InventorySummary, HistoricalDataPoint
+    ApiResponse, InventorySummary, HistoricalDataPoint, BinLayoutRequest,
+    WSMessageType, dump_models
+)
+from admission import admission
+from config import settings
+from database import Priority, current_priority
+from services.columnar import COLUMNAR_MEDIA_TYPE, encode_series, wants_columnar
+from services.ingest_frames import (
+    FORMAT_VERSION as FRAME_VERSION, READING_DTYPE, FrameError, decode_frame, to_payloads, valid_mask
+)
+from services import (
+    inventory_service, alert_service, provisioning_service, forecast_service, anomaly_service,
+    backfill_service, ingest_dedup, dedup_key, BackfillError, LayoutValidationError
 )
-from services import inventory_service, alert_service
+from monitoring import INGEST_READINGS, INGEST_IN_FLIGHT, TimedRoute, current_span
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api/bins", tags=["Bins"])
+router = APIRouter(prefix="/api/bins", tags=["Bins"], route_class=TimedRoute)
 
 # WebSocket broadcast function (set by main app)
 _broadcast_bin_update = None
@@ -21,31 +36,109 @@ def set_broadcast_bin_update(func):
     _broadcast_bin_update = func
 
 
+# Response message per ingest outcome; outcomes double as INGEST_READINGS labels
+INGEST_MESSAGES = {
+    "accepted": "Bin data received and processed",
+    "flagged": "Bin data received and processed; flagged as a likely sensor anomaly",
+    "duplicate": "Duplicate reading ignored",
+    "stale": "Reading stored in history; a newer reading is already current"
+}
+
+# Backfill format by Content-Type; anything else is detected from the first line
+BACKFILL_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson"
+}
+
+
 @router.post("/data", response_model=ApiResponse)
-async def receive_bin_data(data: BinDataPayload):
+async def receive_bin_data(
+    data: BinDataPayload,
+    idempotency_key: Optional[str] = Header(None, max_length=128)
+):
     """
     Receive bin data from hardware sensors.
     This endpoint is called by the edge router when new weight data is available.
+    Retries carrying the same `seq` or `Idempotency-Key` header are no-ops.
     """
     logger.info(f"Received bin data: {data.bin_id} - qty: {data.calculated_quantity}")
     
+    span = current_span()
+    if span:
+        span.set_attribute("bin.id", data.bin_id)
+    
+    INGEST_IN_FLIGHT.inc()
+    try:
+        outcome, result = await _process_reading(data, dedup_key(data.seq, idempotency_key))
+    except HTTPException:
+        INGEST_READINGS.inc(1, "rejected")
+        raise
+    except Exception:
+        INGEST_READINGS.inc(1, "failed")
+        raise
+    finally:
+        INGEST_IN_FLIGHT.dec()
+    
+    INGEST_READINGS.inc(1, outcome)
+    
+    return ApiResponse(
+        success=True,
+        message=INGEST_MESSAGES[outcome],
+        data=result.model_dump() if result else None
+    )
+
+
+async def _process_reading(
+    data: BinDataPayload,
+    key: Optional[str] = None
+) -> tuple[str, Optional[BinDisplayData]]:
+    """
+    Record a reading, broadcast the new bin state and evaluate alerts.
+    
+    Returns the outcome and the bin's display data. Outliers are stored
+    and applied like any other reading, and also logged and broadcast as
+    anomalies. Duplicates and readings older than the bin's latest one are
+    not screened, broadcast or checked for alerts.
+    """
+    timestamp = data.timestamp.isoformat()
+    if key and ingest_dedup.seen(data.bin_id, key, timestamp):
+        return "duplicate", await inventory_service.get_bin_display_data(data.bin_id)
+    
     # Check if bin configuration exists
     bin_config = await inventory_service.get_bin_configuration(data.bin_id)
     if not bin_config:
         raise HTTPException(status_code=404, detail=f"Bin configuration not found for {data.bin_id}")
     
+    anomaly = await anomaly_service.check(data.bin_id, data.calculated_quantity, bin_config.max_capacity)
+    
     # Record inventory data
-    await inventory_service.record_inventory_data(
+    row_id, applied = await inventory_service.record_inventory_data(
         bin_id=data.bin_id,
         weight_grams=data.weight_grams,
         calculated_quantity=data.calculated_quantity,
-        timestamp=data.timestamp.isoformat()
+        timestamp=timestamp,
+        dedup_key=key
     )
+    if key:
+        ingest_dedup.add(data.bin_id, key, timestamp)
+    # Only a new latest reading moves the anomaly window, so retries and late readings can't shift it
+    if row_id is not None and applied:
+        anomaly_service.record(data.bin_id, data.calculated_quantity, bin_config.max_capacity)
+        if anomaly:
+            await anomaly_service.flag(data, anomaly)
     
     # Get updated bin display data
     bin_display_data = await inventory_service.get_bin_display_data(data.bin_id)
+    if row_id is None:
+        return "duplicate", bin_display_data
+    if not applied:
+        return "stale", bin_display_data
     
     if bin_display_data:
+        forecast_service.observe(bin_display_data)
+        
         # Broadcast update via WebSocket
         if _broadcast_bin_update:
             await _broadcast_bin_update(bin_display_data)
@@ -53,10 +146,290 @@ async def receive_bin_data(data: BinDataPayload):
         # Check for alerts
         await alert_service.check_alerts(bin_display_data)
     
+    return ("flagged" if anomaly else "accepted"), bin_display_data
+
+
+async def _process_batch(payloads: list[BinDataPayload], keys: list[Optional[str]]) -> dict[str, int]:
+    """
+    Batched _process_reading for readings that arrive many at a time.
+    
+    Readings are stored in a single transaction. Those newer than their
+    bin's latest stored reading are then screened one by one in time
+    order, as in _process_reading. Each bin whose snapshot moved is
+    broadcast and checked for alerts once, with its newest reading.
+    Returns the number of readings per outcome, plus "rejected" for
+    unknown bins.
+    """
+    counts = dict.fromkeys([*INGEST_MESSAGES, "rejected"], 0)
+    configs = await inventory_service.get_bin_configurations(list({data.bin_id for data in payloads}))
+    # Taken before the write, so the windows are seeded from history without this batch
+    latest = await inventory_service.get_latest_timestamps(list(configs))
+    for bin_id in configs:
+        await anomaly_service.prepare(bin_id)
+    
+    readings = []
+    screened = []
+    for data, key in zip(payloads, keys):
+        timestamp = data.timestamp.isoformat()
+        if key and ingest_dedup.seen(data.bin_id, key, timestamp):
+            counts["duplicate"] += 1
+            continue
+        
+        bin_config = configs.get(data.bin_id)
+        if not bin_config:
+            counts["rejected"] += 1
+            continue
+        
+        readings.append((data.bin_id, data.weight_grams, data.calculated_quantity, timestamp, key))
+        screened.append((timestamp, data, bin_config))
+    
+    result = await inventory_service.record_inventory_batch(readings)
+    
+    # Retries and late readings are no newer than the bin's latest and leave its window alone
+    flagged = 0
+    for timestamp, data, bin_config in sorted(screened, key=lambda item: item[0]):
+        if latest.get(data.bin_id) is not None and timestamp <= latest[data.bin_id]:
+            continue
+        latest[data.bin_id] = timestamp
+        anomaly = await anomaly_service.check(data.bin_id, data.calculated_quantity, bin_config.max_capacity)
+        anomaly_service.record(data.bin_id, data.calculated_quantity, bin_config.max_capacity)
+        if anomaly:
+            await anomaly_service.flag(data, anomaly)
+            flagged += 1
+    # Only remembered once stored, so a batch that failed can be sent again
+    for bin_id, _, _, timestamp, key in readings:
+        if key:
+            ingest_dedup.add(bin_id, key, timestamp)
+    counts["flagged"] += flagged
+    counts["duplicate"] += result["duplicate"]
+    counts["stale"] += result["stale"]
+    counts["accepted"] += max(result["inserted"] - result["stale"] - flagged, 0)
+    
+    for bin_display_data in await inventory_service.get_bins_display_data(result["updated_bins"]):
+        forecast_service.observe(bin_display_data)
+        if _broadcast_bin_update:
+            await _broadcast_bin_update(bin_display_data)
+        await alert_service.check_alerts(bin_display_data)
+    
+    return counts
+
+
+@router.websocket("/stream")
+async def stream_bin_data(websocket: WebSocket):
+    """
+    Persistent ingest channel for edge routers.
+    
+    Clients send binary frames of packed readings (see services.ingest_frames)
+    and may have up to ingest_stream_window frames unacknowledged. Frames
+    are processed in order; an ingest_ack message lists the frames it covers
+    and their outcome counts. A frame named in an error message was not
+    processed and should be sent again.
+    """
+    await websocket.accept()
+    # Not seen by the admission middleware; queries still run at ingest priority
+    current_priority.set(Priority.INGEST)
+    window = max(settings.ingest_stream_window, 1)
+    await websocket.send_json({
+        "type": WSMessageType.INGEST_READY.value,
+        "payload": {
+            "version": FRAME_VERSION,
+            "window": window,
+            "max_readings": settings.ingest_stream_max_readings,
+            "record_bytes": READING_DTYPE.itemsize
+        },
+        "timestamp": datetime.now().isoformat()
+    })
+    
+    # Bounded by the window, so a sender that ignores it is slowed by TCP backpressure
+    frames: asyncio.Queue = asyncio.Queue(maxsize=window)
+    worker = asyncio.create_task(_process_frames(websocket, frames, window))
+    try:
+        while not worker.done():
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is None:
+                await _send_stream_error(websocket, None, "Readings must be sent as binary frames")
+                continue
+            if not frames.full():
+                frames.put_nowait(message["bytes"])
+            elif not await _put_unless_stopped(frames, message["bytes"], worker):
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+
+
+async def _put_unless_stopped(frames: asyncio.Queue, payload: bytes, worker: asyncio.Task) -> bool:
+    """Wait for room in the frame queue; False when the worker stops first"""
+    put = asyncio.ensure_future(frames.put(payload))
+    try:
+        await asyncio.wait((put, worker), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        if not put.done():
+            put.cancel()
+    return put.done() and not put.cancelled()
+
+
+async def _process_frames(websocket: WebSocket, frames: asyncio.Queue, window: int) -> None:
+    """Process queued frames in order, acknowledging each burst once it is drained"""
+    try:
+        await _drain_frames(websocket, frames, window)
+    except Exception as e:
+        # Close the socket, so a receive loop waiting on the router does not wait forever
+        logger.error(f"Ingest stream failed: {e}")
+        try:
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+        raise
+
+
+async def _drain_frames(websocket: WebSocket, frames: asyncio.Queue, window: int) -> None:
+    acked: list[int] = []
+    totals: dict[str, int] = {}
+    
+    while True:
+        payload = await frames.get()
+        try:
+            frame_id, readings = decode_frame(payload, settings.ingest_stream_max_readings)
+        except FrameError as e:
+            await _send_stream_error(websocket, None, str(e))
+            continue
+        
+        if settings.admission_enabled and not await admission.acquire(Priority.INGEST):
+            await _send_stream_error(websocket, frame_id, "Server is at capacity; resend this frame later")
+            continue
+        INGEST_IN_FLIGHT.inc(len(readings))
+        try:
+            mask = valid_mask(readings)
+            payloads = to_payloads(readings[mask])
+            counts = await _process_batch(payloads, [dedup_key(data.seq, None) for data in payloads])
+            counts["rejected"] += len(readings) - len(payloads)
+        except Exception as e:
+            logger.error(f"Ingest frame {frame_id} failed: {e}")
+            await _send_stream_error(websocket, frame_id, "Frame could not be processed")
+            continue
+        finally:
+            INGEST_IN_FLIGHT.dec(len(readings))
+            if settings.admission_enabled:
+                admission.release(Priority.INGEST)
+        
+        for outcome, count in counts.items():
+            if count:
+                INGEST_READINGS.inc(count, outcome)
+                totals[outcome] = totals.get(outcome, 0) + count
+        acked.append(frame_id)
+        
+        # Acknowledge when the sender's burst is drained, or every half window so it never stalls
+        if frames.empty() or len(acked) >= max(window // 2, 1):
+            await websocket.send_json({
+                "type": WSMessageType.INGEST_ACK.value,
+                "payload": {"frame_ids": acked, **totals},
+                "timestamp": datetime.now().isoformat()
+            })
+            acked, totals = [], {}
+
+
+async def _send_stream_error(websocket: WebSocket, frame_id: Optional[int], message: str) -> None:
+    await websocket.send_json({
+        "type": WSMessageType.ERROR.value,
+        "payload": {"frame_id": frame_id, "message": message},
+        "timestamp": datetime.now().isoformat()
+    })
+
+
+@router.post("/backfill", response_model=ApiResponse)
+async def backfill_bin_data(
+    request: Request,
+    fmt: Optional[str] = Query(None, alias="format", pattern="^(ndjson|csv)$")
+):
+    """
+    Bulk load readings an edge router buffered while offline.
+    
+    The body is NDJSON or CSV, optionally gzip-compressed, and is read as a
+    stream (see services.backfill_service). History is written in large
+    batches; each bin's snapshot moves once, to its newest reading. The
+    backfilled history is not replayed to dashboards or alerting: every bin
+    that moved is broadcast and checked for alerts once, in its final state.
+    """
+    if fmt is None:
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        fmt = BACKFILL_CONTENT_TYPES.get(content_type)
+    
+    error = None
+    try:
+        report = await backfill_service.backfill(request.stream(), fmt)
+    except BackfillError as e:
+        # Batches stored before the failure are kept; publish them before answering
+        report, error = e.report, str(e)
+    
+    for bin_display_data in await inventory_service.get_bins_display_data(report["updated_bins"]):
+        if _broadcast_bin_update:
+            await _broadcast_bin_update(bin_display_data)
+        await alert_service.check_alerts(bin_display_data)
+    if report["inserted"]:
+        # Backfilled history predates what the forecast has seen; refit it from history
+        forecast_service.warm_up()
+    
+    if error:
+        raise HTTPException(status_code=400, detail={"message": error, "report": report})
+    
+    return ApiResponse(
+        success=True,
+        message=f"Backfilled {report['inserted']} of {report['rows']} readings",
+        data=report
+    )
+
+
+@router.post("/provision", response_model=ApiResponse)
+async def provision_bins(request: BinLayoutRequest):
+    """
+    Bulk provision bins from a JSON layout.
+    All entries are validated before anything is written; the whole layout
+    is applied in one transaction and the response reports the diff.
+    """
+    try:
+        report = await provisioning_service.provision(request.bins, dry_run=request.dry_run)
+    except LayoutValidationError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "errors": e.errors})
+    
+    if not request.dry_run:
+        forecast_service.invalidate()
+    
     return ApiResponse(
         success=True,
-        message="Bin data received and processed",
-        data=bin_display_data.model_dump() if bin_display_data else None
+        message="Layout validated" if request.dry_run else "Layout provisioned",
+        data=report
+    )
+
+
+@router.post("/provision/upload", response_model=ApiResponse)
+async def provision_bins_upload(
+    file: UploadFile = File(..., description="CSV or JSON layout file"),
+    dry_run: bool = Query(False)
+):
+    """Bulk provision bins from an uploaded CSV or JSON layout file"""
+    filename = (file.filename or "").lower()
+    fmt = "json" if filename.endswith(".json") or file.content_type == "application/json" else "csv"
+    
+    try:
+        entries = provisioning_service.parse_layout(await file.read(), fmt)
+        report = await provisioning_service.provision(entries, dry_run=dry_run)
+    except LayoutValidationError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "errors": e.errors})
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse layout: {e}")
+    
+    if not dry_run:
+        forecast_service.invalidate()
+    
+    return ApiResponse(
+        success=True,
+        message="Layout validated" if dry_run else "Layout provisioned",
+        data=report
     )
 
 
@@ -66,7 +439,7 @@ async def get_all_bins():
     inventory = await inventory_service.get_current_inventory()
     return ApiResponse(
         success=True,
-        data=[bin_data.model_dump() for bin_data in inventory]
+        data=dump_models(inventory)
     )
 
 
@@ -80,6 +453,20 @@ async def get_inventory_summary():
     )
 
 
+@router.get("/anomalies", response_model=ApiResponse)
+async def get_flagged_readings(
+    limit: int = Query(50, ge=1, le=500),
+    bin_id: Optional[str] = Query(None)
+):
+    """Get recent readings flagged by the anomaly detector"""
+    readings = await anomaly_service.get_flagged(limit, bin_id)
+    
+    return ApiResponse(
+        success=True,
+        data=[reading.model_dump() for reading in readings]
+    )
+
+
 @router.get("/{bin_id}", response_model=ApiResponse)
 async def get_bin(bin_id: str):
     """Get single bin details"""
@@ -103,6 +490,8 @@ async def update_bin_config(bin_id: str, updates: BinConfigUpdate):
         raise HTTPException(status_code=404, detail=f"Failed to update bin {bin_id}")
     
     updated_bin = await inventory_service.get_bin_configuration(bin_id)
+    # Reorder points come from thresholds, so cached forecasts are stale
+    forecast_service.invalidate()
     
     return ApiResponse(
         success=True,
@@ -114,16 +503,28 @@ async def update_bin_config(bin_id: str, updates: BinConfigUpdate):
 @router.get("/{bin_id}/history", response_model=ApiResponse)
 async def get_bin_history(
     bin_id: str,
+    response: Response,
     start_date: str = Query(..., description="Start date (ISO8601)"),
     end_date: str = Query(..., description="End date (ISO8601)"),
-    limit: int = Query(1000, ge=1, le=10000)
+    limit: int = Query(1000, ge=1, le=10000),
+    max_points: Optional[int] = Query(None, ge=2, description="Downsample to at most this many points"),
+    accept: Optional[str] = Header(None)
 ):
-    """Get historical data for a bin"""
-    history = await inventory_service.get_historical_data(bin_id, start_date, end_date, limit)
+    """Get historical data for a bin, as JSON or the packed columnar format"""
+    if wants_columnar(accept):
+        points = await inventory_service.get_historical_points(bin_id, start_date, end_date, limit, max_points)
+        return Response(
+            content=encode_series([(bin_id, points)]),
+            media_type=COLUMNAR_MEDIA_TYPE,
+            headers={"Vary": "Accept"}
+        )
+    
+    response.headers["Vary"] = "Accept"
+    history = await inventory_service.get_historical_data(bin_id, start_date, end_date, limit, max_points)
     
     return ApiResponse(
         success=True,
-        data=[h.model_dump() for h in history]
+        data=dump_models(history)
     )
 
 
@@ -6,10 +6,11 @@ from io import BytesIO
 import logging
 
 from services import export_service
+from monitoring import TimedRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api/export", tags=["Export"])
+router = APIRouter(prefix="/api/export", tags=["Export"], route_class=TimedRoute)
 
 
 @router.get("/inventory")
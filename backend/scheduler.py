@@ -0,0 +1,332 @@
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from database import get_database, Priority, current_priority
+from monitoring import registry
+
+logger = logging.getLogger(__name__)
+
+
+class CronSchedule:
+    """
+    Minimal five-field cron expression (minute hour day month weekday).
+    
+    Supports ``*``, ``*/n``, ``a-b``, ``a-b/n`` and comma-separated lists.
+    Weekday 0 is Sunday.
+    """
+    
+    _RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+    
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse_field(f, lo, hi) for f, (lo, hi) in zip(fields, self._RANGES)
+        )
+    
+    @staticmethod
+    def _parse_field(spec: str, lo: int, hi: int) -> set[int]:
+        values: set[int] = set()
+        for part in spec.split(","):
+            step = 1
+            if "/" in part:
+                part, step_str = part.split("/", 1)
+                step = int(step_str)
+            if part == "*":
+                start, end = lo, hi
+            elif "-" in part:
+                start, end = (int(x) for x in part.split("-", 1))
+            else:
+                start = end = int(part)
+            if start < lo or end > hi or step < 1:
+                raise ValueError(f"Cron field out of range: {spec!r}")
+            values.update(range(start, end + 1, step))
+        return values
+    
+    def next_after(self, moment: datetime) -> datetime:
+        """First matching minute strictly after the given time"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # One year of minutes bounds the search for any valid expression
+        for _ in range(366 * 24 * 60):
+            if (
+                candidate.minute in self.minutes
+                and candidate.hour in self.hours
+                and candidate.day in self.days
+                and candidate.month in self.months
+                and (candidate.weekday() + 1) % 7 in self.weekdays
+            ):
+                return candidate
+            candidate += timedelta(minutes=1)
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+
+@dataclass
+class JobStats:
+    """Per-job timing and outcome counters"""
+    runs: int = 0
+    failures: int = 0
+    skipped_locked: int = 0
+    last_started: Optional[str] = None
+    last_finished: Optional[str] = None
+    last_duration_ms: Optional[float] = None
+    total_duration_ms: float = 0.0
+    max_duration_ms: float = 0.0
+    last_error: Optional[str] = None
+    last_result: Optional[dict] = None
+
+
+@dataclass
+class Job:
+    """A periodic maintenance job"""
+    name: str
+    func: Callable[[], Awaitable[Optional[dict]]]
+    interval_seconds: Optional[float] = None
+    cron: Optional[CronSchedule] = None
+    jitter_seconds: float = 0.0
+    timeout_seconds: float = 3600.0
+    # False for jobs that refresh per-process state, which every worker must run
+    single_instance: bool = True
+    next_due: Optional[datetime] = None
+    next_run: Optional[datetime] = None
+    running: bool = False
+    stats: JobStats = field(default_factory=JobStats)
+    
+    def schedule_next(self, now: datetime) -> None:
+        if self.cron:
+            base = self.cron.next_after(now)
+        else:
+            base = now + timedelta(seconds=self.interval_seconds)
+        self.next_due = base
+        # Jitter spreads workers and restarts so jobs don't fire in lockstep
+        self.next_run = base + timedelta(seconds=random.uniform(0, self.jitter_seconds))
+    
+    def to_dict(self) -> dict:
+        stats = self.stats
+        return {
+            "name": self.name,
+            "schedule": self.cron.expression if self.cron else f"every {self.interval_seconds:g}s",
+            "jitter_seconds": self.jitter_seconds,
+            "single_instance": self.single_instance,
+            "running": self.running,
+            "next_run": self.next_run.isoformat() if self.next_run else None,
+            "runs": stats.runs,
+            "failures": stats.failures,
+            "skipped_locked": stats.skipped_locked,
+            "last_started": stats.last_started,
+            "last_finished": stats.last_finished,
+            "last_duration_ms": stats.last_duration_ms,
+            "avg_duration_ms": round(stats.total_duration_ms / stats.runs, 1) if stats.runs else None,
+            "max_duration_ms": stats.max_duration_ms,
+            "last_error": stats.last_error,
+            "last_result": stats.last_result
+        }
+
+
+class Scheduler:
+    """
+    Lightweight asyncio scheduler for background maintenance.
+    
+    Each job runs in its own task. Before running, a job takes a lease
+    row in scheduler_locks so that when several workers share a database
+    only one of them executes it. The lease is kept after the run until
+    the next occurrence is due, so workers whose timers fire later skip
+    the occurrence that was already run. Jobs registered with
+    single_instance=False take no lease and run on every worker.
+    """
+    
+    def __init__(self):
+        self.jobs: dict[str, Job] = {}
+        self.owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks: set[asyncio.Task] = set()
+    
+    def add_interval_job(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Optional[dict]]],
+        seconds: float,
+        jitter_seconds: float = 0.0,
+        timeout_seconds: float = 3600.0,
+        single_instance: bool = True
+    ) -> Job:
+        """Register a job that runs every N seconds"""
+        job = Job(name, func, interval_seconds=seconds, jitter_seconds=jitter_seconds,
+                  timeout_seconds=timeout_seconds, single_instance=single_instance)
+        self.jobs[name] = job
+        return job
+    
+    def add_cron_job(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Optional[dict]]],
+        expression: str,
+        jitter_seconds: float = 0.0,
+        timeout_seconds: float = 3600.0,
+        single_instance: bool = True
+    ) -> Job:
+        """Register a job that runs on a cron-like schedule"""
+        job = Job(name, func, cron=CronSchedule(expression), jitter_seconds=jitter_seconds,
+                  timeout_seconds=timeout_seconds, single_instance=single_instance)
+        self.jobs[name] = job
+        return job
+    
+    def start(self) -> None:
+        """Start one task per registered job"""
+        now = datetime.now()
+        for job in self.jobs.values():
+            job.schedule_next(now)
+            self._spawn(self._job_loop(job), f"job:{job.name}")
+        logger.info(f"Scheduler started with {len(self.jobs)} jobs")
+    
+    async def stop(self) -> None:
+        """Cancel all job tasks and wait for them to finish"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        logger.info("Scheduler stopped")
+    
+    def _spawn(self, coro: Awaitable, name: str) -> None:
+        # Jobs are bulk work: their queries wait behind ingest and interactive requests
+        context = contextvars.copy_context()
+        context.run(current_priority.set, Priority.BULK)
+        task = asyncio.create_task(coro, name=name, context=context)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _job_loop(self, job: Job) -> None:
+        while True:
+            # A manual run in between moves next_run, so check it again after waking
+            while (delay := (job.next_run - datetime.now()).total_seconds()) > 0:
+                await asyncio.sleep(delay)
+            if not await self.run_job(job):
+                job.schedule_next(datetime.now())
+    
+    async def _acquire(self, job: Job) -> bool:
+        """Take the job lease if it is free or expired"""
+        db = await get_database()
+        now = time.time()
+        # A lease still held, by us or anyone, returns no row
+        async with db.transaction():
+            row = await db.fetch_one(
+                """INSERT INTO scheduler_locks (job_name, owner, expires_at)
+                   VALUES (?, ?, ?)
+                   ON CONFLICT(job_name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                   WHERE scheduler_locks.expires_at <= ?
+                   RETURNING owner""",
+                (job.name, self.owner_id, now + job.timeout_seconds, now)
+            )
+        return row is not None
+    
+    async def _hold(self, job: Job) -> None:
+        """Keep the lease until the next occurrence is due, before any worker's jitter"""
+        db = await get_database()
+        await db.execute(
+            "UPDATE scheduler_locks SET expires_at = ? WHERE job_name = ? AND owner = ?",
+            (job.next_due.timestamp(), job.name, self.owner_id)
+        )
+    
+    async def run_job(self, job: Job) -> bool:
+        """
+        Run a job once under its lease, recording timing and outcome.
+        
+        Returns False without running when the job is already running
+        here or another worker holds the lease. After a run the next
+        occurrence is scheduled.
+        """
+        if job.running:
+            return False
+        
+        try:
+            if job.single_instance and not await self._acquire(job):
+                job.stats.skipped_locked += 1
+                logger.debug(f"Job {job.name} is leased by another worker, skipping")
+                return False
+        except Exception as e:
+            logger.error(f"Could not acquire lock for job {job.name}: {e}")
+            return False
+        
+        job.running = True
+        stats = job.stats
+        stats.last_started = datetime.now().isoformat()
+        started = time.perf_counter()
+        
+        try:
+            stats.last_result = await asyncio.wait_for(job.func(), timeout=job.timeout_seconds)
+            stats.last_error = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            stats.failures += 1
+            stats.last_error = f"{type(e).__name__}: {e}"
+            logger.error(f"Job {job.name} failed: {stats.last_error}")
+        finally:
+            duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            stats.runs += 1
+            stats.last_duration_ms = duration_ms
+            stats.total_duration_ms += duration_ms
+            stats.max_duration_ms = max(stats.max_duration_ms, duration_ms)
+            stats.last_finished = datetime.now().isoformat()
+            job.running = False
+            job.schedule_next(datetime.now())
+            if job.single_instance:
+                try:
+                    await self._hold(job)
+                except Exception as e:
+                    logger.warning(f"Could not extend lock for job {job.name}: {e}")
+        
+        logger.debug(f"Job {job.name} finished in {duration_ms}ms")
+        return True
+    
+    async def trigger(self, name: str) -> bool:
+        """Run a job in the background unless another worker holds its lease; False if unknown"""
+        job = self.jobs.get(name)
+        if not job:
+            return False
+        self._spawn(self.run_job(job), f"job:{name}:manual")
+        return True
+    
+    def get_status(self) -> list[dict]:
+        """Status of every registered job"""
+        return [job.to_dict() for job in self.jobs.values()]
+
+
+# Global scheduler instance
+scheduler = Scheduler()
+
+
+def _collect_job_metrics() -> list[str]:
+    """Expose per-job run counts and durations at /metrics"""
+    lines = [
+        "# HELP scheduler_job_runs_total Maintenance job runs",
+        "# TYPE scheduler_job_runs_total counter",
+    ]
+    lines += [f'scheduler_job_runs_total{{job="{j.name}"}} {j.stats.runs}' for j in scheduler.jobs.values()]
+    lines += [
+        "# HELP scheduler_job_failures_total Maintenance job failures",
+        "# TYPE scheduler_job_failures_total counter",
+    ]
+    lines += [f'scheduler_job_failures_total{{job="{j.name}"}} {j.stats.failures}' for j in scheduler.jobs.values()]
+    lines += [
+        "# HELP scheduler_job_last_duration_seconds Duration of the last run",
+        "# TYPE scheduler_job_last_duration_seconds gauge",
+    ]
+    lines += [
+        f'scheduler_job_last_duration_seconds{{job="{j.name}"}} {j.stats.last_duration_ms / 1000}'
+        for j in scheduler.jobs.values() if j.stats.last_duration_ms is not None
+    ]
+    return lines
+
+
+registry.add_collector(_collect_job_metrics)
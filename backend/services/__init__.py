@@ -1,6 +1,15 @@
 from services.inventory_service import inventory_service, InventoryService
 from services.alert_service import alert_service, AlertService, set_broadcast_alert
 from services.export_service import export_service, ExportService
+from services.retention_service import retention_service, RetentionService
+from services.maintenance_service import maintenance_service, MaintenanceService
+from services.provisioning_service import provisioning_service, ProvisioningService, LayoutValidationError
+from services.forecast_service import forecast_service, ForecastService
+from services.anomaly_service import anomaly_service, AnomalyService, set_broadcast_anomaly
+from services.query_cache import query_cache, QueryCache
+from services.ingest_dedup import ingest_dedup, DedupWindow, dedup_key
+from services.backfill_service import backfill_service, BackfillService, BackfillError
+from services.aggregation_service import aggregation_service, AggregationService, AggregationQueryError
 
 __all__ = [
     "inventory_service",
@@ -9,5 +18,28 @@ __all__ = [
     "AlertService",
     "set_broadcast_alert",
     "export_service",
-    "ExportService"
+    "ExportService",
+    "retention_service",
+    "RetentionService",
+    "maintenance_service",
+    "MaintenanceService",
+    "provisioning_service",
+    "ProvisioningService",
+    "LayoutValidationError",
+    "forecast_service",
+    "ForecastService",
+    "anomaly_service",
+    "AnomalyService",
+    "set_broadcast_anomaly",
+    "query_cache",
+    "QueryCache",
+    "aggregation_service",
+    "AggregationService",
+    "AggregationQueryError",
+    "ingest_dedup",
+    "DedupWindow",
+    "dedup_key",
+    "backfill_service",
+    "BackfillService",
+    "BackfillError"
 ]
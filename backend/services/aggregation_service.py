@@ -0,0 +1,253 @@
+"""
+Time-bucketed aggregation of reading history.
+
+A query names a bucket width, the aggregates it wants, the dimension to
+group by and optional filters. It is compiled into one grouped SQL query,
+so the database returns one row per group and bucket instead of every raw
+reading.
+
+Aggregates:
+- min, max, avg and count are taken over every reading in the bucket.
+- last is the bin's final reading in the bucket. When grouping by row or
+  article type it is the group's stock at the end of the bucket: the sum
+  of every bin's latest reading so far, so a bin that did not report in
+  the bucket counts with its earlier reading, from before the range if
+  need be.
+- consumption is the units removed in the bucket: every drop between a
+  bin's consecutive readings is added up and rises (restocks) are ignored.
+  The first reading in a bucket is compared with the reading before it,
+  so usage across a bucket boundary is counted once.
+"""
+
+import logging
+import re
+from datetime import datetime
+from typing import Optional
+
+from database import get_database
+
+logger = logging.getLogger(__name__)
+
+BUCKET_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 604800}
+MIN_BUCKET_SECONDS = 60
+
+# A query may not return more buckets than this per group
+MAX_BUCKETS = 10_000
+
+METRICS = ("min", "max", "avg", "last", "count", "consumption")
+
+# Dimension name -> column in the readings CTE, also the key in each result row
+GROUP_BY = {
+    "bin": "bin_id",
+    "row": "row",
+    "article_type": "article_type"
+}
+
+_BUCKET_PATTERN = re.compile(r"^(\d+)([mhdw])$")
+
+# Each bin is aggregated per bucket first, then bins are rolled up into groups.
+# Every per-bin row carries its reading count and total so averages stay exact.
+_PER_BIN_SQL = {
+    "min": "MIN(quantity) AS min",
+    "max": "MAX(quantity) AS max",
+    "last": "SUM(CASE WHEN next_bucket IS NOT bucket THEN quantity END) AS last",
+    "consumption": "COALESCE(SUM(MAX(previous - quantity, 0)), 0) AS consumption"
+}
+
+_ROLLUP_SQL = {
+    "min": "MIN(min)",
+    "max": "MAX(max)",
+    "avg": "ROUND(SUM(total) * 1.0 / SUM(count), 2)",
+    "count": "SUM(count)",
+    "last": "SUM(last)",
+    "consumption": "SUM(consumption)"
+}
+
+
+class AggregationQueryError(ValueError):
+    """Raised when an aggregation query cannot be compiled"""
+
+
+def parse_bucket(bucket: str) -> int:
+    """Bucket width in seconds for strings like 15m, 1h, 1d or 1w"""
+    match = _BUCKET_PATTERN.match(bucket.strip().lower())
+    if not match:
+        raise AggregationQueryError(f"Invalid bucket {bucket!r}; use a number and m, h, d or w, e.g. 1h")
+    
+    seconds = int(match.group(1)) * BUCKET_UNITS[match.group(2)]
+    if seconds < MIN_BUCKET_SECONDS:
+        raise AggregationQueryError(f"Bucket must be at least {MIN_BUCKET_SECONDS} seconds")
+    return seconds
+
+
+def parse_metrics(metrics: str) -> list[str]:
+    """Requested aggregates in order, without duplicates"""
+    names = list(dict.fromkeys(m.strip().lower() for m in metrics.split(",") if m.strip()))
+    unknown = [m for m in names if m not in METRICS]
+    if unknown or not names:
+        raise AggregationQueryError(
+            f"Unknown metrics {', '.join(unknown) or '(none)'}; choose from {', '.join(METRICS)}"
+        )
+    return names
+
+
+def _bucket_sql(column: str, bucket_seconds: int) -> str:
+    """SQL for the start of the bucket holding a timestamp column, in epoch seconds"""
+    return f"(CAST(strftime('%s', {column}) AS INTEGER) / {bucket_seconds}) * {bucket_seconds}"
+
+
+def compile_query(
+    bucket_seconds: int,
+    metrics: list[str],
+    group_by: str,
+    start_date: str,
+    end_date: str,
+    bin_ids: Optional[list[str]] = None,
+    row: Optional[int] = None,
+    article_type: Optional[str] = None
+) -> tuple[str, tuple]:
+    """Build the grouped SQL and its parameters for one aggregation query"""
+    if group_by not in GROUP_BY:
+        raise AggregationQueryError(f"Unknown group_by {group_by!r}; choose from {', '.join(GROUP_BY)}")
+    key = GROUP_BY[group_by]
+    
+    # Window columns are only computed when an aggregate needs them. Both
+    # share one window, so the readings are ordered once.
+    columns = [
+        "d.bin_id", "d.calculated_quantity AS quantity",
+        f"{_bucket_sql('d.timestamp', bucket_seconds)} AS bucket"
+    ]
+    if "consumption" in metrics:
+        columns.append("LAG(d.calculated_quantity) OVER by_bin AS previous")
+    if "last" in metrics:
+        # A bin's last reading in a bucket is the one whose successor falls in another bucket
+        columns.append(f"LEAD({_bucket_sql('d.timestamp', bucket_seconds)}) OVER by_bin AS next_bucket")
+    window = ""
+    if "consumption" in metrics or "last" in metrics:
+        window = "\n               WINDOW by_bin AS (PARTITION BY d.bin_id ORDER BY d.timestamp)"
+    
+    filters = ["d.timestamp BETWEEN ? AND ?"]
+    params: list = [start_date, end_date]
+    if bin_ids:
+        filters.append(f"d.bin_id IN ({', '.join('?' * len(bin_ids))})")
+        params.extend(bin_ids)
+    bin_filters = []
+    bin_params: list = []
+    if row is not None:
+        bin_filters.append("row = ?")
+        bin_params.append(row)
+    if article_type:
+        bin_filters.append("article_type = ?")
+        bin_params.append(article_type)
+    params.extend(bin_params)
+    if bin_filters:
+        filters.append(f"d.bin_id IN (SELECT bin_id FROM bin_configurations WHERE {' AND '.join(bin_filters)})")
+    
+    per_bin = ", ".join(["SUM(quantity) AS total", "COUNT(*) AS count"] + [
+        _PER_BIN_SQL[m] for m in metrics if m in _PER_BIN_SQL
+    ])
+    rollup_sql = dict(_ROLLUP_SQL)
+    # Bin attributes are joined onto the per-bin rows, not onto every reading
+    source = "per_bin" if key == "bin_id" else "per_bin\n           JOIN bin_configurations bc ON bc.bin_id = per_bin.bin_id"
+    carried = ""
+    if key != "bin_id" and "last" in metrics:
+        # A group's stock only moves when one of its bins reports: its stock
+        # before the range plus a running sum of each bin's change in last.
+        # A bin's reading before the range is looked up for its first bucket only
+        opening_filters = list(bin_filters)
+        if bin_ids:
+            opening_filters.append(f"bin_id IN ({', '.join('?' * len(bin_ids))})")
+        params.extend([start_date, *bin_params, *(bin_ids or []), start_date])
+        before_range = """(SELECT calculated_quantity FROM inventory_data
+                       WHERE bin_id = {bin_id} AND timestamp < ?
+                       ORDER BY timestamp DESC LIMIT 1)"""
+        carried = f""",
+           opening AS (
+               SELECT {key}, SUM({before_range.format(bin_id="bc.bin_id")}) AS stock
+               FROM bin_configurations bc{' WHERE ' + ' AND '.join(opening_filters) if opening_filters else ''}
+               GROUP BY {key}
+           ),
+           changes AS (
+               SELECT per_bin.*, bc.{key},
+                      last - COALESCE(
+                          LAG(last) OVER (PARTITION BY per_bin.bin_id ORDER BY bucket),
+                          {before_range.format(bin_id="per_bin.bin_id")},
+                          0
+                      ) AS last_change
+               FROM {source}
+           )"""
+        # One opening row per group, so the join does not multiply the bin rows
+        source = f"changes\n           LEFT JOIN opening USING ({key})"
+        rollup_sql["last"] = (
+            "COALESCE(MAX(opening.stock), 0)"
+            f" + SUM(SUM(last_change)) OVER (PARTITION BY {key} ORDER BY bucket)"
+        )
+    rollup = ",\n                  ".join(f"{rollup_sql[m]} AS {m}" for m in metrics)
+    
+    sql = f"""WITH readings AS (
+               SELECT {', '.join(columns)}
+               FROM inventory_data d
+               WHERE {' AND '.join(filters)}{window}
+           ),
+           per_bin AS (
+               SELECT bin_id, bucket, {per_bin}
+               FROM readings
+               GROUP BY bin_id, bucket
+           ){carried}
+           SELECT {key},
+                  strftime('%Y-%m-%dT%H:%M:%S', bucket, 'unixepoch') AS bucket_start,
+                  {rollup}
+           FROM {source}
+           GROUP BY {key}, bucket
+           ORDER BY {key}, bucket"""
+    
+    return sql, tuple(params)
+
+
+class AggregationService:
+    """Service for grouped, time-bucketed history queries"""
+    
+    async def aggregate(
+        self,
+        start_date: str,
+        end_date: str,
+        bucket: str = "1h",
+        metrics: str = "avg",
+        group_by: str = "bin",
+        bin_ids: Optional[list[str]] = None,
+        row: Optional[int] = None,
+        article_type: Optional[str] = None
+    ) -> dict:
+        """Aggregate readings per group and bucket in a single query"""
+        bucket_seconds = parse_bucket(bucket)
+        names = parse_metrics(metrics)
+        
+        try:
+            span = datetime.fromisoformat(end_date) - datetime.fromisoformat(start_date)
+        except (TypeError, ValueError) as e:
+            raise AggregationQueryError(f"Invalid date range: {e}")
+        if span.total_seconds() < 0:
+            raise AggregationQueryError("end_date is before start_date")
+        if span.total_seconds() / bucket_seconds > MAX_BUCKETS:
+            raise AggregationQueryError(
+                f"Range holds more than {MAX_BUCKETS} buckets of {bucket}; use a wider bucket"
+            )
+        
+        sql, params = compile_query(
+            bucket_seconds, names, group_by, start_date, end_date, bin_ids, row, article_type
+        )
+        
+        db = await get_database()
+        rows = await db.fetch_all(sql, params)
+        
+        return {
+            "bucket": bucket,
+            "bucket_seconds": bucket_seconds,
+            "group_by": GROUP_BY[group_by],
+            "metrics": names,
+            "rows": rows
+        }
+
+
+# Singleton instance
+aggregation_service = AggregationService()
@@ -1,9 +1,14 @@
 import logging
 from typing import Optional
-from datetime import datetime, timedelta
 
+from config import settings
 from database import get_database
-from models import AlertLog, AlertConfiguration, BinDisplayData, AlertType
+from models import (
+    AlertLog, AlertConfiguration, BinDisplayData, AlertType,
+    alert_configurations_from_rows, alert_logs_from_rows
+)
+from monitoring import ALERTS_FIRED, ALERT_EVALUATION_SECONDS, traced
+from services.query_cache import query_cache, ALERTS
 
 logger = logging.getLogger(__name__)
 
@@ -19,8 +24,13 @@ def set_broadcast_alert(func):
 class AlertService:
     """Service for managing alerts"""
     
+    @traced("alerts.check_alerts")
     async def check_alerts(self, bin_data: BinDisplayData) -> list[AlertLog]:
         """Check and generate alerts for a bin"""
+        with ALERT_EVALUATION_SECONDS.time():
+            return await self._check_alerts(bin_data)
+    
+    async def _check_alerts(self, bin_data: BinDisplayData) -> list[AlertLog]:
         alerts = []
         db = await get_database()
         
@@ -59,9 +69,11 @@ class AlertService:
             
             if should_alert:
                 # Check cooldown
-                recent_alert = await self.get_recent_alert(bin_data.bin_id, alert_type, 30)
+                in_cooldown = await self.is_in_cooldown(
+                    bin_data.bin_id, alert_type, settings.alert_cooldown_minutes
+                )
                 
-                if not recent_alert:
+                if not in_cooldown:
                     alert = await self.create_alert(
                         bin_id=bin_data.bin_id,
                         alert_type=alert_type,
@@ -90,13 +102,19 @@ class AlertService:
         db = await get_database()
         
         try:
-            row_id = await db.execute(
-                """INSERT INTO alert_logs (bin_id, alert_type, message, quantity_at_alert, threshold_value)
-                   VALUES (?, ?, ?, ?, ?)""",
-                (bin_id, alert_type, message, quantity_at_alert, threshold_value)
-            )
+            async with db.transaction():
+                row_id = await db.execute(
+                    """INSERT INTO alert_logs (bin_id, alert_type, message, quantity_at_alert, threshold_value)
+                       VALUES (?, ?, ?, ?, ?)""",
+                    (bin_id, alert_type, message, quantity_at_alert, threshold_value)
+                )
+                await db.execute(
+                    "UPDATE inventory_summary SET alerts_active = alerts_active + 1 WHERE id = 1"
+                )
             
             logger.warning(f"Alert created: {message}")
+            ALERTS_FIRED.inc(1, alert_type)
+            query_cache.invalidate(ALERTS)
             
             row = await db.fetch_one(
                 "SELECT * FROM alert_logs WHERE id = ?",
@@ -104,18 +122,7 @@ class AlertService:
             )
             
             if row:
-                return AlertLog(
-                    id=row['id'],
-                    bin_id=row['bin_id'],
-                    alert_type=row['alert_type'],
-                    message=row['message'],
-                    quantity_at_alert=row['quantity_at_alert'],
-                    threshold_value=row['threshold_value'],
-                    is_acknowledged=bool(row['is_acknowledged']),
-                    acknowledged_at=row['acknowledged_at'],
-                    acknowledged_by=row['acknowledged_by'],
-                    created_at=row['created_at']
-                )
+                return AlertLog.model_validate(row)
         except Exception as e:
             logger.error(f"Failed to create alert: {e}")
         
@@ -129,30 +136,31 @@ class AlertService:
     ) -> Optional[AlertLog]:
         """Check for recent alert of same type (for cooldown)"""
         db = await get_database()
-        cooldown_time = (datetime.now() - timedelta(minutes=cooldown_minutes)).isoformat()
         
+        # created_at is written by datetime('now'), so compare in the same format
         row = await db.fetch_one(
             """SELECT * FROM alert_logs 
-               WHERE bin_id = ? AND alert_type = ? AND created_at >= ?
+               WHERE bin_id = ? AND alert_type = ? AND created_at >= datetime('now', ?)
                ORDER BY created_at DESC LIMIT 1""",
-            (bin_id, alert_type, cooldown_time)
+            (bin_id, alert_type, f"-{cooldown_minutes} minutes")
         )
         
         if row:
-            return AlertLog(
-                id=row['id'],
-                bin_id=row['bin_id'],
-                alert_type=row['alert_type'],
-                message=row['message'],
-                quantity_at_alert=row['quantity_at_alert'],
-                threshold_value=row['threshold_value'],
-                is_acknowledged=bool(row['is_acknowledged']),
-                acknowledged_at=row['acknowledged_at'],
-                acknowledged_by=row['acknowledged_by'],
-                created_at=row['created_at']
-            )
+            return AlertLog.model_validate(row)
         return None
     
+    async def is_in_cooldown(self, bin_id: str, alert_type: str, cooldown_minutes: int) -> bool:
+        """Check whether an alert of this type fired recently, using only the cooldown index"""
+        db = await get_database()
+        
+        row = await db.fetch_one(
+            """SELECT 1 AS hit FROM alert_logs
+               WHERE bin_id = ? AND alert_type = ? AND created_at >= datetime('now', ?)
+               LIMIT 1""",
+            (bin_id, alert_type, f"-{cooldown_minutes} minutes")
+        )
+        return row is not None
+    
     async def get_active_alerts(self) -> list[AlertLog]:
         """Get all unacknowledged alerts"""
         db = await get_database()
@@ -165,18 +173,7 @@ class AlertService:
                ORDER BY al.created_at DESC"""
         )
         
-        return [AlertLog(
-            id=row['id'],
-            bin_id=row['bin_id'],
-            alert_type=row['alert_type'],
-            message=row['message'],
-            quantity_at_alert=row['quantity_at_alert'],
-            threshold_value=row['threshold_value'],
-            is_acknowledged=bool(row['is_acknowledged']),
-            acknowledged_at=row['acknowledged_at'],
-            acknowledged_by=row['acknowledged_by'],
-            created_at=row['created_at']
-        ) for row in rows]
+        return alert_logs_from_rows(rows)
     
     async def get_alert_history(
         self,
@@ -210,18 +207,7 @@ class AlertService:
         
         total = count_result.get('count', 0) if count_result else 0
         
-        alerts = [AlertLog(
-            id=row['id'],
-            bin_id=row['bin_id'],
-            alert_type=row['alert_type'],
-            message=row['message'],
-            quantity_at_alert=row['quantity_at_alert'],
-            threshold_value=row['threshold_value'],
-            is_acknowledged=bool(row['is_acknowledged']),
-            acknowledged_at=row['acknowledged_at'],
-            acknowledged_by=row['acknowledged_by'],
-            created_at=row['created_at']
-        ) for row in rows]
+        alerts = alert_logs_from_rows(rows)
         
         return alerts, total
     
@@ -229,12 +215,25 @@ class AlertService:
         """Acknowledge an alert"""
         db = await get_database()
         
-        await db.execute(
-            """UPDATE alert_logs 
-               SET is_acknowledged = 1, acknowledged_at = datetime('now'), acknowledged_by = ?
-               WHERE id = ?""",
-            (acknowledged_by, alert_id)
-        )
+        async with db.transaction():
+            row = await db.fetch_one(
+                "SELECT is_acknowledged FROM alert_logs WHERE id = ?",
+                (alert_id,)
+            )
+            if not row:
+                return False
+            
+            if not row['is_acknowledged']:
+                await db.execute(
+                    """UPDATE alert_logs 
+                       SET is_acknowledged = 1, acknowledged_at = datetime('now'), acknowledged_by = ?
+                       WHERE id = ?""",
+                    (acknowledged_by, alert_id)
+                )
+                await db.execute(
+                    "UPDATE inventory_summary SET alerts_active = MAX(0, alerts_active - 1) WHERE id = 1"
+                )
+        query_cache.invalidate(ALERTS)
         
         logger.info(f"Alert {alert_id} acknowledged by {acknowledged_by}")
         return True
@@ -243,17 +242,22 @@ class AlertService:
         """Acknowledge all active alerts"""
         db = await get_database()
         
-        count_result = await db.fetch_one(
-            "SELECT COUNT(*) as count FROM alert_logs WHERE is_acknowledged = 0"
-        )
-        count = count_result.get('count', 0) if count_result else 0
-        
-        await db.execute(
-            """UPDATE alert_logs 
-               SET is_acknowledged = 1, acknowledged_at = datetime('now'), acknowledged_by = ?
-               WHERE is_acknowledged = 0""",
-            (acknowledged_by,)
-        )
+        async with db.transaction():
+            count_result = await db.fetch_one(
+                "SELECT COUNT(*) as count FROM alert_logs WHERE is_acknowledged = 0"
+            )
+            count = count_result.get('count', 0) if count_result else 0
+            
+            await db.execute(
+                """UPDATE alert_logs 
+                   SET is_acknowledged = 1, acknowledged_at = datetime('now'), acknowledged_by = ?
+                   WHERE is_acknowledged = 0""",
+                (acknowledged_by,)
+            )
+            await db.execute(
+                "UPDATE inventory_summary SET alerts_active = 0 WHERE id = 1"
+            )
+        query_cache.invalidate(ALERTS)
         
         logger.info(f"Acknowledged {count} alerts by {acknowledged_by}")
         return count
@@ -270,15 +274,7 @@ class AlertService:
         else:
             rows = await db.fetch_all("SELECT * FROM alert_configurations")
         
-        return [AlertConfiguration(
-            id=row['id'],
-            bin_id=row['bin_id'],
-            alert_type=row['alert_type'],
-            threshold_value=row['threshold_value'],
-            is_enabled=bool(row['is_enabled']),
-            created_at=row['created_at'],
-            updated_at=row['updated_at']
-        ) for row in rows]
+        return alert_configurations_from_rows(rows)
     
     async def update_alert_configuration(
         self,
@@ -0,0 +1,262 @@
+"""
+Streaming anomaly detection for sensor readings.
+
+Each bin keeps a ring buffer of its recent quantities. A new reading is
+compared with the buffer's median, scaled by the median absolute deviation
+(a Hampel filter). A reading far outside that band is flagged: it is still
+stored and moves current_inventory like any other, but it is also logged in
+quarantined_readings and broadcast as an anomaly event. Dropping it would
+lose the first reading of every real step change, which for a sensor that
+reports only on change may be the last reading it sends for a while.
+
+A real step change, such as a restock or a large pick, looks the same as a
+glitch at first. When the next readings confirm the new level, the detector
+restarts its window there and stops flagging. The buffer has a fixed size,
+so each check costs a few microseconds whatever the length of the stream.
+The buffers live in memory; a bin's is seeded from its latest stored
+readings the first time the process sees it, so a restart does not leave
+every bin unscreened.
+"""
+
+import logging
+from collections import deque
+from statistics import median
+from typing import Optional
+
+from config import settings
+from database import get_database
+from models import BinDataPayload, QuarantinedReading
+
+logger = logging.getLogger(__name__)
+
+# Readings a bin needs before its window is trusted
+MIN_WINDOW = 5
+
+# MAD is zero on a steady bin; never scale deviations below this many units
+# or this fraction of capacity
+MIN_SCALE_UNITS = 2
+MIN_SCALE_CAPACITY_FRACTION = 0.05
+
+# MAD times this estimates the standard deviation of normally distributed noise
+MAD_TO_SIGMA = 1.4826
+
+# WebSocket broadcast function will be set by the main app
+_broadcast_anomaly = None
+
+def set_broadcast_anomaly(func):
+    """Set the broadcast anomaly function"""
+    global _broadcast_anomaly
+    _broadcast_anomaly = func
+
+
+class _BinWindow:
+    __slots__ = ("values", "candidate", "run")
+    
+    def __init__(self, size: int):
+        self.values: deque = deque(maxlen=size)
+        # First value of a run of outliers that agree with each other, and the run length
+        self.candidate: Optional[float] = None
+        self.run = 0
+
+
+class HampelDetector:
+    """Per-bin Hampel filter with level-shift confirmation"""
+    
+    def __init__(self, window: int = 15, threshold: float = 3.5, confirm_readings: int = 2):
+        self.window = max(window, MIN_WINDOW)
+        self.threshold = threshold
+        self.confirm_readings = confirm_readings
+        self._bins: dict[str, _BinWindow] = {}
+    
+    def __contains__(self, bin_id: str) -> bool:
+        return bin_id in self._bins
+    
+    def seed(self, bin_id: str, quantities: list[float]) -> None:
+        """Start a bin's window from earlier quantities, oldest first, unless it has one"""
+        if bin_id in self._bins:
+            return
+        state = self._bins[bin_id] = _BinWindow(self.window)
+        state.values.extend(quantities[-self.window:])
+    
+    def _band(self, values: deque, max_capacity: int) -> tuple[float, float]:
+        """Median of the window and the scale deviations are measured in"""
+        center = median(values)
+        mad = median([abs(v - center) for v in values])
+        return center, max(MAD_TO_SIGMA * mad, MIN_SCALE_UNITS, MIN_SCALE_CAPACITY_FRACTION * max_capacity)
+    
+    def score(self, bin_id: str, quantity: float, max_capacity: int) -> Optional[dict]:
+        """Return the anomaly for an outlying reading without changing the bin's window"""
+        state = self._bins.get(bin_id)
+        if state is None or len(state.values) < MIN_WINDOW:
+            return None
+        
+        center, scale = self._band(state.values, max_capacity)
+        score = abs(quantity - center) / scale
+        if score <= self.threshold:
+            return None
+        
+        run = 1
+        if state.candidate is not None and abs(quantity - state.candidate) / scale <= self.threshold:
+            run = state.run + 1
+        if run >= self.confirm_readings:
+            # This reading confirms a new level; update restarts the window there
+            return None
+        
+        return {
+            "expected_quantity": round(center, 2),
+            "score": round(score, 2),
+            "direction": "spike" if quantity > center else "drop"
+        }
+    
+    def update(self, bin_id: str, quantity: float, max_capacity: int) -> None:
+        """Add a stored reading to the bin's window, tracking runs of outliers"""
+        state = self._bins.get(bin_id)
+        if state is None:
+            state = self._bins[bin_id] = _BinWindow(self.window)
+        values = state.values
+        if len(values) < MIN_WINDOW:
+            values.append(quantity)
+            return
+        
+        center, scale = self._band(values, max_capacity)
+        if abs(quantity - center) / scale <= self.threshold:
+            values.append(quantity)
+            state.candidate, state.run = None, 0
+            return
+        
+        if state.candidate is not None and abs(quantity - state.candidate) / scale <= self.threshold:
+            state.run += 1
+        else:
+            state.candidate, state.run = quantity, 1
+        
+        if state.run >= self.confirm_readings:
+            # The new level held; restart the window there
+            values.clear()
+            values.extend([quantity] * MIN_WINDOW)
+            state.candidate, state.run = None, 0
+    
+    def check(self, bin_id: str, quantity: float, max_capacity: int) -> Optional[dict]:
+        """Score a reading and add it to the bin's window"""
+        anomaly = self.score(bin_id, quantity, max_capacity)
+        self.update(bin_id, quantity, max_capacity)
+        return anomaly
+    
+    def reset(self, bin_id: Optional[str] = None) -> None:
+        """Forget one bin's window, or every bin's"""
+        if bin_id is None:
+            self._bins.clear()
+        else:
+            self._bins.pop(bin_id, None)
+
+
+class AnomalyService:
+    """Service for screening sensor readings and logging flagged ones"""
+    
+    def __init__(self):
+        self.detector = HampelDetector(
+            settings.anomaly_window, settings.anomaly_threshold, settings.anomaly_confirm_readings
+        )
+    
+    async def prepare(self, bin_id: str) -> None:
+        """Seed the bin's window from stored history the first time it is seen"""
+        if settings.anomaly_detection_enabled and bin_id not in self.detector:
+            self.detector.seed(bin_id, await self._recent_quantities(bin_id))
+    
+    async def check(self, bin_id: str, quantity: int, max_capacity: int) -> Optional[dict]:
+        """
+        Screen a reading before it is stored; returns the anomaly when it should be flagged.
+        
+        The bin's window is left alone. Call record() once the reading is
+        known to be new and the bin's latest, so retries and late readings
+        never shift the window.
+        """
+        if not settings.anomaly_detection_enabled:
+            return None
+        await self.prepare(bin_id)
+        return self.detector.score(bin_id, quantity, max_capacity)
+    
+    def record(self, bin_id: str, quantity: int, max_capacity: int) -> None:
+        """Add a stored reading that moved the bin's snapshot to its window"""
+        if settings.anomaly_detection_enabled:
+            self.detector.update(bin_id, quantity, max_capacity)
+    
+    async def _recent_quantities(self, bin_id: str) -> list[int]:
+        """The bin's latest stored quantities, oldest first"""
+        db = await get_database()
+        
+        rows = await db.fetch_all(
+            """SELECT calculated_quantity FROM inventory_data
+               WHERE bin_id = ? ORDER BY timestamp DESC LIMIT ?""",
+            (bin_id, self.detector.window)
+        )
+        return [row['calculated_quantity'] for row in reversed(rows)]
+    
+    async def flag(self, data: BinDataPayload, anomaly: dict) -> QuarantinedReading:
+        """Log a flagged reading and broadcast it as an anomaly event"""
+        db = await get_database()
+        
+        row_id = await db.execute(
+            """INSERT INTO quarantined_readings
+               (bin_id, weight_grams, calculated_quantity, expected_quantity, score, direction, timestamp)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (
+                data.bin_id, data.weight_grams, data.calculated_quantity,
+                anomaly["expected_quantity"], anomaly["score"], anomaly["direction"],
+                data.timestamp.isoformat()
+            )
+        )
+        row = await db.fetch_one("SELECT * FROM quarantined_readings WHERE id = ?", (row_id,))
+        reading = QuarantinedReading.model_validate(row)
+        
+        logger.warning(
+            f"Flagged reading for {data.bin_id}: qty {data.calculated_quantity}, "
+            f"expected ~{anomaly['expected_quantity']} (score {anomaly['score']})"
+        )
+        
+        if _broadcast_anomaly:
+            await _broadcast_anomaly(reading)
+        return reading
+    
+    async def flag_many(self, readings: list[tuple[BinDataPayload, dict]]) -> int:
+        """Log flagged readings in one statement, without broadcasting them"""
+        if not readings:
+            return 0
+        db = await get_database()
+        
+        await db.execute_many(
+            """INSERT INTO quarantined_readings
+               (bin_id, weight_grams, calculated_quantity, expected_quantity, score, direction, timestamp)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            [
+                (
+                    data.bin_id, data.weight_grams, data.calculated_quantity,
+                    anomaly["expected_quantity"], anomaly["score"], anomaly["direction"],
+                    data.timestamp.isoformat()
+                )
+                for data, anomaly in readings
+            ]
+        )
+        logger.warning(f"Flagged {len(readings)} reading(s) as likely sensor anomalies")
+        return len(readings)
+    
+    async def get_flagged(self, limit: int = 50, bin_id: Optional[str] = None) -> list[QuarantinedReading]:
+        """Most recent flagged readings, optionally for one bin"""
+        db = await get_database()
+        
+        if bin_id:
+            rows = await db.fetch_all(
+                """SELECT * FROM quarantined_readings WHERE bin_id = ?
+                   ORDER BY created_at DESC, id DESC LIMIT ?""",
+                (bin_id, limit)
+            )
+        else:
+            rows = await db.fetch_all(
+                "SELECT * FROM quarantined_readings ORDER BY created_at DESC, id DESC LIMIT ?",
+                (limit,)
+            )
+        
+        return [QuarantinedReading.model_validate(row) for row in rows]
+
+
+# Singleton instance
+anomaly_service = AnomalyService()
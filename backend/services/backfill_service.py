@@ -0,0 +1,368 @@
+"""
+Backfill of sensor readings buffered at the edge.
+
+An edge router that loses its uplink keeps its readings and uploads them
+in one go once it is back. An upload is NDJSON, one BinDataPayload per
+line, or CSV with a header row naming the same fields, either of them
+optionally gzip-compressed. The body is decompressed and parsed as it
+arrives, so memory use is bounded by backfill_batch_size rows whatever
+the size of the upload.
+
+Rows are written to history backfill_batch_size at a time, one
+transaction per batch. Readings carrying a seq are deduplicated by the
+unique dedup index, so an upload that overlaps readings already delivered,
+or that is sent twice, stores each reading once. Outliers are screened by
+a Hampel filter of the upload's own and flagged without broadcasts; they
+are stored like the rest. The filter is not seeded from stored history,
+which is usually newer than the buffered readings.
+
+current_inventory moves once per bin at the end, to the bin's newest
+backfilled reading, and only if that is newer than anything stored before
+the upload. Filled-in history raises no alerts and is not broadcast; the
+caller publishes the final state of each moved bin once.
+"""
+
+import asyncio
+import csv
+import json
+import logging
+import time
+import zlib
+from typing import AsyncIterator, Optional
+
+from pydantic import ValidationError
+
+from config import settings
+from database import rebuild_inventory_summary
+from models import BinDataPayload
+from services.anomaly_service import anomaly_service, HampelDetector
+from services.ingest_dedup import dedup_key
+from services.inventory_service import inventory_service
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Lines parsed and screened between yields to the event loop
+PARSE_LINES = 1000
+
+# Most bytes decompressed at a time, however well the upload compresses
+DECOMPRESS_BYTES = 1 << 20
+
+# Invalid rows are skipped and counted; only the first few are described
+MAX_REPORTED_ERRORS = 20
+
+# Longest line accepted; a reading is a few hundred bytes, and a body with no
+# newline must not be buffered whole
+MAX_LINE_BYTES = 64 * 1024
+
+
+class BackfillError(ValueError):
+    """Raised when an upload cannot be read to the end; carries the report so far"""
+    
+    def __init__(self, message: str, report: dict):
+        super().__init__(message)
+        self.report = report
+
+
+class LineTooLongError(ValueError):
+    """Raised when an upload line exceeds MAX_LINE_BYTES"""
+
+
+async def _decompressed(body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Upload bytes, gunzipped when the upload starts with the gzip magic"""
+    head = b""
+    gzipped = None
+    decompressor = None
+    
+    async for chunk in body:
+        if gzipped is None:
+            head += chunk
+            if len(head) < len(GZIP_MAGIC):
+                continue
+            gzipped = head.startswith(GZIP_MAGIC)
+            chunk, head = head, b""
+        if not chunk:
+            continue
+        if not gzipped:
+            yield chunk
+            continue
+        
+        # Concatenated gzip members, as written by appending to a .gz file, are all read
+        while True:
+            if decompressor is None:
+                decompressor = zlib.decompressobj(wbits=31)
+            data = decompressor.decompress(chunk, DECOMPRESS_BYTES)
+            if data:
+                yield data
+            if decompressor.eof:
+                chunk, decompressor = decompressor.unused_data, None
+                if not chunk:
+                    break
+            else:
+                chunk = decompressor.unconsumed_tail
+                # Output cut at the limit can continue without further input
+                if not chunk and len(data) < DECOMPRESS_BYTES:
+                    break
+    
+    if head:
+        yield head
+    if decompressor is not None:
+        raise zlib.error("Upload ends inside a gzip stream")
+
+
+async def _line_batches(
+    data: AsyncIterator[bytes], size: int, max_line_bytes: int = MAX_LINE_BYTES
+) -> AsyncIterator[list[bytes]]:
+    """Split a byte stream into lists of at most size lines"""
+    pending = bytearray()
+    batch: list[bytes] = []
+    
+    async for chunk in data:
+        pending += chunk
+        end = pending.rfind(b"\n")
+        lines = []
+        if end >= 0:
+            lines = bytes(pending[:end]).split(b"\n")
+            del pending[:end + 1]
+        
+        too_long = None
+        if lines and max(map(len, lines)) > max_line_bytes:
+            too_long = next(i for i, line in enumerate(lines) if len(line) > max_line_bytes)
+        if too_long is not None or len(pending) > max_line_bytes:
+            # Hand over the lines before the long one, so the report covers them
+            batch.extend(lines[:too_long])
+            for start in range(0, len(batch), size):
+                yield batch[start:start + size]
+            raise LineTooLongError(f"Line is longer than {max_line_bytes} bytes")
+        
+        batch.extend(lines)
+        if len(batch) >= size:
+            full = len(batch) - len(batch) % size
+            for start in range(0, full, size):
+                yield batch[start:start + size]
+            batch = batch[full:]
+    
+    if pending:
+        batch.append(bytes(pending))
+    if batch:
+        yield batch
+
+
+class _Upload:
+    """Parser position and per-bin state of one upload"""
+    
+    def __init__(self, fmt: Optional[str]):
+        self.fmt = fmt
+        self.line = 0
+        self.header: Optional[list[str]] = None
+        self.detector = HampelDetector(
+            settings.anomaly_window, settings.anomaly_threshold, settings.anomaly_confirm_readings
+        )
+        self.configs: dict = {}
+        # Each bin's newest stored timestamp from before the upload
+        self.baseline: dict[str, Optional[str]] = {}
+        # Each bin's newest backfilled reading
+        self.newest: dict[str, tuple] = {}
+        self.unknown_bins: set[str] = set()
+        # Screened readings, and the flagged ones among them, waiting for the next batch write
+        self.readings: list[tuple] = []
+        self.flagged: list[tuple[BinDataPayload, dict]] = []
+        self.report = {
+            "format": fmt,
+            "rows": 0,
+            "inserted": 0,
+            "duplicate": 0,
+            "stale": 0,
+            "flagged": 0,
+            "rejected": 0,
+            "invalid": 0,
+            "errors": [],
+            "unknown_bins": [],
+            "updated_bins": [],
+            "batches": 0
+        }
+    
+    def error(self, line: int, bin_id: Optional[str], field: Optional[str], message: str) -> None:
+        self.report["invalid"] += 1
+        if len(self.report["errors"]) < MAX_REPORTED_ERRORS:
+            self.report["errors"].append({"line": line, "bin_id": bin_id, "field": field, "error": message})
+    
+    def validation_error(self, line: int, bin_id: Optional[str], error: ValidationError) -> None:
+        first = error.errors()[0]
+        self.error(line, bin_id, ".".join(str(loc) for loc in first["loc"]) or None, first["msg"])
+
+
+class BackfillService:
+    """Service for bulk loading edge-buffered readings into history"""
+    
+    async def backfill(self, body: AsyncIterator[bytes], fmt: Optional[str] = None) -> dict:
+        """
+        Load an uploaded NDJSON or CSV stream of readings.
+        
+        fmt is "ndjson" or "csv"; when None it is detected from the first
+        line. Returns counts per outcome, the first invalid rows and the
+        bins whose snapshot moved. Raises BackfillError when the body is
+        cut short or is not valid gzip; batches stored until then stay
+        stored and the report covers them.
+        """
+        started = time.perf_counter()
+        upload = _Upload(fmt)
+        batch_size = max(settings.backfill_batch_size, 1)
+        
+        try:
+            async for lines in _line_batches(_decompressed(body), PARSE_LINES):
+                payloads = self._parse(upload, lines)
+                if payloads:
+                    await self._screen(upload, payloads)
+                if len(upload.readings) >= batch_size:
+                    await self._store_batch(upload)
+                else:
+                    # Parsing is CPU-bound; let other requests in between chunks
+                    await asyncio.sleep(0)
+            await self._store_batch(upload)
+        except (zlib.error, UnicodeDecodeError, LineTooLongError) as e:
+            # Rows read before the failure are still stored
+            await self._store_batch(upload)
+            await self._finish(upload, started)
+            raise BackfillError(f"Upload could not be read past line {upload.line}: {e}", upload.report)
+        
+        return await self._finish(upload, started)
+    
+    def _parse(self, upload: _Upload, lines: list[bytes]) -> list[BinDataPayload]:
+        """Validate a batch of lines, recording the invalid ones"""
+        if upload.line == 0 and lines:
+            lines[0] = lines[0].removeprefix(b"\xef\xbb\xbf")
+        if upload.fmt is None:
+            first = next((line.strip() for line in lines if line.strip()), None)
+            if first is None:
+                upload.line += len(lines)
+                return []
+            upload.fmt = upload.report["format"] = "ndjson" if first.startswith(b"{") else "csv"
+        
+        if upload.fmt == "ndjson":
+            return self._parse_ndjson(upload, lines)
+        return self._parse_csv(upload, lines)
+    
+    def _parse_ndjson(self, upload: _Upload, lines: list[bytes]) -> list[BinDataPayload]:
+        payloads = []
+        for line in lines:
+            upload.line += 1
+            if not line.strip():
+                continue
+            upload.report["rows"] += 1
+            try:
+                payloads.append(BinDataPayload.model_validate_json(line))
+            except ValidationError as e:
+                upload.validation_error(upload.line, self._bin_id_of(line), e)
+        return payloads
+    
+    def _parse_csv(self, upload: _Upload, lines: list[bytes]) -> list[BinDataPayload]:
+        payloads = []
+        first_line = upload.line
+        reader = csv.reader(line.decode("utf-8").rstrip("\r") for line in lines)
+        for row in reader:
+            upload.line = first_line + reader.line_num
+            if not any(cell.strip() for cell in row):
+                continue
+            if upload.header is None:
+                upload.header = [cell.strip() for cell in row]
+                continue
+            
+            upload.report["rows"] += 1
+            # Drop empty cells so model defaults apply
+            entry = {
+                key: value.strip() for key, value in zip(upload.header, row)
+                if key and value.strip() != ""
+            }
+            try:
+                payloads.append(BinDataPayload.model_validate(entry))
+            except ValidationError as e:
+                upload.validation_error(upload.line, entry.get("bin_id"), e)
+        upload.line = first_line + len(lines)
+        return payloads
+    
+    @staticmethod
+    def _bin_id_of(line: bytes) -> Optional[str]:
+        """Best-effort bin id of an invalid NDJSON line, for its error entry"""
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return None
+        return entry.get("bin_id") if isinstance(entry, dict) else None
+    
+    async def _screen(self, upload: _Upload, payloads: list[BinDataPayload]) -> None:
+        """Queue valid readings for the next batch write, setting aside unknown bins and flagging outliers"""
+        new_bins = list({data.bin_id for data in payloads} - upload.baseline.keys() - upload.unknown_bins)
+        if new_bins:
+            upload.configs.update(await inventory_service.get_bin_configurations(new_bins))
+            # Read before the bin's first batch is stored, so it reflects history before the upload
+            upload.baseline.update(await inventory_service.get_latest_timestamps(new_bins))
+            upload.unknown_bins.update(bin_id for bin_id in new_bins if bin_id not in upload.configs)
+        
+        report = upload.report
+        for data in payloads:
+            bin_config = upload.configs.get(data.bin_id)
+            if bin_config is None:
+                report["rejected"] += 1
+                continue
+            
+            if settings.anomaly_detection_enabled:
+                anomaly = upload.detector.check(data.bin_id, data.calculated_quantity, bin_config.max_capacity)
+                if anomaly:
+                    upload.flagged.append((data, anomaly))
+            
+            reading = (
+                data.bin_id, data.weight_grams, data.calculated_quantity,
+                data.timestamp.isoformat(), dedup_key(data.seq, None)
+            )
+            upload.readings.append(reading)
+            newest = upload.newest.get(data.bin_id)
+            if newest is None or reading[3] > newest[3]:
+                upload.newest[data.bin_id] = reading
+    
+    async def _store_batch(self, upload: _Upload) -> None:
+        """Write the queued readings to history in one transaction"""
+        readings, flagged = upload.readings, upload.flagged
+        if not readings:
+            return
+        upload.readings, upload.flagged = [], []
+        
+        report = upload.report
+        inserted = await inventory_service.store_readings(readings)
+        report["flagged"] += await anomaly_service.flag_many(flagged)
+        
+        # Retries are among the readings no newer than their bin's latest stored one
+        duplicate = len(readings) - inserted
+        behind = sum(
+            1 for reading in readings
+            if upload.baseline.get(reading[0]) is not None and reading[3] <= upload.baseline[reading[0]]
+        )
+        report["inserted"] += inserted
+        report["duplicate"] += duplicate
+        report["stale"] += max(behind - duplicate, 0)
+        report["batches"] += 1
+    
+    async def _finish(self, upload: _Upload, started: float) -> dict:
+        """Move each bin's snapshot to its newest backfilled reading and recount the summary"""
+        report = upload.report
+        latest = [
+            reading for bin_id, reading in upload.newest.items()
+            if upload.baseline.get(bin_id) is None or reading[3] > upload.baseline[bin_id]
+        ]
+        report["updated_bins"] = await inventory_service.apply_latest_readings(latest)
+        report["unknown_bins"] = sorted(upload.unknown_bins)
+        if report["inserted"]:
+            await rebuild_inventory_summary()
+        
+        report["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(
+            f"Backfilled {report['inserted']} of {report['rows']} readings in {report['batches']} batches "
+            f"({report['duplicate']} duplicate, {report['flagged']} flagged, "
+            f"{report['rejected'] + report['invalid']} rejected); {len(report['updated_bins'])} bins moved"
+        )
+        return report
+
+
+# Singleton instance
+backfill_service = BackfillService()
@@ -0,0 +1,93 @@
+"""
+Packed columnar encoding for time-series responses.
+
+History and trends responses can be sent as parallel typed arrays instead
+of JSON objects that repeat their keys on every point. A client opts in
+with `Accept: application/vnd.inventory.columns`. The rows are read as
+plain tuples, cast into one NumPy record array, and each column is
+written out as a single block.
+
+Format, version 1. Little-endian. Every series starts on an 8-byte
+boundary and every array on a multiple of its element size, so a browser
+can view it in place with typed arrays:
+
+    header   16 bytes  magic "INVC", u16 version, u16 flags (0),
+                       u32 series count, u32 reserved (0)
+    series, repeated:
+             8 bytes   u32 point count n, u16 bin_id length, u16 reserved (0)
+             bin_id    UTF-8, zero-padded to a multiple of 8 bytes
+             int64[n]  timestamp, milliseconds since 1970-01-01T00:00:00, rounded
+             int32[n]  quantity
+             float32[n] weight_grams
+
+Stored timestamps without an offset are read as UTC wall-clock time, so
+they decode to the same date and time they show in the JSON response.
+"""
+
+import struct
+
+import numpy as np
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.inventory.columns"
+FORMAT_VERSION = 1
+MAGIC = b"INVC"
+
+# Column order of the rows passed to encode_series
+POINT_DTYPE = np.dtype([("timestamp_ms", "<i8"), ("quantity", "<i4"), ("weight_grams", "<f4")])
+
+# SQL select list producing rows in POINT_DTYPE order
+POINT_COLUMNS_SQL = (
+    "CAST(ROUND((julianday(timestamp) - 2440587.5) * 86400000) AS INTEGER), "
+    "calculated_quantity, weight_grams"
+)
+
+_HEADER = struct.Struct("<4sHHII")
+_SERIES_HEADER = struct.Struct("<IHH")
+
+
+def wants_columnar(accept: str | None) -> bool:
+    """True when the Accept header asks for the packed columnar format"""
+    return bool(accept) and COLUMNAR_MEDIA_TYPE in accept
+
+
+def to_points(rows: list[tuple]) -> np.ndarray:
+    """Cast fetched (timestamp_ms, quantity, weight_grams) tuples into one record array"""
+    return np.array(rows, dtype=POINT_DTYPE)
+
+
+def encode_series(series: list[tuple[str, np.ndarray]]) -> bytes:
+    """Pack (bin_id, points) pairs into the columnar format"""
+    parts = [_HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(series), 0)]
+    
+    for bin_id, points in series:
+        name = bin_id.encode("utf-8")
+        parts.append(_SERIES_HEADER.pack(len(points), len(name), 0))
+        parts.append(name + b"\0" * (-len(name) % 8))
+        for column in POINT_DTYPE.names:
+            parts.append(np.ascontiguousarray(points[column]).tobytes())
+    
+    return b"".join(parts)
+
+
+def decode_series(payload: bytes) -> list[tuple[str, np.ndarray]]:
+    """Unpack the columnar format into (bin_id, points) pairs"""
+    magic, version, _, count, _ = _HEADER.unpack_from(payload)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"Not a version {FORMAT_VERSION} columnar payload")
+    
+    series = []
+    offset = _HEADER.size
+    for _ in range(count):
+        n, name_length, _ = _SERIES_HEADER.unpack_from(payload, offset)
+        offset += _SERIES_HEADER.size
+        bin_id = payload[offset:offset + name_length].decode("utf-8")
+        offset += name_length + (-name_length % 8)
+        
+        points = np.empty(n, dtype=POINT_DTYPE)
+        for column in POINT_DTYPE.names:
+            dtype = POINT_DTYPE[column]
+            points[column] = np.frombuffer(payload, dtype=dtype, count=n, offset=offset)
+            offset += n * dtype.itemsize
+        series.append((bin_id, points))
+    
+    return series
@@ -1,19 +1,27 @@
+import asyncio
 import logging
 from io import BytesIO
 from datetime import datetime
 from typing import Optional
-from openpyxl import Workbook
-from openpyxl.utils import get_column_letter
 
+from config import settings
+from models import AlertLog, BinDisplayData, InventorySummary
 from services.inventory_service import inventory_service
 from services.alert_service import alert_service
+from services.query_cache import query_cache, READINGS, BINS, ALERTS, HISTORY
 
 logger = logging.getLogger(__name__)
 
 
+def _export_ttl() -> float:
+    """Workbooks are shared between concurrent downloads of the same export"""
+    return settings.cache_export_ttl_seconds
+
+
 class ExportService:
     """Service for exporting data to Excel"""
     
+    @query_cache.cached("export.current_inventory", _export_ttl, (READINGS, BINS))
     async def export_current_inventory(self) -> bytes:
         """Export current inventory to Excel"""
         inventory = await inventory_service.get_current_inventory()
@@ -32,8 +40,9 @@ class ExportService:
                 "Last Updated": bin_data.last_updated
             })
         
-        return self._create_excel(data, "Current Inventory")
+        return await asyncio.to_thread(self._create_excel, data, "Current Inventory")
     
+    @query_cache.cached("export.historical_data", _export_ttl, (BINS, HISTORY))
     async def export_historical_data(
         self,
         start_date: str,
@@ -58,11 +67,12 @@ class ExportService:
                     "Weight (g)": point["weight_grams"]
                 })
         
-        return self._create_excel(data, "Historical Data", {
+        return await asyncio.to_thread(self._create_excel, data, "Historical Data", {
             "Date Range": f"{start_date} to {end_date}",
             "Bins": ", ".join(bin_ids) if bin_ids else "All bins"
         })
     
+    @query_cache.cached("export.alerts", _export_ttl, (ALERTS, HISTORY))
     async def export_alerts(
         self,
         start_date: Optional[str] = None,
@@ -95,14 +105,27 @@ class ExportService:
                 "Created At": alert.created_at
             })
         
-        return self._create_excel(data, "Alerts")
+        return await asyncio.to_thread(self._create_excel, data, "Alerts")
     
+    @query_cache.cached("export.summary_report", _export_ttl, (READINGS, BINS, ALERTS))
     async def export_summary_report(self) -> bytes:
         """Export comprehensive summary report"""
         inventory = await inventory_service.get_current_inventory()
         summary = await inventory_service.get_inventory_summary()
         active_alerts = await alert_service.get_active_alerts()
         
+        # Workbook building is CPU-bound; keep it off the event loop
+        return await asyncio.to_thread(self._create_summary_excel, summary, inventory, active_alerts)
+    
+    def _create_summary_excel(
+        self,
+        summary: InventorySummary,
+        inventory: list[BinDisplayData],
+        active_alerts: list[AlertLog]
+    ) -> bytes:
+        """Build the summary report workbook"""
+        from openpyxl import Workbook
+        
         wb = Workbook()
         
         # Summary sheet
@@ -187,7 +210,11 @@ class ExportService:
         sheet_name: str,
         metadata: Optional[dict] = None
     ) -> bytes:
-        """Create Excel file from data"""
+        """Create Excel file from data; runs in a worker thread"""
+        # openpyxl is heavy to import; load it only when an export is requested
+        from openpyxl import Workbook
+        from openpyxl.utils import get_column_letter
+        
         wb = Workbook()
         
         # Add metadata sheet if provided
@@ -0,0 +1,397 @@
+"""
+Stockout forecasting for every bin at once.
+
+Each bin's consumption rate is the slope of a weighted least-squares fit
+of quantity over time. Restocks split a bin's history into segments, and
+the fit pools the within-segment slopes. Each segment gets its own
+intercept, so the jump at a restock never reads as negative consumption.
+Older readings are discounted with a half-life so the rate follows recent
+demand.
+
+The fit is kept as running sums per bin in one NumPy array:
+- A startup load computes them from bulk-fetched history in a handful of
+  vectorized passes.
+- Each new reading updates its bin's row in O(1).
+- A forecast is a vectorized pass over the whole array. It is cached
+  until the next reading arrives.
+"""
+
+import asyncio
+import logging
+import warnings
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+
+from config import settings
+from database import get_database
+from models import BinDisplayData
+
+logger = logging.getLogger(__name__)
+
+# A rise of more than this many units, or this fraction of capacity, is a restock
+RESTOCK_MIN_UNITS = 2
+RESTOCK_CAPACITY_FRACTION = 0.1
+
+# Bins need this many readings before they get a forecast
+MIN_FORECAST_READINGS = 6
+
+# A projected stockout further out than this is noise around a flat level
+MAX_FORECAST_HOURS = 365 * 24
+
+# History is loaded a few bins at a time so no single fetch holds the event loop for long
+LOAD_BINS_PER_QUERY = 25
+
+EPOCH = datetime(1970, 1, 1)
+_EPOCH64 = np.datetime64("1970-01-01T00:00:00", "us")
+
+# Columns of the per-bin state array. The first nine are weighted sums and
+# decay together; x is hours since the current segment started.
+SEG_W, SEG_X, SEG_Q, SEG_XX, SEG_XQ, SEG_QQ, POOL_XX, POOL_XQ, POOL_QQ = range(9)
+SEG_T0, LAST_T, LAST_Q, COUNT = range(9, 13)
+_DECAYING = slice(0, 9)
+_STATE_COLUMNS = 13
+
+
+def _naive(timestamp: str) -> datetime:
+    """Parse an ISO timestamp as naive local time, like the rest of the service"""
+    dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    return dt.astimezone().replace(tzinfo=None) if dt.tzinfo else dt
+
+
+def to_hours(timestamps: list[str]) -> np.ndarray:
+    """Hours since the epoch for ISO timestamps, parsed in one vectorized call when possible"""
+    try:
+        with warnings.catch_warnings():
+            # NumPy only warns about offsets; turn that into the slow path below
+            warnings.simplefilter("error")
+            parsed = np.array(timestamps, dtype="datetime64[us]")
+    except (ValueError, Warning):
+        parsed = np.array([_naive(ts) for ts in timestamps], dtype="datetime64[us]")
+    return (parsed - _EPOCH64) / np.timedelta64(1, "h")
+
+
+def _iso(hours: np.ndarray) -> list[Optional[str]]:
+    """ISO timestamps for hours since the epoch; NaN becomes None"""
+    finite = np.isfinite(hours)
+    micros = np.where(finite, hours * 3.6e9, 0).astype("timedelta64[us]")
+    text = np.datetime_as_string(_EPOCH64 + micros, unit="s")
+    return [str(t) if ok else None for t, ok in zip(text, finite)]
+
+
+def _restock_threshold(max_capacity: np.ndarray) -> np.ndarray:
+    return np.maximum(RESTOCK_MIN_UNITS, RESTOCK_CAPACITY_FRACTION * max_capacity)
+
+
+def fit_history(
+    slots: np.ndarray,
+    hours: np.ndarray,
+    quantity: np.ndarray,
+    capacity: np.ndarray,
+    half_life_hours: float
+) -> np.ndarray:
+    """
+    Build the per-bin state array from raw readings.
+    
+    slots indexes each reading's bin into capacity; the returned array has
+    one row per slot with every sum decayed to that bin's last reading.
+    """
+    state = np.zeros((len(capacity), _STATE_COLUMNS))
+    state[:, LAST_T] = np.nan
+    if len(slots) == 0:
+        return state
+    
+    order = np.lexsort((hours, slots))
+    slots, hours, quantity = slots[order], hours[order], quantity[order]
+    
+    new_bin = np.empty(len(slots), dtype=bool)
+    new_bin[0] = True
+    np.not_equal(slots[1:], slots[:-1], out=new_bin[1:])
+    rise = np.diff(quantity, prepend=quantity[0])
+    restock = ~new_bin & (rise > _restock_threshold(capacity)[slots])
+    
+    seg_start = new_bin | restock
+    seg = np.cumsum(seg_start) - 1
+    seg_slot = slots[seg_start]
+    x = hours - hours[seg_start][seg]
+    
+    bin_rows = np.flatnonzero(new_bin)
+    last_rows = np.append(bin_rows[1:] - 1, len(slots) - 1)
+    bin_slots = slots[bin_rows]
+    last_t = np.empty(len(capacity))
+    last_t[bin_slots] = hours[last_rows]
+    
+    w = 0.5 ** ((last_t[slots] - hours) / half_life_hours)
+    n_seg = seg[-1] + 1
+    
+    def per_segment(values: np.ndarray) -> np.ndarray:
+        return np.bincount(seg, weights=values, minlength=n_seg)
+    
+    sw, sx, sq = per_segment(w), per_segment(w * x), per_segment(w * quantity)
+    sxx, sxq, sqq = per_segment(w * x * x), per_segment(w * x * quantity), per_segment(w * quantity * quantity)
+    
+    # Closed segments only contribute their centered cross-products to the pooled slope
+    is_last = np.append(seg_slot[1:] != seg_slot[:-1], True)
+    closed = ~is_last & (sw > 0)
+    centered = {
+        POOL_XX: sxx - sx * sx / np.where(sw > 0, sw, 1),
+        POOL_XQ: sxq - sx * sq / np.where(sw > 0, sw, 1),
+        POOL_QQ: sqq - sq * sq / np.where(sw > 0, sw, 1),
+    }
+    for column, values in centered.items():
+        state[:, column] = np.bincount(seg_slot[closed], weights=values[closed], minlength=len(capacity))
+    
+    current = np.flatnonzero(is_last)
+    for column, values in ((SEG_W, sw), (SEG_X, sx), (SEG_Q, sq), (SEG_XX, sxx), (SEG_XQ, sxq), (SEG_QQ, sqq)):
+        state[bin_slots, column] = values[current]
+    state[bin_slots, SEG_T0] = hours[seg_start][current]
+    state[bin_slots, LAST_T] = hours[last_rows]
+    state[bin_slots, LAST_Q] = quantity[last_rows]
+    state[:, COUNT] = np.bincount(slots, minlength=len(capacity))
+    return state
+
+
+class ForecastService:
+    """Time-to-empty and reorder dates for all bins from an incrementally updated fit"""
+    
+    def __init__(self):
+        self._slots: dict[str, int] = {}
+        self._state = np.zeros((0, _STATE_COLUMNS))
+        self._loaded = False
+        self._load_task: Optional[asyncio.Task] = None
+        # Set when a refit is asked for while one is running; the running task fits again
+        self._refit_requested = False
+        # Readings seen while a fit is running, replayed onto the new state
+        self._pending: Optional[list[tuple[str, float, float, int]]] = None
+        self._version = 0
+        self._cache: Optional[dict] = None
+        self._cache_version = -1
+    
+    @property
+    def half_life_hours(self) -> float:
+        return settings.forecast_half_life_hours
+    
+    def warm_up(self) -> None:
+        """Start a refit in the background, or queue one after the refit already running"""
+        self._refit_requested = True
+        if self._load_task is None or self._load_task.done():
+            self._load_task = asyncio.create_task(self._refit(), name="forecast-load")
+    
+    async def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        if self._load_task is None or self._load_task.done():
+            self.warm_up()
+        await asyncio.shield(self._load_task)
+    
+    async def load(self) -> dict:
+        """Refit every bin from stored history and wait for it; shares the background refit task"""
+        self.warm_up()
+        return await asyncio.shield(self._load_task)
+    
+    async def _refit(self) -> dict:
+        # Every refit runs in this one task, so fits never overlap
+        while self._refit_requested:
+            self._refit_requested = False
+            result = await self._fit()
+        return result
+    
+    async def _fit(self) -> dict:
+        """Refit every bin from the lookback window of stored history"""
+        db = await get_database()
+        started = datetime.now()
+        pending: list[tuple[str, float, float, int]] = []
+        self._pending = pending
+        try:
+            bins = await db.fetch_all("SELECT bin_id, max_capacity FROM bin_configurations")
+            slots = {row['bin_id']: i for i, row in enumerate(bins)}
+            capacity = np.array([row['max_capacity'] for row in bins], dtype=float)
+            
+            since = (started - timedelta(days=settings.forecast_lookback_days)).isoformat()
+            # A few bins per query keeps each page short and reads through the (bin_id, timestamp) index
+            parts: list[tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+            bin_ids = list(slots)
+            for start in range(0, len(bin_ids), LOAD_BINS_PER_QUERY):
+                group = bin_ids[start:start + LOAD_BINS_PER_QUERY]
+                rows = await db.fetch_all(
+                    f"""SELECT bin_id, timestamp, calculated_quantity FROM inventory_data
+                        WHERE bin_id IN ({', '.join('?' * len(group))}) AND timestamp >= ?""",
+                    (*group, since)
+                )
+                if rows:
+                    parts.append(self._page_arrays(rows, slots))
+            
+            if parts:
+                slot_arr, hours, quantity = (np.concatenate(column) for column in zip(*parts))
+            else:
+                slot_arr, hours, quantity = np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0)
+            
+            state = await asyncio.to_thread(
+                fit_history, slot_arr, hours, quantity, capacity, self.half_life_hours
+            )
+            
+            self._slots, self._state = slots, state
+            self._loaded = True
+            self._pending = None
+            for bin_id, hours_at, qty, max_capacity in pending:
+                self._apply(bin_id, hours_at, qty, max_capacity)
+            self._version += 1
+        finally:
+            if self._pending is pending:
+                self._pending = None
+        
+        elapsed = (datetime.now() - started).total_seconds()
+        logger.info(f"Forecast model fitted from {len(hours)} readings for {len(slots)} bins in {elapsed:.2f}s")
+        return {"readings": int(len(hours)), "bins": len(slots), "seconds": round(elapsed, 3)}
+    
+    @staticmethod
+    def _page_arrays(rows: list[dict], slots: dict[str, int]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        bin_ids, inverse = np.unique([row['bin_id'] for row in rows], return_inverse=True)
+        page_slots = np.array([slots[b] for b in bin_ids], dtype=np.int64)[inverse]
+        hours = to_hours([row['timestamp'] for row in rows])
+        quantity = np.array([row['calculated_quantity'] for row in rows], dtype=float)
+        return page_slots, hours, quantity
+    
+    def observe(self, bin_data: BinDisplayData) -> None:
+        """Fold a bin's newly recorded reading into its fit"""
+        if not self._loaded and self._pending is None:
+            # Nothing fitted yet; the first load reads this reading from the database
+            return
+        hours = (_naive(bin_data.last_updated) - EPOCH).total_seconds() / 3600
+        reading = (bin_data.bin_id, hours, float(bin_data.current_quantity), bin_data.max_capacity)
+        if self._pending is not None:
+            self._pending.append(reading)
+        if self._loaded and self._apply(*reading):
+            self._version += 1
+    
+    def _apply(self, bin_id: str, hours: float, quantity: float, max_capacity: int) -> bool:
+        i = self._slots.get(bin_id)
+        if i is None:
+            i = self._add_slot(bin_id)
+        row = self._state[i]
+        
+        if row[COUNT] == 0:
+            row[SEG_T0] = hours
+        else:
+            elapsed = hours - row[LAST_T]
+            if elapsed <= 0:
+                # Late or duplicate reading; the fit only moves forward in time
+                return False
+            row[_DECAYING] *= 0.5 ** (elapsed / self.half_life_hours)
+            if quantity - row[LAST_Q] > max(RESTOCK_MIN_UNITS, RESTOCK_CAPACITY_FRACTION * max_capacity):
+                self._close_segment(row, hours)
+        
+        x = hours - row[SEG_T0]
+        row[SEG_W] += 1
+        row[SEG_X] += x
+        row[SEG_Q] += quantity
+        row[SEG_XX] += x * x
+        row[SEG_XQ] += x * quantity
+        row[SEG_QQ] += quantity * quantity
+        row[LAST_T] = hours
+        row[LAST_Q] = quantity
+        row[COUNT] += 1
+        return True
+    
+    @staticmethod
+    def _close_segment(row: np.ndarray, hours: float) -> None:
+        """Move the current segment's centered sums into the pooled slope and start a new one"""
+        w = row[SEG_W]
+        if w > 0:
+            row[POOL_XX] += row[SEG_XX] - row[SEG_X] ** 2 / w
+            row[POOL_XQ] += row[SEG_XQ] - row[SEG_X] * row[SEG_Q] / w
+            row[POOL_QQ] += row[SEG_QQ] - row[SEG_Q] ** 2 / w
+        row[SEG_W:SEG_QQ + 1] = 0
+        row[SEG_T0] = hours
+    
+    def _add_slot(self, bin_id: str) -> int:
+        i = len(self._slots)
+        if i >= len(self._state):
+            grown = np.zeros((max(16, 2 * len(self._state)), _STATE_COLUMNS))
+            grown[:, LAST_T] = np.nan
+            grown[:len(self._state)] = self._state
+            self._state = grown
+        self._slots[bin_id] = i
+        return i
+    
+    def invalidate(self) -> None:
+        """Drop the cached forecast, e.g. after thresholds change"""
+        self._version += 1
+    
+    async def get_forecast(self) -> dict:
+        """Forecast for every bin, most urgent first; cached until the next reading"""
+        await self._ensure_loaded()
+        if self._cache is not None and self._cache_version == self._version:
+            return self._cache
+        
+        version = self._version
+        from services.inventory_service import inventory_service
+        inventory = await inventory_service.get_current_inventory()
+        forecast = self._compute(inventory)
+        self._cache, self._cache_version = forecast, version
+        return forecast
+    
+    def _compute(self, inventory: list[BinDisplayData]) -> dict:
+        now = (datetime.now() - EPOCH).total_seconds() / 3600
+        idx = np.array([self._slots.get(b.bin_id, -1) for b in inventory], dtype=np.int64)
+        state = np.zeros((len(inventory), _STATE_COLUMNS))
+        state[idx >= 0] = self._state[idx[idx >= 0]]
+        
+        quantity = np.array([b.current_quantity for b in inventory], dtype=float)
+        reorder_point = np.array([b.min_threshold for b in inventory], dtype=float)
+        as_of = to_hours([b.last_updated for b in inventory]) if inventory else np.zeros(0)
+        
+        # Pooled within-segment sums: closed segments plus the centered current one
+        w = state[:, SEG_W]
+        safe_w = np.where(w > 0, w, 1)
+        sxx = state[:, POOL_XX] + state[:, SEG_XX] - state[:, SEG_X] ** 2 / safe_w
+        sxq = state[:, POOL_XQ] + state[:, SEG_XQ] - state[:, SEG_X] * state[:, SEG_Q] / safe_w
+        sqq = state[:, POOL_QQ] + state[:, SEG_QQ] - state[:, SEG_Q] ** 2 / safe_w
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = np.where(sxx > 1e-9, sxq / sxx, 0.0)
+            r_squared = np.where(sqq > 1e-9, np.clip(slope * sxq / sqq, 0, 1), 0.0)
+            rate = -slope  # units consumed per hour
+            
+            enough = state[:, COUNT] >= MIN_FORECAST_READINGS
+            consuming = enough & (rate > 1e-6) & (quantity / rate <= MAX_FORECAST_HOURS)
+            empty_at = np.where(consuming, as_of + quantity / rate, np.nan)
+            reorder_at = np.where(
+                consuming, as_of + np.maximum(quantity - reorder_point, 0) / rate, np.nan
+            )
+        
+        hours_to_empty = np.maximum(empty_at - now, 0)
+        hours_to_reorder = np.maximum(reorder_at - now, 0)
+        empty_iso, reorder_iso = _iso(empty_at), _iso(reorder_at)
+        
+        bins = []
+        for i, b in enumerate(inventory):
+            status = "ok" if consuming[i] else ("not_consuming" if enough[i] else "insufficient_data")
+            bins.append({
+                "bin_id": b.bin_id,
+                "article_name": b.article_name,
+                "current_quantity": b.current_quantity,
+                "reorder_point": b.min_threshold,
+                "daily_consumption": round(float(max(rate[i], 0) * 24), 2),
+                "hours_to_empty": round(float(hours_to_empty[i]), 1) if consuming[i] else None,
+                "predicted_empty_at": empty_iso[i],
+                "hours_to_reorder": round(float(hours_to_reorder[i]), 1) if consuming[i] else None,
+                "reorder_at": reorder_iso[i],
+                "reorder_due": b.current_quantity <= b.min_threshold,
+                "r_squared": round(float(r_squared[i]), 3),
+                "readings": int(state[i, COUNT]),
+                "status": status
+            })
+        bins.sort(key=lambda f: (f["hours_to_empty"] is None, f["hours_to_empty"] or 0))
+        
+        return {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "lookback_days": settings.forecast_lookback_days,
+            "half_life_hours": self.half_life_hours,
+            "bins": bins
+        }
+
+
+# Singleton instance
+forecast_service = ForecastService()
@@ -0,0 +1,62 @@
+"""
+Deduplication of retried sensor readings.
+
+Edge routers retry a reading when the request times out, even when the
+first attempt was stored. A reading can carry a per-device sequence
+number (`seq` in the payload) or an `Idempotency-Key` header. Together
+with its bin and timestamp this forms the reading's dedup key.
+
+Recently stored keys are kept in a bounded in-memory window, so a retry
+arriving soon after the original is answered without touching the
+database. Older retries, and retries reaching another worker, are caught
+by the unique index on inventory_data(bin_id, dedup_key, timestamp).
+Because the timestamp is part of the key, a device whose counter restarts
+after a reboot is not mistaken for a retry.
+"""
+
+from collections import OrderedDict
+from typing import Optional
+
+from config import settings
+
+
+def dedup_key(seq: Optional[int], idempotency_key: Optional[str]) -> Optional[str]:
+    """Stored dedup key for a reading; a sequence number wins over an idempotency key"""
+    if seq is not None:
+        return f"seq:{seq}"
+    if idempotency_key:
+        return f"key:{idempotency_key}"
+    return None
+
+
+class DedupWindow:
+    """Bounded LRU of the dedup keys of recently handled readings"""
+    
+    def __init__(self, size: int = 65536):
+        self.size = size
+        self._keys: OrderedDict[tuple[str, str, str], None] = OrderedDict()
+    
+    def seen(self, bin_id: str, key: str, timestamp: str) -> bool:
+        """True when this reading was already handled"""
+        entry = (bin_id, key, timestamp)
+        if entry in self._keys:
+            self._keys.move_to_end(entry)
+            return True
+        return False
+    
+    def add(self, bin_id: str, key: str, timestamp: str) -> None:
+        """Remember a handled reading, forgetting the oldest one when full"""
+        self._keys[(bin_id, key, timestamp)] = None
+        self._keys.move_to_end((bin_id, key, timestamp))
+        while len(self._keys) > self.size:
+            self._keys.popitem(last=False)
+    
+    def clear(self) -> None:
+        self._keys.clear()
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+# Singleton instance
+ingest_dedup = DedupWindow(settings.ingest_dedup_window)
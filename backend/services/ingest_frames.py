@@ -0,0 +1,120 @@
+"""
+Binary frames for the streaming ingest channel.
+
+Edge routers holding a WebSocket open on /api/bins/stream send readings
+as binary messages, many readings per message. Every reading is a fixed
+40-byte record, so a whole frame is decoded and range-checked by NumPy in
+one pass instead of parsing and validating JSON per reading.
+
+Format, version 1. Little-endian:
+    
+    header   16 bytes  magic "INVR", u16 version, u16 flags (0),
+                       u32 frame id, u32 reading count
+    reading, repeated (40 bytes):
+             int64     seq, per-device sequence number; -1 when not sent
+             int64     timestamp, milliseconds since 1970-01-01T00:00:00 UTC
+             float64   weight_grams
+             float64   article_weight_grams
+             int32     calculated_quantity
+             uint16    row
+             uint16    position
+
+The bin is identified by row and position; its id is BIN-R{row}P{position}.
+Timestamps are stored as the server's naive local time, like every other
+timestamp in the history. Frame ids are chosen by the sender and echoed
+back in acknowledgements.
+"""
+
+import struct
+from datetime import datetime
+
+import numpy as np
+
+from models import BinDataPayload
+
+FORMAT_VERSION = 1
+MAGIC = b"INVR"
+
+READING_DTYPE = np.dtype([
+    ("seq", "<i8"),
+    ("timestamp_ms", "<i8"),
+    ("weight_grams", "<f8"),
+    ("article_weight_grams", "<f8"),
+    ("calculated_quantity", "<i4"),
+    ("row", "<u2"),
+    ("position", "<u2")
+])
+
+# Timestamps past the year 9999 do not fit a datetime; a day short of it
+# leaves room for the server's UTC offset
+MAX_TIMESTAMP_MS = 253402214400000
+
+_HEADER = struct.Struct("<4sHHII")
+
+
+class FrameError(ValueError):
+    """Raised when a binary ingest frame cannot be decoded"""
+
+
+def encode_frame(frame_id: int, readings: np.ndarray) -> bytes:
+    """Pack a READING_DTYPE array into one frame"""
+    return _HEADER.pack(MAGIC, FORMAT_VERSION, 0, frame_id, len(readings)) + readings.astype(READING_DTYPE).tobytes()
+
+
+def decode_frame(payload: bytes, max_readings: int) -> tuple[int, np.ndarray]:
+    """Unpack a frame into its id and a READING_DTYPE array"""
+    if len(payload) < _HEADER.size:
+        raise FrameError("Frame shorter than its header")
+    magic, version, _, frame_id, count = _HEADER.unpack_from(payload)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise FrameError(f"Not a version {FORMAT_VERSION} ingest frame")
+    if count > max_readings:
+        raise FrameError(f"Frame holds {count} readings; the limit is {max_readings}")
+    if len(payload) != _HEADER.size + count * READING_DTYPE.itemsize:
+        raise FrameError(f"Frame length does not match its {count} readings")
+    
+    return frame_id, np.frombuffer(payload, dtype=READING_DTYPE, count=count, offset=_HEADER.size)
+
+
+def valid_mask(readings: np.ndarray) -> np.ndarray:
+    """Readings that pass the same range checks as BinDataPayload"""
+    return (
+        (readings["weight_grams"] >= 0)
+        & (readings["article_weight_grams"] > 0)
+        & (readings["calculated_quantity"] >= 0)
+        & (readings["row"] >= 1)
+        & (readings["position"] >= 1)
+        & (readings["seq"] >= -1)
+        & (readings["timestamp_ms"] >= 0)
+        & (readings["timestamp_ms"] < MAX_TIMESTAMP_MS)
+    )
+
+
+def to_payloads(readings: np.ndarray) -> list[BinDataPayload]:
+    """Build payloads for readings that already passed valid_mask"""
+    # Server local time; the UTC offset depends on the date, so each timestamp is converted on its own
+    timestamps = [
+        datetime.fromtimestamp(ms // 1000).replace(microsecond=ms % 1000 * 1000)
+        for ms in readings["timestamp_ms"].tolist()
+    ]
+    rows = readings["row"].tolist()
+    positions = readings["position"].tolist()
+    
+    return [
+        # Field values were range-checked as whole columns, so per-reading validation is skipped
+        BinDataPayload.model_construct(
+            bin_id=f"BIN-R{row}P{position}",
+            row=row,
+            position=position,
+            weight_grams=weight,
+            article_weight_grams=article_weight,
+            calculated_quantity=quantity,
+            timestamp=timestamp,
+            seq=seq if seq >= 0 else None
+        )
+        for row, position, weight, article_weight, quantity, timestamp, seq in zip(
+            rows, positions,
+            readings["weight_grams"].tolist(), readings["article_weight_grams"].tolist(),
+            readings["calculated_quantity"].tolist(), timestamps, readings["seq"].tolist()
+        )
+    ]
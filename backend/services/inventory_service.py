@@ -2,14 +2,41 @@ import logging
 from typing import Optional
 from datetime import datetime, timedelta
 
-from database import get_database
+import numpy as np
+
+from config import settings
+from database import get_database, DatabaseAdapter, rebuild_inventory_summary
+from monitoring import traced
+from services.downsampling import downsample_rows, minmax_indices
+from services.columnar import POINT_COLUMNS_SQL, to_points
+from services.query_cache import query_cache, READINGS, BINS, HISTORY
 from models import (
     BinConfiguration, BinDisplayData, BinStatus, 
-    InventorySummary, HistoricalDataPoint, BinConfigUpdate
+    InventorySummary, HistoricalDataPoint, BinConfigUpdate,
+    bin_display_from_rows, dump_models, historical_points_from_rows
 )
 
 logger = logging.getLogger(__name__)
 
+# Bin configuration joined with its current snapshot and stored status
+DISPLAY_DATA_SELECT = """
+    SELECT 
+        bc.bin_id,
+        bc.row,
+        bc.position,
+        bc.article_type,
+        bc.article_name,
+        bc.min_threshold,
+        bc.critical_threshold,
+        bc.max_capacity,
+        COALESCE(ci.weight_grams, 0) as weight_grams,
+        COALESCE(ci.calculated_quantity, 0) as calculated_quantity,
+        COALESCE(ci.last_updated, datetime('now')) as last_updated,
+        COALESCE(ci.status, 'empty') as status
+    FROM bin_configurations bc
+    LEFT JOIN current_inventory ci ON bc.bin_id = ci.bin_id
+"""
+
 
 class InventoryService:
     """Service for managing inventory data"""
@@ -22,6 +49,7 @@ class InventoryService:
         )
         return [BinConfiguration(**row) for row in rows]
     
+    @traced("inventory.get_bin_configuration")
     async def get_bin_configuration(self, bin_id: str) -> Optional[BinConfiguration]:
         """Get bin configuration by ID"""
         db = await get_database()
@@ -31,6 +59,17 @@ class InventoryService:
         )
         return BinConfiguration(**row) if row else None
     
+    async def get_bin_configurations(self, bin_ids: list[str]) -> dict[str, BinConfiguration]:
+        """Get the configurations of the given bins, keyed by bin id; unknown ids are left out"""
+        if not bin_ids:
+            return {}
+        db = await get_database()
+        rows = await db.fetch_all(
+            f"SELECT * FROM bin_configurations WHERE bin_id IN ({', '.join('?' * len(bin_ids))})",
+            tuple(bin_ids)
+        )
+        return {row['bin_id']: BinConfiguration(**row) for row in rows}
+    
     async def update_bin_configuration(self, bin_id: str, updates: BinConfigUpdate) -> bool:
         """Update bin configuration"""
         db = await get_database()
@@ -43,109 +82,287 @@ class InventoryService:
         set_clause = ", ".join([f"{k} = ?" for k in update_data.keys()])
         values = list(update_data.values()) + [bin_id]
         
-        await db.execute(
-            f"UPDATE bin_configurations SET {set_clause}, updated_at = datetime('now') WHERE bin_id = ?",
-            tuple(values)
-        )
+        async with db.transaction():
+            await db.execute(
+                f"UPDATE bin_configurations SET {set_clause}, updated_at = datetime('now') WHERE bin_id = ?",
+                tuple(values)
+            )
+            
+            # Threshold or capacity changes can move the bin to another status
+            if update_data.keys() & {"min_threshold", "critical_threshold", "max_capacity"}:
+                row = await db.fetch_one(
+                    """SELECT bc.min_threshold, bc.critical_threshold, bc.max_capacity,
+                              ci.calculated_quantity, ci.status
+                       FROM bin_configurations bc
+                       JOIN current_inventory ci ON bc.bin_id = ci.bin_id
+                       WHERE bc.bin_id = ?""",
+                    (bin_id,)
+                )
+                if row:
+                    new_status = self._calculate_status(
+                        row['calculated_quantity'],
+                        row['min_threshold'],
+                        row['critical_threshold'],
+                        row['max_capacity']
+                    ).value
+                    if new_status != row['status']:
+                        await db.execute(
+                            "UPDATE current_inventory SET status = ? WHERE bin_id = ?",
+                            (new_status, bin_id)
+                        )
+                        await self._apply_summary_delta(db, row['status'], new_status, 0)
+        query_cache.invalidate(BINS)
         return True
     
+    @traced("inventory.record_inventory_data")
     async def record_inventory_data(
         self, 
         bin_id: str, 
         weight_grams: float, 
         calculated_quantity: int,
-        timestamp: str
-    ) -> int:
-        """Record new inventory data from bin sensor"""
+        timestamp: str,
+        dedup_key: Optional[str] = None
+    ) -> tuple[Optional[int], bool]:
+        """
+        Record new inventory data from bin sensor.
+        
+        Returns the history row id, or None when a reading with the same
+        dedup key and timestamp is already stored, and whether the
+        current_inventory snapshot moved. A reading no newer than the bin's
+        latest one is kept in history but leaves the snapshot alone.
+        """
         db = await get_database()
         
-        # Insert into historical data
-        row_id = await db.execute(
-            """INSERT INTO inventory_data (bin_id, weight_grams, calculated_quantity, timestamp)
-               VALUES (?, ?, ?, ?)""",
-            (bin_id, weight_grams, calculated_quantity, timestamp)
-        )
+        async with db.transaction():
+            # Thresholds and the previous snapshot drive the status and counter deltas
+            existing = await db.fetch_one(
+                """SELECT bc.min_threshold, bc.critical_threshold, bc.max_capacity,
+                          ci.id, ci.calculated_quantity, ci.status,
+                          (SELECT MAX(timestamp) FROM inventory_data WHERE bin_id = bc.bin_id) AS latest_timestamp
+                   FROM bin_configurations bc
+                   LEFT JOIN current_inventory ci ON bc.bin_id = ci.bin_id
+                   WHERE bc.bin_id = ?""",
+                (bin_id,)
+            )
+            
+            if not existing:
+                raise ValueError(f"Bin configuration not found for {bin_id}")
+            
+            # Insert into historical data; a retried reading hits idx_inventory_dedup
+            inserted = await db.fetch_one(
+                """INSERT INTO inventory_data (bin_id, weight_grams, calculated_quantity, timestamp, dedup_key)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT DO NOTHING
+                   RETURNING id""",
+                (bin_id, weight_grams, calculated_quantity, timestamp, dedup_key)
+            )
+            if not inserted:
+                return None, False
+            row_id = inserted['id']
+            
+            # Compared with history rather than last_updated, which placeholder
+            # snapshots set to the provisioning time
+            latest = existing['latest_timestamp']
+            applied = latest is None or timestamp > latest
+            if applied:
+                await self._update_snapshot(db, bin_id, weight_grams, calculated_quantity, timestamp, existing)
+        query_cache.invalidate(READINGS)
         
-        # Update or insert current inventory
-        existing = await db.fetch_one(
-            "SELECT id FROM current_inventory WHERE bin_id = ?",
-            (bin_id,)
+        logger.debug(f"Recorded inventory data for {bin_id}: qty={calculated_quantity}")
+        return row_id, applied
+    
+    @traced("inventory.record_inventory_batch")
+    async def record_inventory_batch(self, readings: list[tuple]) -> dict:
+        """
+        Record many readings of configured bins in one transaction.
+        
+        Readings are (bin_id, weight_grams, calculated_quantity, timestamp,
+        dedup_key) tuples. Every new reading goes to history in a single
+        statement; each bin's snapshot then moves once, to its newest
+        reading, if that is newer than the bin's latest stored one. Returns
+        the inserted, duplicate and stale counts and the bins that moved.
+        """
+        result = {"inserted": 0, "duplicate": 0, "stale": 0, "updated_bins": []}
+        if not readings:
+            return result
+        
+        newest: dict[str, tuple] = {}
+        for reading in readings:
+            current = newest.get(reading[0])
+            if current is None or reading[3] > current[3]:
+                newest[reading[0]] = reading
+        
+        db = await get_database()
+        async with db.transaction():
+            rows = await db.fetch_all(
+                f"""SELECT bc.bin_id, bc.min_threshold, bc.critical_threshold, bc.max_capacity,
+                           ci.id, ci.calculated_quantity, ci.status,
+                           (SELECT MAX(timestamp) FROM inventory_data WHERE bin_id = bc.bin_id) AS latest_timestamp
+                    FROM bin_configurations bc
+                    LEFT JOIN current_inventory ci ON bc.bin_id = ci.bin_id
+                    WHERE bc.bin_id IN ({', '.join('?' * len(newest))})""",
+                tuple(newest)
+            )
+            existing = {row['bin_id']: row for row in rows}
+            
+            inserted = await db.execute_many(
+                """INSERT INTO inventory_data (bin_id, weight_grams, calculated_quantity, timestamp, dedup_key)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT DO NOTHING""",
+                readings
+            )
+            
+            for bin_id, (_, weight_grams, calculated_quantity, timestamp, _) in newest.items():
+                latest = existing[bin_id]['latest_timestamp']
+                if latest is None or timestamp > latest:
+                    await self._update_snapshot(
+                        db, bin_id, weight_grams, calculated_quantity, timestamp, existing[bin_id]
+                    )
+                    result["updated_bins"].append(bin_id)
+        if inserted:
+            query_cache.invalidate(READINGS)
+        
+        # Retries are among the readings no newer than their bin's latest stored one
+        behind = sum(
+            1 for reading in readings
+            if existing[reading[0]]['latest_timestamp'] is not None
+            and reading[3] <= existing[reading[0]]['latest_timestamp']
+        )
+        result["inserted"] = inserted
+        result["duplicate"] = len(readings) - inserted
+        result["stale"] = max(behind - result["duplicate"], 0)
+        return result
+    
+    async def get_latest_timestamps(self, bin_ids: list[str]) -> dict[str, Optional[str]]:
+        """Timestamp of each bin's newest stored reading; None for a bin without history"""
+        if not bin_ids:
+            return {}
+        db = await get_database()
+        rows = await db.fetch_all(
+            f"""SELECT bc.bin_id,
+                       (SELECT MAX(timestamp) FROM inventory_data WHERE bin_id = bc.bin_id) AS latest_timestamp
+                FROM bin_configurations bc
+                WHERE bc.bin_id IN ({', '.join('?' * len(bin_ids))})""",
+            tuple(bin_ids)
         )
+        return {row['bin_id']: row['latest_timestamp'] for row in rows}
+    
+    async def store_readings(self, readings: list[tuple]) -> int:
+        """
+        Write readings to history only, in one transaction.
+        
+        Takes the same tuples as record_inventory_batch but leaves
+        current_inventory alone; see apply_latest_readings. Readings
+        already stored under their dedup key are skipped. Returns the
+        number written.
+        """
+        if not readings:
+            return 0
+        db = await get_database()
+        async with db.transaction():
+            inserted = await db.execute_many(
+                """INSERT INTO inventory_data (bin_id, weight_grams, calculated_quantity, timestamp, dedup_key)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT DO NOTHING""",
+                readings
+            )
+        if inserted:
+            query_cache.invalidate(READINGS)
+        return inserted
+    
+    async def apply_latest_readings(self, readings: list[tuple]) -> list[str]:
+        """
+        Move snapshots to readings already written by store_readings.
+        
+        Takes at most one reading per bin. A bin moves only while its
+        reading is still the newest in history, so a live reading stored
+        meanwhile is never overwritten. Returns the bins that moved.
+        """
+        if not readings:
+            return []
+        db = await get_database()
+        updated = []
+        async with db.transaction():
+            rows = await db.fetch_all(
+                f"""SELECT bc.bin_id, bc.min_threshold, bc.critical_threshold, bc.max_capacity,
+                           ci.id, ci.calculated_quantity, ci.status,
+                           (SELECT MAX(timestamp) FROM inventory_data WHERE bin_id = bc.bin_id) AS latest_timestamp
+                    FROM bin_configurations bc
+                    LEFT JOIN current_inventory ci ON bc.bin_id = ci.bin_id
+                    WHERE bc.bin_id IN ({', '.join('?' * len(readings))})""",
+                tuple(reading[0] for reading in readings)
+            )
+            existing = {row['bin_id']: row for row in rows}
+            
+            for bin_id, weight_grams, calculated_quantity, timestamp, _ in readings:
+                row = existing.get(bin_id)
+                if row and row['latest_timestamp'] is not None and timestamp >= row['latest_timestamp']:
+                    await self._update_snapshot(db, bin_id, weight_grams, calculated_quantity, timestamp, row)
+                    updated.append(bin_id)
+        return updated
+    
+    async def _update_snapshot(
+        self,
+        db: DatabaseAdapter,
+        bin_id: str,
+        weight_grams: float,
+        calculated_quantity: int,
+        timestamp: str,
+        existing: dict
+    ) -> None:
+        """Move a bin's current_inventory row and the summary counters to a new reading"""
+        status = self._calculate_status(
+            calculated_quantity,
+            existing['min_threshold'],
+            existing['critical_threshold'],
+            existing['max_capacity']
+        ).value
         
-        if existing:
+        if existing['id']:
             await db.execute(
                 """UPDATE current_inventory 
-                   SET weight_grams = ?, calculated_quantity = ?, last_updated = ?
+                   SET weight_grams = ?, calculated_quantity = ?, last_updated = ?, status = ?
                    WHERE bin_id = ?""",
-                (weight_grams, calculated_quantity, timestamp, bin_id)
+                (weight_grams, calculated_quantity, timestamp, status, bin_id)
             )
+            old_status, old_quantity = existing['status'], existing['calculated_quantity']
         else:
             await db.execute(
-                """INSERT INTO current_inventory (bin_id, weight_grams, calculated_quantity, last_updated)
-                   VALUES (?, ?, ?, ?)""",
-                (bin_id, weight_grams, calculated_quantity, timestamp)
+                """INSERT INTO current_inventory (bin_id, weight_grams, calculated_quantity, last_updated, status)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (bin_id, weight_grams, calculated_quantity, timestamp, status)
             )
+            # A bin without a snapshot was counted as empty with zero items
+            old_status, old_quantity = BinStatus.EMPTY.value, 0
         
-        logger.debug(f"Recorded inventory data for {bin_id}: qty={calculated_quantity}")
-        return row_id
+        await self._apply_summary_delta(db, old_status, status, calculated_quantity - old_quantity)
     
     async def get_current_inventory(self) -> list[BinDisplayData]:
         """Get current inventory for all bins with display data"""
         db = await get_database()
         
-        rows = await db.fetch_all("""
-            SELECT 
-                bc.bin_id,
-                bc.row,
-                bc.position,
-                bc.article_type,
-                bc.article_name,
-                bc.min_threshold,
-                bc.critical_threshold,
-                bc.max_capacity,
-                COALESCE(ci.weight_grams, 0) as weight_grams,
-                COALESCE(ci.calculated_quantity, 0) as calculated_quantity,
-                COALESCE(ci.last_updated, datetime('now')) as last_updated
-            FROM bin_configurations bc
-            LEFT JOIN current_inventory ci ON bc.bin_id = ci.bin_id
-            ORDER BY bc.row, bc.position
-        """)
-        
-        result = []
-        for row in rows:
-            status = self._calculate_status(
-                row['calculated_quantity'],
-                row['min_threshold'],
-                row['critical_threshold'],
-                row['max_capacity']
-            )
-            fill_percentage = min(100, round((row['calculated_quantity'] / row['max_capacity']) * 100))
-            
-            result.append(BinDisplayData(
-                bin_id=row['bin_id'],
-                row=row['row'],
-                position=row['position'],
-                article_type=row['article_type'],
-                article_name=row['article_name'],
-                current_quantity=row['calculated_quantity'],
-                max_capacity=row['max_capacity'],
-                fill_percentage=fill_percentage,
-                status=status,
-                min_threshold=row['min_threshold'],
-                critical_threshold=row['critical_threshold'],
-                last_updated=row['last_updated'],
-                weight_grams=row['weight_grams']
-            ))
-        
-        return result
+        rows = await db.fetch_all(f"{DISPLAY_DATA_SELECT} ORDER BY bc.row, bc.position")
+        return bin_display_from_rows(rows)
     
+    @traced("inventory.get_bin_display_data")
     async def get_bin_display_data(self, bin_id: str) -> Optional[BinDisplayData]:
         """Get single bin display data"""
-        inventory = await self.get_current_inventory()
-        for bin_data in inventory:
-            if bin_data.bin_id == bin_id:
-                return bin_data
-        return None
+        db = await get_database()
+        
+        row = await db.fetch_one(f"{DISPLAY_DATA_SELECT} WHERE bc.bin_id = ?", (bin_id,))
+        return bin_display_from_rows([row])[0] if row else None
+    
+    async def get_bins_display_data(self, bin_ids: list[str]) -> list[BinDisplayData]:
+        """Get display data for the given bins"""
+        if not bin_ids:
+            return []
+        db = await get_database()
+        
+        rows = await db.fetch_all(
+            f"{DISPLAY_DATA_SELECT} WHERE bc.bin_id IN ({', '.join('?' * len(bin_ids))})",
+            tuple(bin_ids)
+        )
+        return bin_display_from_rows(rows)
     
     def _calculate_status(
         self,
@@ -165,33 +382,76 @@ class InventoryService:
             return BinStatus.LOW
         return BinStatus.NORMAL
     
+    async def _apply_summary_delta(
+        self,
+        db: DatabaseAdapter,
+        old_status: str,
+        new_status: str,
+        items_delta: int
+    ) -> None:
+        """Adjust the summary counters for one bin's status/quantity change"""
+        if old_status == new_status and items_delta == 0:
+            return
+        
+        assignments = ["total_items = total_items + ?"]
+        if old_status != new_status:
+            # Status values come from BinStatus, never from user input
+            assignments.append(f"{old_status}_count = {old_status}_count - 1")
+            assignments.append(f"{new_status}_count = {new_status}_count + 1")
+        
+        await db.execute(
+            f"UPDATE inventory_summary SET {', '.join(assignments)}, updated_at = datetime('now') WHERE id = 1",
+            (items_delta,)
+        )
+    
     async def get_inventory_summary(self) -> InventorySummary:
-        """Get inventory summary statistics"""
-        inventory = await self.get_current_inventory()
+        """Get inventory summary statistics from the maintained counters"""
         db = await get_database()
         
-        active_alerts = await db.fetch_one(
-            "SELECT COUNT(*) as count FROM alert_logs WHERE is_acknowledged = 0"
+        row = await db.fetch_one(
+            """SELECT total_bins, normal_count, low_count, critical_count, empty_count,
+                      total_items, alerts_active
+               FROM inventory_summary WHERE id = 1"""
         )
         
-        return InventorySummary(
-            total_bins=len(inventory),
-            normal_count=sum(1 for b in inventory if b.status == BinStatus.NORMAL),
-            low_count=sum(1 for b in inventory if b.status == BinStatus.LOW),
-            critical_count=sum(1 for b in inventory if b.status == BinStatus.CRITICAL),
-            empty_count=sum(1 for b in inventory if b.status == BinStatus.EMPTY),
-            total_items=sum(b.current_quantity for b in inventory),
-            alerts_active=active_alerts.get('count', 0) if active_alerts else 0
-        )
+        if not row:
+            await rebuild_inventory_summary(db)
+            row = await db.fetch_one(
+                """SELECT total_bins, normal_count, low_count, critical_count, empty_count,
+                          total_items, alerts_active
+                   FROM inventory_summary WHERE id = 1"""
+            )
+        
+        return InventorySummary(**row)
+    
+    @query_cache.cached(
+        "inventory.status_distribution", lambda: settings.cache_status_ttl_seconds, (READINGS, BINS)
+    )
+    async def get_status_distribution(self) -> dict:
+        """Bin counts per status for the dashboard pie chart"""
+        summary = await self.get_inventory_summary()
+        
+        distribution = [
+            {"status": "Normal", "count": summary.normal_count, "color": "#22c55e"},
+            {"status": "Low", "count": summary.low_count, "color": "#eab308"},
+            {"status": "Critical", "count": summary.critical_count, "color": "#f97316"},
+            {"status": "Empty", "count": summary.empty_count, "color": "#ef4444"}
+        ]
+        
+        return {
+            "distribution": distribution,
+            "total": summary.total_bins
+        }
     
     async def get_historical_data(
         self,
         bin_id: str,
         start_date: str,
         end_date: str,
-        limit: int = 1000
+        limit: int = 1000,
+        max_points: Optional[int] = None
     ) -> list[HistoricalDataPoint]:
-        """Get historical data for a bin"""
+        """Get historical data for a bin, downsampled to max_points when given"""
         db = await get_database()
         
         rows = await db.fetch_all(
@@ -203,22 +463,73 @@ class InventoryService:
             (bin_id, start_date, end_date, limit)
         )
         
-        return [HistoricalDataPoint(**row) for row in rows]
+        return historical_points_from_rows(downsample_rows(rows, "quantity", max_points))
+    
+    async def get_historical_points(
+        self,
+        bin_id: str,
+        start_date: str,
+        end_date: str,
+        limit: int = 1000,
+        max_points: Optional[int] = None
+    ) -> np.ndarray:
+        """Same rows as get_historical_data, as a columnar record array"""
+        db = await get_database()
+        
+        rows = await db.fetch_rows(
+            f"""SELECT {POINT_COLUMNS_SQL}
+               FROM inventory_data
+               WHERE bin_id = ? AND timestamp BETWEEN ? AND ?
+               ORDER BY timestamp ASC
+               LIMIT ?""",
+            (bin_id, start_date, end_date, limit)
+        )
+        
+        points = to_points(rows)
+        if max_points and len(points) > max_points:
+            points = points[minmax_indices(points["quantity"], max_points)]
+        return points
+    
+    @query_cache.cached(
+        "inventory.all_historical_points", lambda: settings.cache_trends_ttl_seconds, (BINS, HISTORY)
+    )
+    async def get_all_historical_points(
+        self,
+        start_date: str,
+        end_date: str,
+        max_points: Optional[int] = None
+    ) -> list[tuple[str, np.ndarray]]:
+        """Same rows as get_all_historical_data, as one record array per bin"""
+        bins = await self.get_all_bin_configurations()
+        
+        return [
+            (
+                bin_config.bin_id,
+                await self.get_historical_points(bin_config.bin_id, start_date, end_date, max_points=max_points)
+            )
+            for bin_config in bins
+        ]
     
+    @query_cache.cached(
+        "inventory.all_historical_data", lambda: settings.cache_trends_ttl_seconds, (BINS, HISTORY)
+    )
     async def get_all_historical_data(
         self,
         start_date: str,
-        end_date: str
+        end_date: str,
+        max_points: Optional[int] = None
     ) -> list[dict]:
         """Get historical data for all bins"""
         bins = await self.get_all_bin_configurations()
         
         result = []
         for bin_config in bins:
-            data = await self.get_historical_data(bin_config.bin_id, start_date, end_date)
+            data = await self.get_historical_data(
+                bin_config.bin_id, start_date, end_date, max_points=max_points
+            )
             result.append({
                 "bin_id": bin_config.bin_id,
-                "data": [d.model_dump() for d in data]
+                "data": dump_models(data)
             })
         
         return result
@@ -281,21 +592,34 @@ class InventoryService:
             "trend": trend
         }
     
-    async def cleanup_old_data(self, retention_days: int = 90) -> int:
-        """Clean up old historical data"""
-        db = await get_database()
-        cutoff_date = (datetime.now() - timedelta(days=retention_days)).isoformat()
+    @query_cache.cached(
+        "inventory.all_consumption_rates", lambda: settings.cache_consumption_ttl_seconds, (BINS, HISTORY)
+    )
+    async def get_all_consumption_rates(self) -> list[dict]:
+        """Consumption rate of every bin, with its article name"""
+        bins = await self.get_all_bin_configurations()
         
-        result = await db.fetch_one(
-            "SELECT COUNT(*) as count FROM inventory_data WHERE timestamp < ?",
-            (cutoff_date,)
-        )
-        count = result.get('count', 0) if result else 0
+        consumption_data = []
+        for bin_config in bins:
+            rate = await self.get_consumption_rate(bin_config.bin_id)
+            consumption_data.append({
+                "bin_id": bin_config.bin_id,
+                "article_name": bin_config.article_name,
+                **rate
+            })
         
-        await db.execute(
-            "DELETE FROM inventory_data WHERE timestamp < ?",
-            (cutoff_date,)
-        )
+        return consumption_data
+    
+    async def cleanup_old_data(self, retention_days: int = 90) -> int:
+        """Clean up old historical data in small batches, until none is left"""
+        from services.retention_service import retention_service
+        
+        count = 0
+        remaining = True
+        # Each purge is capped at retention_max_batches; keep going so the cleanup is complete
+        while remaining:
+            deleted, remaining = await retention_service.purge_inventory_data(retention_days)
+            count += deleted
         
         logger.info(f"Cleaned up {count} old inventory records")
         return count
@@ -0,0 +1,73 @@
+import logging
+
+from config import settings
+from database import get_database, rebuild_inventory_summary
+from services.retention_service import retention_service
+from services.forecast_service import forecast_service
+
+logger = logging.getLogger(__name__)
+
+
+class MaintenanceService:
+    """Periodic database upkeep run by the background scheduler"""
+    
+    async def checkpoint(self) -> dict:
+        """Checkpoint the WAL so it does not grow between restarts"""
+        db = await get_database()
+        return await db.checkpoint()
+    
+    async def optimize(self) -> dict:
+        """Let SQLite refresh statistics for tables whose usage changed"""
+        db = await get_database()
+        await db.optimize()
+        return {"analyze": False}
+    
+    async def analyze(self) -> dict:
+        """Full ANALYZE followed by PRAGMA optimize"""
+        db = await get_database()
+        await db.optimize(analyze=True)
+        return {"analyze": True}
+    
+    async def rebuild_summary(self) -> dict:
+        """Recount the summary counters to correct any drift"""
+        await rebuild_inventory_summary()
+        return {"rebuilt": True}
+    
+    async def refit_forecast(self) -> dict:
+        """Refit the forecast from stored history to pick up readings other workers recorded"""
+        return await forecast_service.load()
+    
+    def register_jobs(self, scheduler) -> None:
+        """Register every maintenance job with the scheduler"""
+        jitter = settings.scheduler_jitter_seconds
+        
+        scheduler.add_interval_job(
+            "retention", retention_service.drain,
+            seconds=settings.retention_interval_hours * 3600, jitter_seconds=jitter
+        )
+        scheduler.add_interval_job(
+            "wal_checkpoint", self.checkpoint,
+            seconds=settings.wal_checkpoint_interval_minutes * 60, jitter_seconds=jitter,
+            timeout_seconds=300
+        )
+        scheduler.add_interval_job(
+            "summary_rebuild", self.rebuild_summary,
+            seconds=settings.summary_rebuild_interval_minutes * 60, jitter_seconds=jitter,
+            timeout_seconds=300
+        )
+        # The model lives in each worker's memory, so every worker refits its own
+        scheduler.add_interval_job(
+            "forecast_refit", self.refit_forecast,
+            seconds=settings.forecast_refit_interval_minutes * 60, jitter_seconds=jitter,
+            timeout_seconds=300, single_instance=False
+        )
+        scheduler.add_cron_job(
+            "optimize", self.optimize, settings.optimize_cron, jitter_seconds=jitter
+        )
+        scheduler.add_cron_job(
+            "analyze", self.analyze, settings.analyze_cron, jitter_seconds=jitter
+        )
+
+
+# Singleton instance
+maintenance_service = MaintenanceService()
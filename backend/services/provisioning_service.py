@@ -0,0 +1,223 @@
+import csv
+import io
+import json
+import logging
+import time
+
+from pydantic import ValidationError
+
+from database import get_database, DatabaseAdapter, rebuild_inventory_summary
+from models import BinLayoutEntry
+from services.query_cache import query_cache, BINS
+
+logger = logging.getLogger(__name__)
+
+# Columns compared when diffing a layout against the stored configuration
+LAYOUT_FIELDS = (
+    "row", "position", "article_type", "article_name", "article_weight_grams",
+    "min_threshold", "critical_threshold", "max_capacity"
+)
+
+
+class LayoutValidationError(ValueError):
+    """Raised when a layout fails validation; carries every problem found"""
+    
+    def __init__(self, errors: list[dict]):
+        super().__init__(f"Layout validation failed with {len(errors)} error(s)")
+        self.errors = errors
+
+
+class ProvisioningService:
+    """Service for bulk bin provisioning from warehouse layouts"""
+    
+    def parse_layout(self, content: str | bytes, fmt: str) -> list[dict]:
+        """Parse a CSV or JSON layout into raw entries"""
+        if isinstance(content, bytes):
+            content = content.decode("utf-8-sig")
+        
+        fmt = fmt.lower()
+        if fmt == "json":
+            data = json.loads(content)
+            if isinstance(data, dict):
+                data = data.get("bins", [])
+            if not isinstance(data, list):
+                raise LayoutValidationError([{"line": None, "error": "JSON layout must be a list of bins"}])
+            return data
+        
+        if fmt == "csv":
+            reader = csv.DictReader(io.StringIO(content))
+            # Drop empty cells so model defaults apply
+            return [
+                {k.strip(): v.strip() for k, v in row.items() if k and v is not None and v.strip() != ""}
+                for row in reader
+            ]
+        
+        raise LayoutValidationError([{"line": None, "error": f"Unsupported layout format: {fmt}"}])
+    
+    async def validate_layout(self, entries: list[dict]) -> list[BinLayoutEntry]:
+        """Validate every entry up front, collecting all errors before any write"""
+        errors: list[dict] = []
+        # Valid entries with their input line, so later checks report the right one
+        bins: list[tuple[int, BinLayoutEntry]] = []
+        
+        for index, entry in enumerate(entries, 1):
+            try:
+                bins.append((index, BinLayoutEntry(**entry)))
+            except ValidationError as e:
+                for err in e.errors():
+                    errors.append({
+                        "line": index,
+                        "bin_id": entry.get("bin_id") if isinstance(entry, dict) else None,
+                        "field": ".".join(str(loc) for loc in err["loc"]) or None,
+                        "error": err["msg"]
+                    })
+            except TypeError:
+                errors.append({"line": index, "bin_id": None, "field": None, "error": "Entry must be an object"})
+        
+        seen_ids: dict[str, int] = {}
+        seen_slots: dict[tuple[int, int], str] = {}
+        for index, bin_entry in bins:
+            if bin_entry.bin_id in seen_ids:
+                errors.append({
+                    "line": index, "bin_id": bin_entry.bin_id, "field": "bin_id",
+                    "error": f"Duplicate bin_id (first seen on line {seen_ids[bin_entry.bin_id]})"
+                })
+            seen_ids.setdefault(bin_entry.bin_id, index)
+            
+            slot = (bin_entry.row, bin_entry.position)
+            if slot in seen_slots and seen_slots[slot] != bin_entry.bin_id:
+                errors.append({
+                    "line": index, "bin_id": bin_entry.bin_id, "field": "position",
+                    "error": f"Row {slot[0]}, position {slot[1]} already used by {seen_slots[slot]}"
+                })
+            seen_slots.setdefault(slot, bin_entry.bin_id)
+        
+        # Slots held by stored bins that the layout does not mention
+        if not errors:
+            db = await get_database()
+            existing = await db.fetch_all("SELECT bin_id, row, position FROM bin_configurations")
+            for row in existing:
+                slot = (row["row"], row["position"])
+                owner = seen_slots.get(slot)
+                if owner and owner != row["bin_id"] and row["bin_id"] not in seen_ids:
+                    errors.append({
+                        "line": seen_ids[owner], "bin_id": owner, "field": "position",
+                        "error": f"Row {slot[0]}, position {slot[1]} is occupied by existing bin {row['bin_id']}"
+                    })
+        
+        if errors:
+            raise LayoutValidationError(errors)
+        
+        return [bin_entry for _, bin_entry in bins]
+    
+    async def provision(self, entries: list[dict], dry_run: bool = False) -> dict:
+        """
+        Validate a layout and upsert it in a single transaction.
+        
+        Creates missing bins with their current inventory snapshot and
+        default alert configurations, updates changed bins, and returns a
+        diff against what was stored before.
+        """
+        started = time.perf_counter()
+        bins = await self.validate_layout(entries)
+        db = await get_database()
+        
+        existing_rows = await db.fetch_all(
+            f"SELECT bin_id, {', '.join(LAYOUT_FIELDS)} FROM bin_configurations"
+        )
+        existing = {row["bin_id"]: row for row in existing_rows}
+        
+        created: list[BinLayoutEntry] = []
+        updated: list[tuple[BinLayoutEntry, dict]] = []
+        unchanged = 0
+        
+        for bin_entry in bins:
+            current = existing.get(bin_entry.bin_id)
+            if current is None:
+                created.append(bin_entry)
+                continue
+            
+            changes = {
+                field: {"old": current[field], "new": getattr(bin_entry, field)}
+                for field in LAYOUT_FIELDS
+                if current[field] != getattr(bin_entry, field)
+            }
+            if changes:
+                updated.append((bin_entry, changes))
+            else:
+                unchanged += 1
+        
+        layout_ids = {b.bin_id for b in bins}
+        report = {
+            "dry_run": dry_run,
+            "total": len(bins),
+            "created": [b.bin_id for b in created],
+            "updated": [{"bin_id": b.bin_id, "changes": changes} for b, changes in updated],
+            "unchanged": unchanged,
+            "not_in_layout": sorted(bin_id for bin_id in existing if bin_id not in layout_ids)
+        }
+        
+        if not dry_run and (created or updated):
+            await self._apply(db, created, [b for b, _ in updated])
+            query_cache.invalidate(BINS)
+        
+        report["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(
+            f"Provisioned layout: {len(created)} created, {len(updated)} updated, "
+            f"{unchanged} unchanged{' (dry run)' if dry_run else ''}"
+        )
+        return report
+    
+    async def _apply(
+        self,
+        db: DatabaseAdapter,
+        created: list[BinLayoutEntry],
+        updated: list[BinLayoutEntry]
+    ) -> None:
+        """Write the layout diff in one transaction"""
+        upserts = [
+            (b.bin_id, b.row, b.position, b.article_type, b.article_name, b.article_weight_grams,
+             b.min_threshold, b.critical_threshold, b.max_capacity)
+            for b in created + updated
+        ]
+        new_ids = [(b.bin_id,) for b in created]
+        
+        async with db.transaction():
+            await db.execute_many(
+                """INSERT INTO bin_configurations
+                   (bin_id, row, position, article_type, article_name, article_weight_grams,
+                    min_threshold, critical_threshold, max_capacity)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(bin_id) DO UPDATE SET
+                    row = excluded.row,
+                    position = excluded.position,
+                    article_type = excluded.article_type,
+                    article_name = excluded.article_name,
+                    article_weight_grams = excluded.article_weight_grams,
+                    min_threshold = excluded.min_threshold,
+                    critical_threshold = excluded.critical_threshold,
+                    max_capacity = excluded.max_capacity,
+                    updated_at = datetime('now')""",
+                upserts
+            )
+            
+            if created:
+                await db.execute_many(
+                    """INSERT OR IGNORE INTO current_inventory (bin_id, weight_grams, calculated_quantity, last_updated)
+                       VALUES (?, 0, 0, datetime('now'))""",
+                    new_ids
+                )
+                # Existing alert configurations are operator-tuned and left alone
+                await db.execute_many(
+                    """INSERT OR IGNORE INTO alert_configurations (bin_id, alert_type, threshold_value, is_enabled)
+                       VALUES (?, ?, ?, 1)""",
+                    [(b.bin_id, "low_stock", b.min_threshold) for b in created]
+                    + [(b.bin_id, "critical_stock", b.critical_threshold) for b in created]
+                )
+            
+            # New bins and threshold changes shift statuses; recount once for the whole batch
+            await rebuild_inventory_summary(db)
+
+
+# Singleton instance
+provisioning_service = ProvisioningService()
@@ -0,0 +1,167 @@
+"""
+Single-flight TTL cache for expensive read paths.
+
+Analytics and export results are cached per call arguments for a TTL set
+per function. Concurrent identical calls share one in-flight computation
+instead of each running it; the computation runs as its own task, so a
+caller that disconnects does not cancel it for the others.
+
+Cached functions name the data changes that make them stale. Write paths
+report those changes through invalidate(), which drops the matching
+entries at once. Results computed while a change happened are handed to
+their waiters but not stored. The cache holds at most cache_max_entries
+results and evicts the least recently used one first.
+
+Cached results are shared between callers and must not be mutated.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Awaitable, Callable, Hashable, Iterable
+
+from config import settings
+from monitoring import CACHE_REQUESTS, CACHE_EVICTIONS
+
+logger = logging.getLogger(__name__)
+
+# Data changes that cached results can depend on
+READINGS = "readings"   # a sensor reading was stored
+BINS = "bins"           # bin configuration or layout changed
+ALERTS = "alerts"       # an alert was created or acknowledged
+HISTORY = "history"     # retention deleted old history
+
+
+def _freeze(value: Any) -> Hashable:
+    """Hashable form of a call argument; lists and dicts become tuples"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "name", "depends_on")
+    
+    def __init__(self, value: Any, expires_at: float, name: str, depends_on: tuple[str, ...]):
+        self.value = value
+        self.expires_at = expires_at
+        self.name = name
+        self.depends_on = depends_on
+
+
+class QueryCache:
+    """Size-bounded LRU of TTL'd results with request coalescing and change-driven invalidation"""
+    
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._in_flight: dict[tuple, asyncio.Task] = {}
+        # Keys of the stored results that depend on each data change
+        self._dependents: dict[str, set[tuple]] = {}
+        # Bumped on every invalidation so in-flight results from before a change are not stored
+        self._generations: dict[str, int] = {}
+    
+    def cached(
+        self,
+        name: str,
+        ttl: Callable[[], float] | float,
+        depends_on: Iterable[str] = ()
+    ) -> Callable:
+        """Decorate a service method; its arguments, without self, form the cache key"""
+        depends_on = tuple(depends_on)
+        
+        def decorator(func: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+            @wraps(func)
+            async def wrapper(service, *args, **kwargs):
+                if not settings.cache_enabled:
+                    return await func(service, *args, **kwargs)
+                key = (name, _freeze(args), _freeze(kwargs))
+                seconds = ttl() if callable(ttl) else ttl
+                return await self.get_or_compute(
+                    key, lambda: func(service, *args, **kwargs), seconds, depends_on
+                )
+            
+            wrapper.uncached = func
+            return wrapper
+        
+        return decorator
+    
+    async def get_or_compute(
+        self,
+        key: tuple,
+        compute: Callable[[], Awaitable],
+        ttl: float,
+        depends_on: tuple[str, ...] = ()
+    ) -> Any:
+        """Return the cached result for key, joining or starting its computation on a miss"""
+        name = key[0]
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                CACHE_REQUESTS.inc(1, name, "hit")
+                return entry.value
+            self._drop(key, "expired")
+        
+        generations = tuple(self._generations.get(change, 0) for change in depends_on)
+        flight_key = (key, generations)
+        task = self._in_flight.get(flight_key)
+        if task is not None:
+            CACHE_REQUESTS.inc(1, name, "coalesced")
+        else:
+            CACHE_REQUESTS.inc(1, name, "miss")
+            task = asyncio.ensure_future(compute())
+            self._in_flight[flight_key] = task
+            task.add_done_callback(
+                lambda done: self._finish(flight_key, done, ttl, depends_on)
+            )
+        
+        # Shielded so one caller's cancellation does not cancel the shared computation
+        return await asyncio.shield(task)
+    
+    def _finish(self, flight_key: tuple, task: asyncio.Task, ttl: float, depends_on: tuple[str, ...]) -> None:
+        """Store a finished computation unless it failed or its data changed meanwhile"""
+        key, generations = flight_key
+        self._in_flight.pop(flight_key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        if generations != tuple(self._generations.get(change, 0) for change in depends_on):
+            return
+        
+        self._entries[key] = _Entry(task.result(), time.monotonic() + ttl, key[0], depends_on)
+        self._entries.move_to_end(key)
+        for change in depends_on:
+            self._dependents.setdefault(change, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)), "lru")
+    
+    def _drop(self, key: tuple, reason: str) -> None:
+        entry = self._entries.pop(key)
+        for change in entry.depends_on:
+            self._dependents[change].discard(key)
+        CACHE_EVICTIONS.inc(1, entry.name, reason)
+    
+    def invalidate(self, *changes: str) -> None:
+        """Drop every result that depends on any of the given data changes"""
+        for change in changes:
+            self._generations[change] = self._generations.get(change, 0) + 1
+            for key in list(self._dependents.get(change, ())):
+                if key in self._entries:
+                    self._drop(key, "invalidated")
+    
+    def clear(self) -> None:
+        """Drop every cached result"""
+        self._entries.clear()
+        self._dependents.clear()
+    
+    def size(self) -> int:
+        """Number of cached results"""
+        return len(self._entries)
+
+
+# Singleton instance
+query_cache = QueryCache(settings.cache_max_entries)
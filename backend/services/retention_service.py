@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from config import settings
+from database import get_database
+from services.query_cache import query_cache, HISTORY
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_DAYS = 90
+
+
+class RetentionService:
+    """Service for deleting expired history in small, rate-limited batches"""
+    
+    async def get_retention_days(self) -> int:
+        """Read data_retention_days from system_settings"""
+        db = await get_database()
+        row = await db.fetch_one(
+            "SELECT setting_value FROM system_settings WHERE setting_key = 'data_retention_days'"
+        )
+        try:
+            return max(1, int(row['setting_value'])) if row else DEFAULT_RETENTION_DAYS
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid data_retention_days setting: {row['setting_value']!r}")
+            return DEFAULT_RETENTION_DAYS
+    
+    async def _purge(
+        self,
+        select_sql: str,
+        delete_sql: str,
+        params: tuple,
+        batch_size: int,
+        pause_seconds: float,
+        max_batches: int
+    ) -> tuple[int, bool]:
+        """
+        Delete matching rows one batch at a time.
+        
+        Each batch is its own short transaction and the loop sleeps between
+        batches so ingest writes can take the lock. Returns the number of
+        rows deleted and whether expired rows remain for the next run.
+        """
+        db = await get_database()
+        deleted = 0
+        
+        for _ in range(max_batches):
+            rows = await db.fetch_all(select_sql, params + (batch_size,))
+            if not rows:
+                return deleted, False
+            
+            await db.execute_many(delete_sql, [(row['id'],) for row in rows])
+            deleted += len(rows)
+            query_cache.invalidate(HISTORY)
+            
+            if len(rows) < batch_size:
+                return deleted, False
+            
+            await asyncio.sleep(pause_seconds)
+        
+        return deleted, True
+    
+    async def purge_inventory_data(
+        self,
+        retention_days: int,
+        batch_size: Optional[int] = None,
+        max_batches: Optional[int] = None
+    ) -> tuple[int, bool]:
+        """Delete inventory_data rows older than the retention window"""
+        cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+        
+        return await self._purge(
+            "SELECT id FROM inventory_data WHERE timestamp < ? LIMIT ?",
+            "DELETE FROM inventory_data WHERE id = ?",
+            (cutoff,),
+            batch_size or settings.retention_batch_size,
+            settings.retention_batch_pause_ms / 1000,
+            max_batches or settings.retention_max_batches
+        )
+    
+    async def purge_alert_logs(
+        self,
+        retention_days: int,
+        batch_size: Optional[int] = None,
+        max_batches: Optional[int] = None
+    ) -> tuple[int, bool]:
+        """Delete acknowledged alerts older than the retention window; active alerts are kept"""
+        return await self._purge(
+            """SELECT id FROM alert_logs
+               WHERE created_at < datetime('now', ?) AND is_acknowledged = 1
+               LIMIT ?""",
+            "DELETE FROM alert_logs WHERE id = ?",
+            (f"-{retention_days} days",),
+            batch_size or settings.retention_batch_size,
+            settings.retention_batch_pause_ms / 1000,
+            max_batches or settings.retention_max_batches
+        )
+    
+    async def purge_quarantined_readings(
+        self,
+        retention_days: int,
+        batch_size: Optional[int] = None,
+        max_batches: Optional[int] = None
+    ) -> tuple[int, bool]:
+        """Delete quarantined readings older than the retention window"""
+        return await self._purge(
+            "SELECT id FROM quarantined_readings WHERE created_at < datetime('now', ?) LIMIT ?",
+            "DELETE FROM quarantined_readings WHERE id = ?",
+            (f"-{retention_days} days",),
+            batch_size or settings.retention_batch_size,
+            settings.retention_batch_pause_ms / 1000,
+            max_batches or settings.retention_max_batches
+        )
+    
+    async def run(self, retention_days: Optional[int] = None) -> dict:
+        """
+        Run one bounded retention pass over inventory_data, alert_logs and quarantined_readings.
+        
+        Work per pass is capped by retention_max_batches; anything left over
+        is picked up by the next pass instead of holding the writer lock.
+        """
+        started = time.perf_counter()
+        retention_days = retention_days or await self.get_retention_days()
+        
+        inventory_deleted, inventory_remaining = await self.purge_inventory_data(retention_days)
+        alerts_deleted, alerts_remaining = await self.purge_alert_logs(retention_days)
+        quarantined_deleted, quarantined_remaining = await self.purge_quarantined_readings(retention_days)
+        
+        storage = {}
+        if inventory_deleted or alerts_deleted or quarantined_deleted:
+            db = await get_database()
+            storage = await db.reclaim_space()
+        
+        result = {
+            "retention_days": retention_days,
+            "inventory_data_deleted": inventory_deleted,
+            "alert_logs_deleted": alerts_deleted,
+            "quarantined_readings_deleted": quarantined_deleted,
+            "backlog_remaining": inventory_remaining or alerts_remaining or quarantined_remaining,
+            "storage": storage,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+        
+        logger.info(
+            f"Retention pass: {inventory_deleted} inventory rows, {alerts_deleted} alerts, "
+            f"{quarantined_deleted} quarantined readings deleted "
+            f"(older than {retention_days} days)"
+        )
+        return result
+    
+    async def drain(self) -> dict:
+        """Run retention passes back to back until no expired rows remain"""
+        totals = {
+            "passes": 0, "inventory_data_deleted": 0, "alert_logs_deleted": 0, "quarantined_readings_deleted": 0
+        }
+        while True:
+            result = await self.run()
+            totals["passes"] += 1
+            totals["inventory_data_deleted"] += result["inventory_data_deleted"]
+            totals["alert_logs_deleted"] += result["alert_logs_deleted"]
+            totals["quarantined_readings_deleted"] += result["quarantined_readings_deleted"]
+            if not result["backlog_remaining"]:
+                return totals
+            await asyncio.sleep(1)
+
+
+# Singleton instance
+retention_service = RetentionService()
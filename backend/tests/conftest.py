@@ -0,0 +1,52 @@
+"""
+Shared fixtures for the backend test suite.
+
+Run from the backend directory:
+    python -m pytest
+"""
+
+import os
+import tempfile
+
+# Settings are read once at import; keep background work out of the tests
+os.environ.setdefault("DATABASE_URL", os.path.join(tempfile.mkdtemp(), "inventory.db"))
+os.environ.setdefault("SCHEDULER_ENABLED", "false")
+os.environ.setdefault("LOOP_MONITOR_ENABLED", "false")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import pytest
+
+from config import settings
+from database import init_database, close_database, run_migrations, seed_default_bins
+from services import query_cache, ingest_dedup, anomaly_service
+
+
+@pytest.fixture(autouse=True)
+def reset_state():
+    """Forget in-memory state a previous test left in the service singletons"""
+    query_cache.clear()
+    ingest_dedup.clear()
+    anomaly_service.detector.reset()
+    yield
+
+
+@pytest.fixture
+async def db(tmp_path, monkeypatch):
+    """A migrated database with the ten default bins"""
+    monkeypatch.setattr(settings, "database_url", str(tmp_path / "inventory.db"))
+    database = await init_database()
+    await run_migrations(database)
+    await seed_default_bins(database)
+    yield database
+    await close_database()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Test client for the app, started against its own database"""
+    from fastapi.testclient import TestClient
+    from main import app
+    
+    monkeypatch.setattr(settings, "database_url", str(tmp_path / "inventory.db"))
+    with TestClient(app) as test_client:
+        yield test_client
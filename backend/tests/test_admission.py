@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from admission import ClassBudget, classify
+from database import Priority
+
+
+@pytest.mark.parametrize("method, path, expected", [
+    ("POST", "/api/bins/data", Priority.INGEST),
+    ("POST", "/api/bins/backfill", Priority.BULK),
+    ("GET", "/api/export/csv", Priority.BULK),
+    ("GET", "/api/analytics/aggregate", Priority.BULK),
+    ("GET", "/api/bins", Priority.INTERACTIVE),
+    ("GET", "/health", None),
+    ("OPTIONS", "/api/bins/data", None),
+])
+def test_classify(method, path, expected):
+    assert classify(method, path) is expected
+
+
+async def test_bulk_without_a_queue_is_shed_at_once():
+    budget = ClassBudget("bulk", concurrency=1, queue_limit=0)
+    assert await budget.acquire(timeout=5)
+    
+    assert not await asyncio.wait_for(budget.acquire(timeout=5), 0.1)
+    
+    budget.release()
+    assert await budget.acquire(timeout=5)
+
+
+async def test_timed_out_and_cancelled_waiters_leave_the_queue():
+    budget = ClassBudget("interactive", concurrency=1, queue_limit=2)
+    assert await budget.acquire(timeout=5)
+    
+    assert not await budget.acquire(timeout=0.01)
+    cancelled = asyncio.create_task(budget.acquire(timeout=5))
+    await asyncio.sleep(0)
+    assert budget.waiting == 1
+    cancelled.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+    
+    assert budget.status() == {"concurrency": 1, "queue_limit": 2, "in_flight": 1, "waiting": 0}
+    budget.release()
+    assert await asyncio.wait_for(budget.acquire(timeout=5), 1)
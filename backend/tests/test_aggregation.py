@@ -0,0 +1,46 @@
+import pytest
+
+from services import aggregation_service
+
+# Bin A reports at 10:10 and 11:10, bin B only at 10:20; both are in row 1
+READINGS = [
+    ("BIN-R1P1", 125.0, 50, "2030-01-01T10:10:00"),
+    ("BIN-R1P2", 144.0, 80, "2030-01-01T10:20:00"),
+    ("BIN-R1P1", 112.5, 45, "2030-01-01T11:10:00"),
+]
+
+
+@pytest.fixture
+async def history(db):
+    await db.execute("DELETE FROM inventory_data")
+    await db.execute_many(
+        "INSERT INTO inventory_data (bin_id, weight_grams, calculated_quantity, timestamp) VALUES (?, ?, ?, ?)",
+        READINGS
+    )
+    return db
+
+
+async def _last(start: str, group_by: str) -> list[tuple]:
+    result = await aggregation_service.aggregate(
+        start, "2030-01-01T12:00:00", "1h", "last", group_by, bin_ids=["BIN-R1P1", "BIN-R1P2"]
+    )
+    return [(row[result["group_by"]], row["bucket_start"], row["last"]) for row in result["rows"]]
+
+
+async def test_last_per_bin_is_the_final_reading_in_each_bucket(history):
+    assert await _last("2030-01-01T10:00:00", "bin") == [
+        ("BIN-R1P1", "2030-01-01T10:00:00", 50),
+        ("BIN-R1P1", "2030-01-01T11:00:00", 45),
+        ("BIN-R1P2", "2030-01-01T10:00:00", 80),
+    ]
+
+
+async def test_group_last_carries_bins_that_did_not_report(history):
+    assert await _last("2030-01-01T10:00:00", "row") == [
+        (1, "2030-01-01T10:00:00", 130),
+        (1, "2030-01-01T11:00:00", 125),
+    ]
+
+
+async def test_group_last_includes_readings_from_before_the_range(history):
+    assert await _last("2030-01-01T11:00:00", "row") == [(1, "2030-01-01T11:00:00", 125)]
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+from models import BinDataPayload
+from routers.bins import _process_batch, _process_reading
+from services import anomaly_service, ingest_dedup, inventory_service
+from services.anomaly_service import HampelDetector
+
+START = datetime.now() + timedelta(days=1)
+
+
+def _reading(minute: int, quantity: int) -> BinDataPayload:
+    return BinDataPayload(
+        bin_id="BIN-R1P1",
+        row=1,
+        position=1,
+        weight_grams=quantity * 2.5,
+        article_weight_grams=2.5,
+        calculated_quantity=quantity,
+        timestamp=START + timedelta(minutes=minute)
+    )
+
+
+async def _store_history(quantities: list[int]) -> None:
+    for minute, quantity in enumerate(quantities):
+        data = _reading(minute, quantity)
+        await inventory_service.record_inventory_data(
+            data.bin_id, data.weight_grams, data.calculated_quantity, data.timestamp.isoformat()
+        )
+
+
+def test_step_change_is_flagged_once_then_confirmed():
+    detector = HampelDetector(window=15, threshold=3.5, confirm_readings=2)
+    for _ in range(10):
+        assert detector.check("BIN-R1P1", 50, 100) is None
+    
+    anomaly = detector.check("BIN-R1P1", 0, 100)
+    
+    assert anomaly["direction"] == "drop"
+    assert anomaly["expected_quantity"] == 50
+    assert detector.check("BIN-R1P1", 0, 100) is None
+    assert detector.check("BIN-R1P1", 1, 100) is None
+
+
+async def test_flagged_reading_is_stored_and_applied(db):
+    for minute in range(10):
+        assert (await _process_reading(_reading(minute, 50)))[0] == "accepted"
+    
+    outcome, bin_data = await _process_reading(_reading(10, 0))
+    
+    assert outcome == "flagged"
+    assert bin_data.current_quantity == 0
+    assert bin_data.status == "empty"
+    history = await db.fetch_one(
+        "SELECT calculated_quantity FROM inventory_data WHERE bin_id = ? ORDER BY timestamp DESC LIMIT 1",
+        ("BIN-R1P1",)
+    )
+    assert history["calculated_quantity"] == 0
+    flagged = await anomaly_service.get_flagged(bin_id="BIN-R1P1")
+    assert [(reading.calculated_quantity, reading.direction) for reading in flagged] == [(0, "drop")]
+
+
+async def test_window_is_seeded_from_history_after_restart(db):
+    await _store_history([50] * 15)
+    anomaly_service.detector.reset()
+    
+    anomaly = await anomaly_service.check("BIN-R1P1", 0, 100)
+    
+    assert anomaly is not None
+    assert anomaly["expected_quantity"] == 50
+
+
+async def test_retried_and_late_outliers_leave_the_window_alone(db):
+    for minute in range(10):
+        assert (await _process_reading(_reading(minute, 50)))[0] == "accepted"
+    assert (await _process_reading(_reading(10, 0), key="seq:10"))[0] == "flagged"
+    
+    # The window forgot the key, so the retry only stops at the unique index
+    ingest_dedup.clear()
+    assert (await _process_reading(_reading(10, 0), key="seq:10"))[0] == "duplicate"
+    assert (await _process_reading(_reading(5, 0)))[0] == "stale"
+    
+    assert (await _process_reading(_reading(11, 50)))[0] == "accepted"
+    flagged = await anomaly_service.get_flagged(bin_id="BIN-R1P1")
+    assert [reading.calculated_quantity for reading in flagged] == [0]
+
+
+async def test_batch_screens_only_new_readings_in_time_order(db):
+    await _process_batch([_reading(minute, 50) for minute in range(10)], [None] * 10)
+    payloads = [_reading(11, 50), _reading(10, 0), _reading(3, 0)]
+    
+    counts = await _process_batch(payloads, ["seq:11", "seq:10", None])
+    ingest_dedup.clear()
+    retried = await _process_batch(payloads[1:2], ["seq:10"])
+    
+    assert (counts["accepted"], counts["flagged"], counts["stale"]) == (1, 1, 1)
+    assert retried["duplicate"] == 1
+    assert (await _process_reading(_reading(12, 50)))[0] == "accepted"
@@ -0,0 +1,118 @@
+import gzip
+import importlib
+import json
+import zlib
+
+import pytest
+
+from services.backfill_service import LineTooLongError, _decompressed, _line_batches
+
+# services re-exports the singleton under the module's name
+backfill_module = importlib.import_module("services.backfill_service")
+
+
+async def _chunks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def _collect(iterator) -> list:
+    return [item async for item in iterator]
+
+
+def _ndjson(count: int, start_minute: int = 0) -> bytes:
+    return b"".join(
+        json.dumps({
+            "bin_id": "BIN-R1P3", "row": 1, "position": 3, "weight_grams": 50 * 0.5,
+            "article_weight_grams": 0.5, "calculated_quantity": 50, "seq": minute,
+            "timestamp": f"2030-01-01T{minute // 60:02d}:{minute % 60:02d}:00"
+        }).encode() + b"\n"
+        for minute in range(start_minute, start_minute + count)
+    )
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+async def test_decompressed_passes_plain_uploads_through(chunk_size):
+    data = b"bin_id,row\nBIN-R1P1,1\n"
+    
+    assert b"".join(await _collect(_decompressed(_chunks(data, chunk_size)))) == data
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 1 << 16])
+async def test_decompressed_reads_every_gzip_member(chunk_size):
+    first, second = b"a\n" * 1000, b"b\n" * 1000
+    data = gzip.compress(first) + gzip.compress(second)
+    
+    assert b"".join(await _collect(_decompressed(_chunks(data, chunk_size)))) == first + second
+
+
+async def test_decompressed_rejects_a_truncated_gzip_stream():
+    data = gzip.compress(b"reading\n" * 1000)[:-12]
+    
+    with pytest.raises(zlib.error, match="ends inside a gzip stream"):
+        await _collect(_decompressed(_chunks(data, 64)))
+
+
+async def test_line_batches_split_lines_across_chunks():
+    data = b"".join(f"line {i}\n".encode() for i in range(10)) + b"last"
+    
+    batches = await _collect(_line_batches(_chunks(data, 3), size=4))
+    
+    assert [len(batch) for batch in batches] == [4, 4, 3]
+    assert [line for batch in batches for line in batch] == [f"line {i}".encode() for i in range(10)] + [b"last"]
+
+
+@pytest.mark.parametrize("data", [b"ok\nok\n" + b"x" * 101, b"ok\nok\n" + b"x" * 101 + b"\nok\n"])
+async def test_line_batches_reject_an_over_long_line(data):
+    batches = []
+    with pytest.raises(LineTooLongError):
+        async for batch in _line_batches(_chunks(data, 16), size=10, max_line_bytes=100):
+            batches.append(batch)
+    
+    # Lines before the long one are still handed over
+    assert batches == [[b"ok", b"ok"]]
+
+
+def test_backfill_csv_upload(client):
+    data = (
+        "bin_id,row,position,weight_grams,article_weight_grams,calculated_quantity,timestamp,seq\n"
+        "BIN-R1P4,1,4,40,4.0,10,2030-01-01T10:00:00,1\n"
+        "BIN-R1P4,1,4,44,4.0,11,2030-01-01T10:05:00,\n"
+        "BIN-R1P4,1,4,x,4.0,11,2030-01-01T10:06:00,3\n"
+        "BIN-R9P9,9,9,40,4.0,10,2030-01-01T10:00:00,4\n"
+    ).encode()
+    
+    response = client.post("/api/bins/backfill", content=gzip.compress(data), headers={"Content-Type": "text/csv"})
+    
+    assert response.status_code == 200
+    report = response.json()["data"]
+    assert (report["format"], report["rows"], report["inserted"], report["invalid"], report["rejected"]) == (
+        "csv", 4, 2, 1, 1
+    )
+    assert report["errors"][0]["line"] == 4
+    assert report["updated_bins"] == ["BIN-R1P4"]
+    assert client.get("/api/bins/BIN-R1P4").json()["data"]["current_quantity"] == 11
+
+
+def test_truncated_gzip_upload_keeps_what_was_read(client, monkeypatch):
+    monkeypatch.setattr(backfill_module, "PARSE_LINES", 10)
+    data = gzip.compress(_ndjson(50))[:-12]
+    
+    response = client.post("/api/bins/backfill", content=data)
+    
+    assert response.status_code == 400
+    detail = response.json()["detail"]
+    assert "gzip" in detail["message"]
+    # Only whole parse chunks read before the cut are stored
+    assert detail["report"]["inserted"] == 40
+
+
+def test_upload_without_newlines_is_rejected(client):
+    data = _ndjson(3) + b"{" + b" " * (128 * 1024)
+    
+    response = client.post("/api/bins/backfill", content=data)
+    
+    assert response.status_code == 400
+    detail = response.json()["detail"]
+    assert detail["message"] == "Upload could not be read past line 3: Line is longer than 65536 bytes"
+    assert detail["report"]["inserted"] == 3
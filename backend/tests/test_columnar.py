@@ -0,0 +1,82 @@
+import struct
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from services.columnar import COLUMNAR_MEDIA_TYPE, POINT_DTYPE, decode_series, encode_series, to_points
+
+RANGE = {"start_date": "2030-01-01T00:00:00", "end_date": "2030-01-02T00:00:00"}
+
+
+def _points(count: int) -> np.ndarray:
+    return to_points([(1893456000000 + i * 60000, 50 - i, 125.5 - i) for i in range(count)])
+
+
+def _ms(timestamp: str) -> int:
+    return round((datetime.fromisoformat(timestamp) - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+
+def test_round_trip_keeps_every_array_aligned():
+    series = [("BIN-R1P1", _points(3)), ("BIN-Ü1", _points(0)), ("BIN-R12P10", _points(5))]
+    
+    payload = encode_series(series)
+    decoded = decode_series(payload)
+    
+    assert [(bin_id, points.tolist()) for bin_id, points in decoded] == [
+        (bin_id, points.tolist()) for bin_id, points in series
+    ]
+    # Walk the documented layout; each column must start on a multiple of its element size
+    offset = 16
+    for bin_id, points in series:
+        n, name_length, _ = struct.unpack_from("<IHH", payload, offset)
+        assert (n, name_length) == (len(points), len(bin_id.encode("utf-8")))
+        offset += 8 + name_length + (-name_length % 8)
+        assert offset % 8 == 0
+        for column in POINT_DTYPE.names:
+            assert offset % POINT_DTYPE[column].itemsize == 0
+            offset += len(points) * POINT_DTYPE[column].itemsize
+    assert offset == len(payload)
+
+
+def test_empty_response_is_just_a_header():
+    assert decode_series(encode_series([])) == []
+    assert len(encode_series([])) == 16
+
+
+@pytest.mark.parametrize("header", [b"JSON", b"INVC\x02\x00"])
+def test_other_formats_and_versions_are_rejected(header):
+    payload = encode_series([("BIN-R1P1", _points(1))])
+    
+    with pytest.raises(ValueError, match="Not a version 1"):
+        decode_series(header + payload[len(header):])
+
+
+@pytest.fixture
+def history(client):
+    for minute, quantity in enumerate([50, 48, 47]):
+        response = client.post("/api/bins/data", json={
+            "bin_id": "BIN-R1P1", "row": 1, "position": 1, "weight_grams": quantity * 2.5,
+            "article_weight_grams": 2.5, "calculated_quantity": quantity,
+            "timestamp": f"2030-01-01T10:{minute:02d}:00"
+        })
+        assert response.status_code == 200
+    return client
+
+
+@pytest.mark.parametrize("path", ["/api/bins/BIN-R1P1/history", "/api/analytics/trends"])
+def test_routes_negotiate_the_columnar_format(history, path):
+    as_json = history.get(path, params=RANGE)
+    packed = history.get(path, params=RANGE, headers={"Accept": COLUMNAR_MEDIA_TYPE})
+    
+    assert packed.headers["content-type"] == COLUMNAR_MEDIA_TYPE
+    assert "Accept" in packed.headers["vary"] and "Accept" in as_json.headers["vary"]
+    data = as_json.json()["data"]
+    expected = {"BIN-R1P1": data} if path.startswith("/api/bins") else {s["bin_id"]: s["data"] for s in data}
+    decoded = dict(decode_series(packed.content))
+    assert set(decoded) == set(expected)
+    for bin_id, points in decoded.items():
+        assert points.tolist() == [
+            (_ms(point["timestamp"]), point["quantity"], point["weight_grams"]) for point in expected[bin_id]
+        ]
+    assert decoded["BIN-R1P1"]["quantity"].tolist() == [50, 48, 47]
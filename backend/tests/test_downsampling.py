@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from services.downsampling import downsample_rows, minmax_indices
+
+
+def _bucket_extremes(values: np.ndarray, max_points: int) -> set[int]:
+    """Each bucket's first minimum and first maximum, one bucket at a time"""
+    buckets = max_points // 2
+    bounds = np.linspace(0, len(values), buckets + 1).astype(np.int64)
+    kept = set()
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        kept.add(start + int(values[start:end].argmin()))
+        kept.add(start + int(values[start:end].argmax()))
+    return kept
+
+
+def test_short_series_is_kept_whole():
+    values = np.array([5.0, 1.0, 3.0])
+    
+    assert minmax_indices(values, 3).tolist() == [0, 1, 2]
+    assert minmax_indices(values, 10).tolist() == [0, 1, 2]
+
+
+@pytest.mark.parametrize("n, max_points", [(100, 10), (101, 10), (103, 7), (10, 9), (1000, 2), (37, 36)])
+def test_each_bucket_keeps_its_minimum_and_maximum(n, max_points):
+    values = np.random.default_rng(n * max_points).integers(0, 50, n).astype(float)
+    
+    kept = minmax_indices(values, max_points)
+    
+    assert len(kept) <= max_points
+    assert np.all(np.diff(kept) > 0)
+    assert set(kept.tolist()) == _bucket_extremes(values, max_points)
+    assert values[kept].min() == values.min() and values[kept].max() == values.max()
+
+
+def test_uneven_buckets_do_not_pick_padding():
+    # 7 values in 3 buckets of 2, 2 and 3; the padded slots would repeat the last value
+    values = np.array([4.0, 6.0, 9.0, 1.0, 5.0, 0.0, 8.0])
+    
+    assert minmax_indices(values, 6).tolist() == [0, 1, 2, 3, 5, 6]
+    assert minmax_indices(values[::-1].copy(), 6).tolist() == [0, 1, 2, 3, 4, 6]
+
+
+def test_flat_buckets_keep_one_point():
+    values = np.array([3.0] * 8 + [1.0, 2.0])
+    
+    assert minmax_indices(values, 4).tolist() == [0, 5, 8]
+
+
+def test_downsample_rows_keeps_rows_in_time_order():
+    rows = [{"timestamp": f"t{i:02d}", "quantity": q} for i, q in enumerate([9, 3, 7, 1, 8, 2, 6, 5, 4, 0])]
+    
+    kept = downsample_rows(rows, "quantity", 4)
+    
+    assert [row["timestamp"] for row in kept] == ["t00", "t03", "t06", "t09"]
+    assert downsample_rows(rows, "quantity", None) is rows
+    assert downsample_rows(rows, "quantity", 10) is rows
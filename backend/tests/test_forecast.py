@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from models import BinDisplayData
+from services.forecast_service import COUNT, ForecastService, fit_history, to_hours
+
+START = datetime.now().replace(microsecond=0) - timedelta(hours=30)
+
+
+def _display(bin_id: str, quantity: int, hours: float) -> BinDisplayData:
+    return BinDisplayData(**{
+        "bin_id": bin_id, "row": 1, "position": 1, "article_type": "screws", "article_name": bin_id,
+        "current_quantity": quantity, "max_capacity": 100, "fill_percentage": quantity,
+        "status": "normal", "min_threshold": 10, "critical_threshold": 5,
+        "last_updated": (START + timedelta(hours=hours)).isoformat(), "weight_grams": quantity * 2.5
+    })
+
+
+# (bin, hours after START, quantity): a restock after hour 9, a flat bin and a new bin
+READINGS = (
+    [("BIN-A", h, 100 - 2 * h) for h in range(10)]
+    + [("BIN-A", h, 120 - 2 * h) for h in range(10, 20)]
+    + [("BIN-B", h, 50) for h in range(0, 20, 2)]
+    + [("BIN-C", h, 30 - h) for h in range(3)]
+)
+
+
+def _service() -> ForecastService:
+    service = ForecastService()
+    service._slots = {"BIN-A": 0, "BIN-B": 1, "BIN-C": 2}
+    slots = np.array([service._slots[b] for b, _, _ in READINGS])
+    hours = to_hours([(START + timedelta(hours=h)).isoformat() for _, h, _ in READINGS])
+    quantity = np.array([q for _, _, q in READINGS], dtype=float)
+    service._state = fit_history(slots, hours, quantity, np.full(3, 100.0), service.half_life_hours)
+    service._loaded = True
+    return service
+
+
+def test_restocks_do_not_count_as_negative_consumption():
+    service = _service()
+    inventory = [_display("BIN-A", 82, 19), _display("BIN-B", 50, 18), _display("BIN-C", 28, 2)]
+    
+    bins = {b["bin_id"]: b for b in service._compute(inventory)["bins"]}
+    
+    assert (bins["BIN-A"]["status"], bins["BIN-A"]["daily_consumption"], bins["BIN-A"]["r_squared"]) == (
+        "ok", 48.0, 1.0
+    )
+    assert bins["BIN-A"]["predicted_empty_at"] == (START + timedelta(hours=19 + 41)).isoformat()
+    assert (bins["BIN-B"]["status"], bins["BIN-B"]["daily_consumption"]) == ("not_consuming", 0.0)
+    assert bins["BIN-B"]["hours_to_empty"] is None
+    assert (bins["BIN-C"]["status"], bins["BIN-C"]["readings"]) == ("insufficient_data", 3)
+
+
+def test_observed_readings_match_a_full_fit():
+    fitted = _service()
+    observed = ForecastService()
+    observed._loaded = True
+    for bin_id, hours, quantity in READINGS:
+        observed._apply(bin_id, to_hours([(START + timedelta(hours=hours)).isoformat()])[0], quantity, 100)
+    
+    assert np.allclose(observed._state[:3], fitted._state, equal_nan=True)
+
+
+async def test_reloads_and_observations_alongside_each_other(db):
+    await db.execute_many(
+        "INSERT INTO inventory_data (bin_id, weight_grams, calculated_quantity, timestamp) VALUES (?, ?, ?, ?)",
+        [("BIN-R1P1", 2.5 * (80 - h), 80 - h, (START + timedelta(hours=h)).isoformat()) for h in range(10)]
+    )
+    service = ForecastService()
+    first = asyncio.create_task(service.load())
+    while service._pending is None:
+        await asyncio.sleep(0)
+    
+    # A reading stored and observed while the fit runs, then a refit asked for twice over
+    await db.execute(
+        "INSERT INTO inventory_data (bin_id, weight_grams, calculated_quantity, timestamp) VALUES (?, ?, ?, ?)",
+        ("BIN-R1P1", 2.5 * 60, 60, (START + timedelta(hours=20)).isoformat())
+    )
+    service.observe(_display("BIN-R1P1", 60, 20))
+    service.warm_up()
+    results = await asyncio.gather(first, service.load())
+    
+    assert results[0] == results[1]
+    assert results[0]["readings"] == 11
+    assert service._state[service._slots["BIN-R1P1"], COUNT] == 11
+    assert service._pending is None
@@ -0,0 +1,106 @@
+import sqlite3
+
+import pytest
+
+from config import settings
+from models import BinDataPayload
+from routers.bins import INGEST_MESSAGES, _process_batch
+from services import ingest_dedup
+from services.ingest_dedup import DedupWindow, dedup_key
+
+OUTCOMES = {message: outcome for outcome, message in INGEST_MESSAGES.items()}
+
+
+def _reading(minute: int, seq=None, quantity: int = 50) -> dict:
+    reading = {
+        "bin_id": "BIN-R1P2", "row": 1, "position": 2,
+        "weight_grams": quantity * 1.8, "article_weight_grams": 1.8, "calculated_quantity": quantity,
+        "timestamp": f"2030-01-01T10:{minute:02d}:00"
+    }
+    if seq is not None:
+        reading["seq"] = seq
+    return reading
+
+
+@pytest.fixture
+def post(client):
+    def post(reading: dict, idempotency_key=None) -> tuple[str, dict]:
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else {}
+        response = client.post("/api/bins/data", json=reading, headers=headers)
+        assert response.status_code == 200
+        body = response.json()
+        return OUTCOMES[body["message"]], body["data"]
+    return post
+
+
+def _history() -> list[tuple]:
+    with sqlite3.connect(settings.database_url) as con:
+        return con.execute(
+            """SELECT calculated_quantity, timestamp, dedup_key FROM inventory_data
+               WHERE bin_id = 'BIN-R1P2' AND timestamp >= '2030' ORDER BY id"""
+        ).fetchall()
+
+
+def test_dedup_window_forgets_the_least_recently_seen_key():
+    window = DedupWindow(size=2)
+    window.add("BIN-R1P1", "seq:1", "t1")
+    window.add("BIN-R1P1", "seq:2", "t2")
+    assert window.seen("BIN-R1P1", "seq:1", "t1")
+    
+    window.add("BIN-R1P1", "seq:3", "t3")
+    
+    assert window.seen("BIN-R1P1", "seq:1", "t1")
+    assert not window.seen("BIN-R1P1", "seq:2", "t2")
+    assert not window.seen("BIN-R1P1", "seq:1", "t3")
+    assert dedup_key(7, "abc") == "seq:7"
+    assert dedup_key(None, "abc") == "key:abc"
+    assert dedup_key(None, None) is None
+
+
+def test_accepted_duplicate_and_stale_readings(post):
+    assert post(_reading(0, seq=1))[0] == "accepted"
+    assert post(_reading(0, seq=1))[0] == "duplicate"
+    assert post(_reading(10, seq=2, quantity=48))[0] == "accepted"
+    
+    outcome, bin_data = post(_reading(5, seq=3, quantity=49))
+    
+    assert outcome == "stale"
+    assert bin_data["current_quantity"] == 48
+    assert _history() == [
+        (50, "2030-01-01T10:00:00", "seq:1"),
+        (48, "2030-01-01T10:10:00", "seq:2"),
+        (49, "2030-01-01T10:05:00", "seq:3"),
+    ]
+
+
+def test_retry_after_eviction_is_caught_by_the_unique_index(post, monkeypatch):
+    monkeypatch.setattr(ingest_dedup, "size", 1)
+    assert post(_reading(0, seq=1))[0] == "accepted"
+    assert post(_reading(1, seq=2))[0] == "accepted"
+    assert not ingest_dedup.seen("BIN-R1P2", "seq:1", "2030-01-01T10:00:00")
+    
+    assert post(_reading(0, seq=1))[0] == "duplicate"
+    assert post(_reading(2), idempotency_key="abc")[0] == "accepted"
+    ingest_dedup.clear()
+    assert post(_reading(2), idempotency_key="abc")[0] == "duplicate"
+    assert len(_history()) == 3
+
+
+def test_restarted_counter_is_not_a_retry(post):
+    assert post(_reading(0, seq=1))[0] == "accepted"
+    ingest_dedup.clear()
+    
+    assert post(_reading(5, seq=1, quantity=47))[0] == "accepted"
+    assert [row[2] for row in _history()] == ["seq:1", "seq:1"]
+
+
+async def test_batch_retries_are_duplicates_whether_or_not_the_window_remembers(db):
+    payloads = [BinDataPayload(**_reading(minute, seq=minute)) for minute in range(3)]
+    keys = [dedup_key(data.seq, None) for data in payloads]
+    assert (await _process_batch(payloads, keys))["accepted"] == 3
+    
+    assert (await _process_batch(payloads, keys))["duplicate"] == 3
+    ingest_dedup.clear()
+    counts = await _process_batch(payloads, keys)
+    
+    assert (counts["duplicate"], counts["accepted"], counts["stale"]) == (3, 0, 0)
@@ -0,0 +1,133 @@
+import asyncio
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+from fastapi import WebSocketDisconnect
+
+from config import settings
+from routers import bins as bins_router
+from services.ingest_frames import (
+    READING_DTYPE, FrameError, decode_frame, encode_frame, to_payloads, valid_mask
+)
+
+# 2030-07-01T12:00:00Z, 08:00 in New York (EDT)
+NOON_UTC_MS = 1909137600000
+
+
+def _readings(count: int, timestamp_ms: int = NOON_UTC_MS) -> np.ndarray:
+    readings = np.zeros(count, dtype=READING_DTYPE)
+    readings["seq"] = np.arange(count)
+    readings["timestamp_ms"] = timestamp_ms + np.arange(count) * 1500
+    readings["weight_grams"] = 100.0
+    readings["article_weight_grams"] = 2.0
+    readings["calculated_quantity"] = 50
+    readings["row"] = 1
+    readings["position"] = 1 + np.arange(count) % 5
+    return readings
+
+
+@pytest.fixture
+def new_york():
+    previous = os.environ.get("TZ")
+    os.environ["TZ"] = "America/New_York"
+    time.tzset()
+    yield
+    if previous is None:
+        del os.environ["TZ"]
+    else:
+        os.environ["TZ"] = previous
+    time.tzset()
+
+
+def test_frame_round_trip():
+    readings = _readings(3)
+    
+    frame_id, decoded = decode_frame(encode_frame(42, readings), max_readings=10)
+    
+    assert frame_id == 42
+    assert decoded.tolist() == readings.tolist()
+
+
+@pytest.mark.parametrize("payload, error", [
+    (b"INVR", "shorter than its header"),
+    (b"XXXX" + encode_frame(1, _readings(1))[4:], "Not a version 1"),
+    (encode_frame(1, _readings(11)), "limit is 10"),
+    (encode_frame(1, _readings(2))[:-1], "does not match"),
+])
+def test_malformed_frames_are_rejected(payload, error):
+    with pytest.raises(FrameError, match=error):
+        decode_frame(payload, max_readings=10)
+
+
+def test_valid_mask_applies_the_payload_range_checks():
+    readings = _readings(4)
+    readings["article_weight_grams"][1] = 0
+    readings["row"][2] = 0
+    readings["timestamp_ms"][3] = -1
+    
+    assert valid_mask(readings).tolist() == [True, False, False, False]
+
+
+def test_to_payloads_uses_server_local_time(new_york):
+    readings = _readings(2)
+    readings["seq"][1] = -1
+    
+    payloads = to_payloads(readings)
+    
+    assert [data.timestamp for data in payloads] == [
+        datetime(2030, 7, 1, 8, 0, 0), datetime(2030, 7, 1, 8, 0, 1, 500000)
+    ]
+    assert [(data.bin_id, data.seq) for data in payloads] == [("BIN-R1P1", 0), ("BIN-R1P2", None)]
+
+
+def test_stream_acknowledges_frames_and_stores_local_timestamps(client, new_york):
+    with client.websocket_connect("/api/bins/stream") as ws:
+        ready = ws.receive_json()
+        assert ready["type"] == "ingest_ready"
+        assert ready["payload"]["record_bytes"] == READING_DTYPE.itemsize
+        
+        ws.send_bytes(encode_frame(7, _readings(5)))
+        ack = ws.receive_json()
+        ws.send_bytes(encode_frame(8, _readings(5)))
+        resent = ws.receive_json()
+        ws.send_bytes(b"junk")
+        error = ws.receive_json()
+    
+    assert (ack["type"], ack["payload"]) == ("ingest_ack", {"frame_ids": [7], "accepted": 5})
+    assert resent["payload"] == {"frame_ids": [8], "duplicate": 5}
+    assert (error["type"], error["payload"]["frame_id"]) == ("error", None)
+    with sqlite3.connect(settings.database_url) as con:
+        stored = con.execute(
+            "SELECT timestamp FROM inventory_data WHERE bin_id = 'BIN-R1P1' AND dedup_key = 'seq:0'"
+        ).fetchall()
+    assert stored == [("2030-07-01T08:00:00",)]
+
+
+def test_stream_is_closed_when_the_worker_fails(client, monkeypatch):
+    def broken(payload, max_readings):
+        raise RuntimeError("decoder crashed")
+    monkeypatch.setattr(bins_router, "decode_frame", broken)
+    
+    with client.websocket_connect("/api/bins/stream") as ws:
+        ws.receive_json()
+        ws.send_bytes(encode_frame(1, _readings(1)))
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    
+    assert closed.value.code == 1011
+
+
+async def test_full_queue_does_not_wait_for_a_stopped_worker():
+    frames: asyncio.Queue = asyncio.Queue(maxsize=1)
+    frames.put_nowait(b"queued")
+    worker = asyncio.create_task(asyncio.sleep(0))
+    
+    assert not await asyncio.wait_for(bins_router._put_unless_stopped(frames, b"next", worker), 1)
+    assert frames.qsize() == 1
+    
+    frames.get_nowait()
+    assert await bins_router._put_unless_stopped(frames, b"next", asyncio.create_task(asyncio.sleep(1)))
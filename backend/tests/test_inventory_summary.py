@@ -0,0 +1,44 @@
+from database import rebuild_inventory_summary
+from models import BinConfigUpdate
+from services import inventory_service, alert_service
+
+SUMMARY_SQL = "SELECT * FROM inventory_summary WHERE id = 1"
+
+
+async def _check(bin_id: str) -> int:
+    return len(await alert_service.check_alerts(await inventory_service.get_bin_display_data(bin_id)))
+
+
+def _counters(row: dict) -> dict:
+    return {key: value for key, value in row.items() if key != "updated_at"}
+
+
+async def test_summary_deltas_match_a_full_recount(db):
+    await inventory_service.record_inventory_data("BIN-R1P1", 20.0, 8, "2030-01-01T10:00:00")
+    await inventory_service.record_inventory_data("BIN-R1P2", 0.0, 0, "2030-01-01T10:00:00")
+    await inventory_service.record_inventory_data("BIN-R1P2", 9.0, 5, "2030-01-01T09:00:00")
+    await inventory_service.record_inventory_batch([
+        ("BIN-R2P1", 480.0, 120, "2030-01-01T10:00:00", None),
+        ("BIN-R2P2", 12.0, 3, "2030-01-01T10:00:00", "seq:1"),
+        ("BIN-R2P2", 12.0, 3, "2030-01-01T10:00:00", "seq:1"),
+        ("BIN-R2P3", 84.0, 40, "2030-01-01T10:00:00", None),
+    ])
+    await inventory_service.update_bin_configuration("BIN-R2P3", BinConfigUpdate(min_threshold=50))
+    await inventory_service.update_bin_configuration("BIN-R2P1", BinConfigUpdate(max_capacity=200))
+    
+    assert await _check("BIN-R1P1") + await _check("BIN-R2P2") == 3
+    active = await alert_service.get_active_alerts()
+    assert await alert_service.acknowledge_alert(active[0].id)
+    assert await alert_service.acknowledge_alert(active[0].id)
+    await inventory_service.record_inventory_data("BIN-R1P3", 4.0, 2, "2030-01-01T11:00:00")
+    assert await _check("BIN-R1P3") == 2
+    
+    maintained = await db.fetch_one(SUMMARY_SQL)
+    assert maintained["alerts_active"] == 4
+    await rebuild_inventory_summary(db)
+    assert _counters(maintained) == _counters(await db.fetch_one(SUMMARY_SQL))
+    
+    assert await alert_service.acknowledge_all_alerts() == 4
+    maintained = await db.fetch_one(SUMMARY_SQL)
+    await rebuild_inventory_summary(db)
+    assert _counters(maintained) == _counters(await db.fetch_one(SUMMARY_SQL))
@@ -0,0 +1,41 @@
+import pytest
+
+from monitoring import registry, DB_QUERY_SECONDS
+from monitoring.metrics import Registry
+
+
+@pytest.fixture
+def metrics_disabled():
+    registry.set_enabled(False)
+    yield
+    registry.set_enabled(True)
+
+
+def test_disabled_registry_ignores_observations_and_later_metrics():
+    local = Registry()
+    counter = local.counter("things_total", "Things", ("kind",))
+    local.add_collector(lambda: ["extra_series 1"])
+    local.set_enabled(False)
+    gauge = local.gauge("level", "Level", callback=lambda: 3)
+    histogram = local.histogram("latency_seconds", "Latency")
+    
+    counter.inc(1, "a")
+    gauge.set(5)
+    histogram.observe(0.1)
+    
+    assert not gauge.enabled
+    assert [line for line in local.render().splitlines() if not line.startswith("#")] == []
+    
+    local.set_enabled(True)
+    counter.inc(1, "a")
+    assert 'things_total{kind="a"} 1' in local.render()
+
+
+async def test_db_query_timing_follows_the_flag(db, metrics_disabled):
+    before = {labels: list(series) for labels, series in DB_QUERY_SECONDS._series.items()}
+    await db.fetch_all("SELECT bin_id FROM bin_configurations")
+    assert DB_QUERY_SECONDS._series == before
+    
+    registry.set_enabled(True)
+    await db.fetch_all("SELECT bin_id FROM bin_configurations")
+    assert DB_QUERY_SECONDS._series != before
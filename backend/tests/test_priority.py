@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from database import Priority, current_priority
+from database.priority import PriorityGate
+
+
+async def _take(gate: PriorityGate, priority: Priority, served: list[str], name: str) -> None:
+    current_priority.set(priority)
+    async with gate:
+        served.append(name)
+
+
+async def _queue(gate: PriorityGate, *waiters: tuple[Priority, str]) -> tuple[list[str], list[asyncio.Task]]:
+    """Start waiters one after another while the gate is held"""
+    served: list[str] = []
+    tasks = []
+    for priority, name in waiters:
+        tasks.append(asyncio.create_task(_take(gate, priority, served, name)))
+        await asyncio.sleep(0)
+    return served, tasks
+
+
+async def test_ingest_waiters_go_ahead_of_queued_bulk_waiters():
+    gate = PriorityGate()
+    await gate.acquire()
+    served, tasks = await _queue(
+        gate,
+        (Priority.BULK, "bulk-1"), (Priority.BULK, "bulk-2"), (Priority.INTERACTIVE, "dashboard"),
+        (Priority.INGEST, "reading-1"), (Priority.INGEST, "reading-2")
+    )
+    assert gate.waiting() == 5
+    
+    gate.release()
+    await asyncio.gather(*tasks)
+    
+    assert served == ["reading-1", "reading-2", "dashboard", "bulk-1", "bulk-2"]
+    assert gate.waiting() == 0
+
+
+async def test_cancelled_waiter_is_skipped():
+    gate = PriorityGate()
+    await gate.acquire()
+    served, (ingest, bulk) = await _queue(gate, (Priority.INGEST, "reading"), (Priority.BULK, "export"))
+    
+    ingest.cancel()
+    await asyncio.sleep(0)
+    gate.release()
+    await bulk
+    
+    assert served == ["export"]
+    with pytest.raises(asyncio.CancelledError):
+        await ingest
+    await asyncio.wait_for(gate.acquire(), 1)
+
+
+async def test_waiter_cancelled_after_handover_passes_the_gate_on():
+    gate = PriorityGate()
+    await gate.acquire()
+    served, (ingest, bulk) = await _queue(gate, (Priority.INGEST, "reading"), (Priority.BULK, "export"))
+    
+    # The gate is handed to the ingest waiter, which is cancelled before it resumes
+    gate.release()
+    ingest.cancel()
+    await asyncio.wait_for(bulk, 1)
+    
+    assert served == ["export"]
+    with pytest.raises(asyncio.CancelledError):
+        await ingest
+    await asyncio.wait_for(gate.acquire(), 1)
+
+
+async def test_bulk_reads_bypass_the_busy_main_connection(db):
+    assert db._read_connection is not None
+    query = "SELECT COUNT(*) AS n FROM bin_configurations"
+    
+    async def read(priority: Priority) -> dict:
+        current_priority.set(priority)
+        return await db.fetch_one(query)
+    
+    await db._gate.acquire()
+    try:
+        assert (await asyncio.wait_for(read(Priority.BULK), 1))["n"] == 10
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(read(Priority.INTERACTIVE), 0.2)
+    finally:
+        db._gate.release()
+    
+    assert (await read(Priority.INTERACTIVE))["n"] == 10
+
+
+async def test_ingest_transaction_goes_ahead_of_queued_bulk_transactions(db):
+    served: list[str] = []
+    release = asyncio.Event()
+    
+    async def transaction(priority: Priority, name: str, hold: bool = False) -> None:
+        current_priority.set(priority)
+        async with db.transaction():
+            served.append(name)
+            await db.execute(
+                "UPDATE current_inventory SET calculated_quantity = ? WHERE bin_id = 'BIN-R1P1'", (len(served),)
+            )
+            if hold:
+                await release.wait()
+    
+    running = asyncio.create_task(transaction(Priority.BULK, "backfill batch", hold=True))
+    while not served:
+        await asyncio.sleep(0)
+    queued = [
+        asyncio.create_task(transaction(priority, name))
+        for priority, name in [(Priority.BULK, "retention batch"), (Priority.INGEST, "reading")]
+    ]
+    await asyncio.sleep(0)
+    
+    release.set()
+    await asyncio.wait_for(asyncio.gather(running, *queued), 1)
+    
+    assert served == ["backfill batch", "reading", "retention batch"]
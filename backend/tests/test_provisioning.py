@@ -0,0 +1,67 @@
+import pytest
+
+from services import provisioning_service
+from services.provisioning_service import LayoutValidationError
+
+
+def _bin(row: int, position: int, **fields) -> dict:
+    return {"bin_id": f"BIN-R{row}P{position}", "row": row, "position": position, **fields}
+
+
+async def _stored(db, bin_id: str) -> dict:
+    return await db.fetch_one(
+        """SELECT b.article_name, b.min_threshold, i.calculated_quantity,
+                  (SELECT COUNT(*) FROM alert_configurations a WHERE a.bin_id = b.bin_id) AS alert_configs
+           FROM bin_configurations b JOIN current_inventory i USING (bin_id) WHERE b.bin_id = ?""",
+        (bin_id,)
+    )
+
+
+async def test_errors_report_the_input_line_after_an_invalid_entry(db):
+    entries = [
+        _bin(3, 1),
+        {"bin_id": "BIN-X", "row": 3, "position": 2},
+        "not an object",
+        _bin(3, 3, critical_threshold=20),
+        _bin(3, 1),
+    ]
+    
+    with pytest.raises(LayoutValidationError) as raised:
+        await provisioning_service.validate_layout(entries)
+    
+    errors = [(e["line"], e["bin_id"], e["field"]) for e in raised.value.errors]
+    assert errors == [
+        (2, "BIN-X", "bin_id"),
+        (3, None, None),
+        (4, "BIN-R3P3", None),
+        (5, "BIN-R3P1", "bin_id"),
+    ]
+    assert raised.value.errors[-1]["error"] == "Duplicate bin_id (first seen on line 1)"
+
+
+async def test_dry_run_reports_the_diff_without_writing(db):
+    entries = [_bin(1, 1, article_name="Hex Screws"), _bin(3, 1), _bin(3, 2)]
+    
+    report = await provisioning_service.provision(entries, dry_run=True)
+    
+    assert report["created"] == ["BIN-R3P1", "BIN-R3P2"]
+    assert [u["bin_id"] for u in report["updated"]] == ["BIN-R1P1"]
+    assert report["updated"][0]["changes"]["article_name"] == {"old": "M4 Screws", "new": "Hex Screws"}
+    assert report["not_in_layout"] == [f"BIN-R{r}P{p}" for r in (1, 2) for p in range(1, 6)][1:]
+    assert await _stored(db, "BIN-R3P1") is None
+    assert (await _stored(db, "BIN-R1P1"))["article_name"] == "M4 Screws"
+
+
+async def test_reprovisioning_updates_changed_bins_only(db):
+    first = await provisioning_service.provision([_bin(3, 1), _bin(3, 2)])
+    assert first["created"] == ["BIN-R3P1", "BIN-R3P2"]
+    await db.execute("UPDATE current_inventory SET calculated_quantity = 42 WHERE bin_id = 'BIN-R3P1'")
+    
+    second = await provisioning_service.provision([_bin(3, 1, min_threshold=20), _bin(3, 2)])
+    
+    assert (second["created"], second["unchanged"]) == ([], 1)
+    assert second["updated"] == [{"bin_id": "BIN-R3P1", "changes": {"min_threshold": {"old": 10, "new": 20}}}]
+    stored = await _stored(db, "BIN-R3P1")
+    assert (stored["min_threshold"], stored["calculated_quantity"], stored["alert_configs"]) == (20, 42, 2)
+    summary = await db.fetch_one("SELECT total_bins FROM inventory_summary")
+    assert summary["total_bins"] == 12
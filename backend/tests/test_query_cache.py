@@ -0,0 +1,125 @@
+import asyncio
+import importlib
+from types import SimpleNamespace
+
+import pytest
+
+from services.query_cache import QueryCache, READINGS
+
+KEY = ("consumption", ("BIN-R1P1",), ())
+
+
+class Loader:
+    """Counts calls and holds each one until released"""
+    
+    def __init__(self, result="fresh"):
+        self.calls = 0
+        self.result = result
+        self.release = asyncio.Event()
+    
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+async def test_concurrent_misses_run_the_loader_once():
+    cache = QueryCache()
+    loader = Loader()
+    
+    waiters = [asyncio.create_task(cache.get_or_compute(KEY, loader, 60)) for _ in range(5)]
+    await asyncio.sleep(0)
+    loader.release.set()
+    
+    assert await asyncio.gather(*waiters) == ["fresh"] * 5
+    assert loader.calls == 1
+    assert await cache.get_or_compute(KEY, loader, 60) == "fresh"
+    assert loader.calls == 1
+
+
+async def test_failure_reaches_every_waiter_and_is_not_cached():
+    cache = QueryCache()
+    loader = Loader(RuntimeError("database is locked"))
+    
+    waiters = [asyncio.create_task(cache.get_or_compute(KEY, loader, 60)) for _ in range(3)]
+    await asyncio.sleep(0)
+    loader.release.set()
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    
+    assert [str(result) for result in results] == ["database is locked"] * 3
+    assert loader.calls == 1
+    assert cache.size() == 0
+    
+    loader.result = "recovered"
+    assert await cache.get_or_compute(KEY, loader, 60) == "recovered"
+    assert loader.calls == 2
+
+
+async def test_invalidation_during_a_load_does_not_store_its_result():
+    cache = QueryCache()
+    stale = Loader("stale")
+    
+    waiter = asyncio.create_task(cache.get_or_compute(KEY, stale, 60, (READINGS,)))
+    await asyncio.sleep(0)
+    cache.invalidate(READINGS)
+    stale.release.set()
+    
+    # Callers that were already waiting still get the result they asked for
+    assert await waiter == "stale"
+    assert cache.size() == 0
+    
+    fresh = Loader("fresh")
+    fresh.release.set()
+    assert await cache.get_or_compute(KEY, fresh, 60, (READINGS,)) == "fresh"
+
+
+async def test_call_after_invalidation_does_not_join_the_older_load():
+    cache = QueryCache()
+    stale, fresh = Loader("stale"), Loader("fresh")
+    
+    first = asyncio.create_task(cache.get_or_compute(KEY, stale, 60, (READINGS,)))
+    await asyncio.sleep(0)
+    cache.invalidate(READINGS)
+    second = asyncio.create_task(cache.get_or_compute(KEY, fresh, 60, (READINGS,)))
+    await asyncio.sleep(0)
+    stale.release.set()
+    fresh.release.set()
+    
+    assert (await first, await second) == ("stale", "fresh")
+    assert await cache.get_or_compute(KEY, Loader(), 60, (READINGS,)) == "fresh"
+
+
+async def test_entries_expire_after_their_ttl(monkeypatch):
+    clock = [1000.0]
+    # Only the cache's clock moves; the event loop keeps the real one
+    module = importlib.import_module("services.query_cache")
+    monkeypatch.setattr(module, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    cache = QueryCache()
+    first, second = Loader("first"), Loader("second")
+    first.release.set()
+    second.release.set()
+    
+    assert await cache.get_or_compute(KEY, first, 30) == "first"
+    clock[0] += 29
+    assert await cache.get_or_compute(KEY, second, 30) == "first"
+    clock[0] += 2
+    assert await cache.get_or_compute(KEY, second, 30) == "second"
+    assert (first.calls, second.calls) == (1, 1)
+
+
+async def test_cancelled_caller_does_not_cancel_the_shared_load():
+    cache = QueryCache()
+    loader = Loader()
+    
+    leaving = asyncio.create_task(cache.get_or_compute(KEY, loader, 60))
+    staying = asyncio.create_task(cache.get_or_compute(KEY, loader, 60))
+    await asyncio.sleep(0)
+    leaving.cancel()
+    loader.release.set()
+    
+    assert await staying == "fresh"
+    with pytest.raises(asyncio.CancelledError):
+        await leaving
+    assert cache.size() == 1
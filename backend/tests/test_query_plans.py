@@ -0,0 +1,26 @@
+"""Hot service queries keep using their indexes and stay within their step budgets"""
+
+import asyncio
+
+import pytest
+
+from tools import query_plans
+
+
+@pytest.fixture(scope="module")
+def plan_checks() -> dict[str, query_plans.PlanCheck]:
+    """Run every check once against the reference data set; checks depend on the state earlier ones leave"""
+    checks = asyncio.run(query_plans.collect(
+        query_plans.REFERENCE_ALERT_ROWS, query_plans.REFERENCE_READINGS_PER_BIN, query_plans.CHECK_FACTORIES
+    ))
+    return {check.name: check for check in checks}
+
+
+@pytest.mark.parametrize(
+    "name", [check.name for factory in query_plans.CHECK_FACTORIES for check in factory()]
+)
+def test_query_plan(plan_checks, name):
+    check = plan_checks[name]
+    assert not check.failures, "\n".join(
+        check.failures + [f"{record['sql']} -> {record['plan']}" for record in check.records]
+    )
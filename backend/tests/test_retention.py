@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+from config import settings
+from services import inventory_service, retention_service
+
+
+async def _add_readings(db, count: int, days_ago: int) -> None:
+    timestamp = (datetime.now() - timedelta(days=days_ago)).isoformat()
+    await db.execute_many(
+        "INSERT INTO inventory_data (bin_id, weight_grams, calculated_quantity, timestamp) VALUES (?, ?, ?, ?)",
+        [("BIN-R1P1", 100.0, 10, f"{timestamp}.{i:06d}") for i in range(count)]
+    )
+
+
+async def _count(db) -> int:
+    return (await db.fetch_one("SELECT COUNT(*) AS n FROM inventory_data"))["n"]
+
+
+async def test_purge_pass_is_bounded_and_reports_backlog(db, monkeypatch):
+    monkeypatch.setattr(settings, "retention_batch_pause_ms", 0)
+    before = await _count(db)
+    await _add_readings(db, 25, days_ago=120)
+    
+    deleted, remaining = await retention_service.purge_inventory_data(90, batch_size=5, max_batches=2)
+    
+    assert (deleted, remaining) == (10, True)
+    assert await _count(db) == before + 15
+
+
+async def test_cleanup_old_data_runs_until_nothing_expired_remains(db, monkeypatch):
+    monkeypatch.setattr(settings, "retention_batch_pause_ms", 0)
+    monkeypatch.setattr(settings, "retention_batch_size", 5)
+    monkeypatch.setattr(settings, "retention_max_batches", 2)
+    before = await _count(db)
+    await _add_readings(db, 23, days_ago=120)
+    await _add_readings(db, 3, days_ago=1)
+    
+    assert await inventory_service.cleanup_old_data(90) == 23
+    assert await _count(db) == before + 3
@@ -0,0 +1,83 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from scheduler import CronSchedule, Scheduler
+
+
+@pytest.mark.parametrize("expression, moment, expected", [
+    ("*/15 * * * *", datetime(2030, 1, 1, 10, 7, 30), datetime(2030, 1, 1, 10, 15)),
+    ("0 3 * * *", datetime(2030, 1, 1, 3, 0), datetime(2030, 1, 2, 3, 0)),
+    # 2030-01-04 is a Friday; weekday 1 is Monday
+    ("0,30 9-17/4 * * 1-5", datetime(2030, 1, 4, 17, 40), datetime(2030, 1, 7, 9, 0)),
+    ("0 0 * * 0", datetime(2030, 1, 1), datetime(2030, 1, 6)),
+])
+def test_cron_next_after(expression, moment, expected):
+    assert CronSchedule(expression).next_after(moment) == expected
+
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "* 0-24 * * *", "*/0 * * * *", "* * 0 * *"])
+def test_cron_rejects_bad_expressions(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+
+def _worker(runs: list, name: str, seconds: float, error: Exception = None):
+    """A scheduler with one job that records which worker ran it"""
+    worker = Scheduler()
+    
+    async def job():
+        runs.append(name)
+        if error:
+            raise error
+        return {"worker": name}
+    return worker, worker.add_interval_job("retention", job, seconds=seconds)
+
+
+async def test_lease_is_kept_until_the_next_occurrence(db):
+    runs: list[str] = []
+    first, first_job = _worker(runs, "first", seconds=0.3)
+    second, second_job = _worker(runs, "second", seconds=0.3)
+    
+    assert await first.run_job(first_job)
+    # The second worker's timer fires later for the same occurrence
+    assert not await second.run_job(second_job)
+    assert not await first.run_job(first_job)
+    assert second_job.stats.skipped_locked == 1
+    
+    await asyncio.sleep(0.35)
+    assert await second.run_job(second_job)
+    assert not await first.run_job(first_job)
+    
+    assert runs == ["first", "second"]
+    lease = await db.fetch_one("SELECT owner, expires_at FROM scheduler_locks WHERE job_name = 'retention'")
+    assert lease["owner"] == second.owner_id
+    assert lease["expires_at"] == second_job.next_due.timestamp()
+
+
+async def test_failed_run_holds_the_lease_too(db):
+    runs: list[str] = []
+    first, first_job = _worker(runs, "first", seconds=60, error=RuntimeError("disk full"))
+    second, second_job = _worker(runs, "second", seconds=60)
+    
+    assert await first.run_job(first_job)
+    assert not await second.run_job(second_job)
+    
+    assert (first_job.stats.failures, first_job.stats.last_error) == (1, "RuntimeError: disk full")
+    assert runs == ["first"]
+
+
+async def test_per_process_jobs_run_on_every_worker(db):
+    runs: list[str] = []
+    workers = [Scheduler(), Scheduler()]
+    for name, worker in zip(("first", "second"), workers):
+        async def refit(name=name):
+            runs.append(name)
+        worker.add_interval_job("forecast_refit", refit, seconds=60, single_instance=False)
+    
+    for worker in workers:
+        assert await worker.run_job(worker.jobs["forecast_refit"])
+    
+    assert runs == ["first", "second"]
+    assert await db.fetch_one("SELECT * FROM scheduler_locks") is None
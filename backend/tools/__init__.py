@@ -0,0 +1 @@
+"""Command-line tools for operating the inventory dashboard backend"""
@@ -0,0 +1,315 @@
+"""
+Generate a large synthetic history straight into the SQLite database.
+
+Bins are provisioned through the normal provisioning service, then each
+bin's readings are simulated with NumPy: Poisson picks that follow a
+working-hours profile, restocks some hours after the bin drops to its
+reorder point, scale noise and occasional sensor glitches. Low and
+critical stock alerts are derived from the simulated quantities with the
+same thresholds and cooldown the live alert service uses. Older alerts
+are acknowledged.
+
+Rows are written with ``executemany`` in large transactions. Synchronous
+writes are off during the load, and the history indexes are dropped first
+and rebuilt afterwards. The same seed always produces the same dataset.
+
+Usage (from the backend directory):
+    python -m tools.generate_dataset --bins 1000 --days 90 --interval-minutes 15
+    python -m tools.generate_dataset --database /tmp/big.db --bins 10000 --days 180 --truncate
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import repeat
+
+import numpy as np
+
+from config import settings
+from database import init_database, close_database, run_migrations, rebuild_inventory_summary, get_database
+from services import provisioning_service
+
+logger = logging.getLogger(__name__)
+
+ARTICLES = [
+    ("screws", "M4 Screws", 2.5),
+    ("nuts", "M4 Nuts", 1.8),
+    ("washers", "M4 Washers", 0.5),
+    ("bolts", "M6 Bolts", 8.2),
+    ("clips", "Cable Clips", 1.2),
+    ("connectors", "Wire Connectors", 3.5),
+    ("terminals", "Ring Terminals", 2.1),
+    ("grommets", "Rubber Grommets", 4.0),
+    ("spacers", "Nylon Spacers", 0.8),
+    ("rivets", "Pop Rivets", 1.5),
+]
+
+HISTORY_TABLES = ("inventory_data", "alert_logs")
+COMMIT_EVERY_ROWS = 500_000
+
+
+def build_layout(bins: int, rng: np.random.Generator, per_row: int = 50) -> list[dict]:
+    """Layout entries for the provisioning service"""
+    layout = []
+    for i in range(bins):
+        article_type, article_name, weight = ARTICLES[int(rng.integers(len(ARTICLES)))]
+        capacity = int(rng.choice([50, 100, 200, 500]))
+        layout.append({
+            "bin_id": f"BIN-R{i // per_row + 1}P{i % per_row + 1}",
+            "row": i // per_row + 1,
+            "position": i % per_row + 1,
+            "article_type": article_type,
+            "article_name": article_name,
+            "article_weight_grams": weight,
+            "min_threshold": max(2, capacity // 10),
+            "critical_threshold": max(1, capacity // 20),
+            "max_capacity": capacity
+        })
+    return layout
+
+
+class BinSimulator:
+    """Simulates one bin's stock level over a shared time grid"""
+    
+    def __init__(self, steps: int, interval_minutes: int, start: datetime, rng: np.random.Generator):
+        self.steps = steps
+        self.interval_minutes = interval_minutes
+        self.rng = rng
+        # Picks follow a working-hours profile: busy 07:00-19:00, quiet at night
+        hours = np.array([(start + timedelta(minutes=interval_minutes * i)).hour for i in range(steps)])
+        self.activity = np.where((hours >= 7) & (hours < 19), 1.8, 0.2)
+        self.steps_per_day = 24 * 60 / interval_minutes
+    
+    def simulate(self, capacity: int, reorder_point: int, article_weight: float) -> tuple[np.ndarray, np.ndarray]:
+        """Return (weight_grams, calculated_quantity) arrays, one entry per step"""
+        rng = self.rng
+        # A typical bin is drawn down in 2-8 days
+        daily_rate = capacity / rng.uniform(2, 8)
+        picks = rng.poisson(daily_rate / self.steps_per_day * self.activity)
+        drawn = np.cumsum(picks)
+        
+        level = np.empty(self.steps)
+        pos = 0
+        stock = rng.uniform(0.3, 1.0) * capacity
+        while pos < self.steps:
+            base = drawn[pos - 1] if pos else 0
+            # First step at or below the reorder point, then a 4-48h restock delay
+            trigger = int(np.searchsorted(drawn, base + stock - reorder_point, side="left"))
+            delay = int(rng.uniform(4, 48) * 60 / self.interval_minutes)
+            end = min(self.steps, max(trigger, pos) + delay + 1)
+            level[pos:end] = np.maximum(stock - (drawn[pos:end] - base), 0)
+            pos = end
+            stock = capacity
+        
+        weight = level * article_weight + rng.normal(0, article_weight * 0.3, self.steps)
+        # Rare glitches: a bump or a misread scale
+        glitches = rng.random(self.steps) < 0.0005
+        weight[glitches] += rng.choice([-1, 1], glitches.sum()) * rng.uniform(5, 30, glitches.sum()) * article_weight
+        weight = np.maximum(weight, 0).round(2)
+        quantity = np.rint(weight / article_weight).astype(np.int64)
+        return weight, quantity
+
+
+def alert_indexes(quantity: np.ndarray, threshold: int, cooldown_steps: int) -> list[int]:
+    """Steps at which the live alert check would fire, honoring the cooldown"""
+    candidates = np.flatnonzero((quantity > 0) & (quantity <= threshold))
+    fired = []
+    next_allowed = -1
+    for idx in candidates.tolist():
+        if idx >= next_allowed:
+            fired.append(idx)
+            next_allowed = idx + cooldown_steps
+    return fired
+
+
+def _tune(conn: sqlite3.Connection) -> None:
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -262144")
+    conn.execute("PRAGMA mmap_size = 1073741824")
+
+
+def _drop_history_indexes(conn: sqlite3.Connection) -> list[str]:
+    """Drop indexes on the history tables and return their CREATE statements"""
+    placeholders = ",".join("?" * len(HISTORY_TABLES))
+    rows = conn.execute(
+        f"""SELECT name, sql FROM sqlite_master
+            WHERE type = 'index' AND tbl_name IN ({placeholders}) AND sql IS NOT NULL""",
+        HISTORY_TABLES
+    ).fetchall()
+    for name, _ in rows:
+        conn.execute(f"DROP INDEX {name}")
+    return [sql for _, sql in rows]
+
+
+def generate(
+    db_path: str,
+    bins: list[dict],
+    days: int,
+    interval_minutes: int,
+    active_alert_hours: float,
+    seed: int
+) -> dict:
+    """Write history and alerts for every bin; returns row counts and timings"""
+    rng = np.random.default_rng(seed)
+    steps = int(days * 24 * 60 / interval_minutes)
+    end = datetime.now().replace(second=0, microsecond=0)
+    start = end - timedelta(minutes=interval_minutes * (steps - 1))
+    moments = [start + timedelta(minutes=interval_minutes * i) for i in range(steps)]
+    # Readings use ISO timestamps; alert_logs uses SQLite's datetime('now') format
+    reading_ts = [m.isoformat() for m in moments]
+    alert_ts = [m.strftime("%Y-%m-%d %H:%M:%S") for m in moments]
+    ack_before = end - timedelta(hours=active_alert_hours)
+    cooldown_steps = max(1, math.ceil(settings.alert_cooldown_minutes / interval_minutes))
+    
+    simulator = BinSimulator(steps, interval_minutes, start, rng)
+    
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    _tune(conn)
+    started = time.perf_counter()
+    index_sql = _drop_history_indexes(conn)
+    
+    readings = 0
+    alerts = 0
+    pending = 0
+    snapshots = []
+    conn.execute("BEGIN")
+    for n, b in enumerate(bins, 1):
+        weight, quantity = simulator.simulate(b["max_capacity"], b["min_threshold"], b["article_weight_grams"])
+        # About 1% of readings are lost to sensor or network gaps
+        kept = np.flatnonzero(rng.random(steps) >= 0.01)
+        conn.executemany(
+            "INSERT INTO inventory_data (bin_id, weight_grams, calculated_quantity, timestamp) VALUES (?, ?, ?, ?)",
+            zip(repeat(b["bin_id"]), weight[kept].tolist(), quantity[kept].tolist(), [reading_ts[i] for i in kept])
+        )
+        readings += len(kept)
+        pending += len(kept)
+        last = int(kept[-1])
+        snapshots.append((float(weight[last]), int(quantity[last]), reading_ts[last], b["bin_id"]))
+        
+        alert_rows = []
+        for alert_type, threshold in (("low_stock", b["min_threshold"]), ("critical_stock", b["critical_threshold"])):
+            for idx in alert_indexes(quantity, threshold, cooldown_steps):
+                qty = int(quantity[idx])
+                if alert_type == "low_stock":
+                    message = (f"Low stock alert: {b['article_name']} in {b['bin_id']} is at {qty} units "
+                               f"(threshold: {threshold})")
+                else:
+                    message = f"CRITICAL: {b['article_name']} in {b['bin_id']} is critically low at {qty} units"
+                acknowledged = moments[idx] < ack_before
+                ack_at = (moments[idx] + timedelta(minutes=int(rng.integers(5, 240)))).isoformat() if acknowledged else None
+                alert_rows.append((
+                    b["bin_id"], alert_type, message, qty, threshold,
+                    int(acknowledged), ack_at, "operator" if acknowledged else None, alert_ts[idx]
+                ))
+        conn.executemany(
+            """INSERT INTO alert_logs
+               (bin_id, alert_type, message, quantity_at_alert, threshold_value,
+                is_acknowledged, acknowledged_at, acknowledged_by, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            alert_rows
+        )
+        alerts += len(alert_rows)
+        pending += len(alert_rows)
+        
+        if pending >= COMMIT_EVERY_ROWS:
+            conn.execute("COMMIT")
+            conn.execute("BEGIN")
+            pending = 0
+            elapsed = time.perf_counter() - started
+            print(f"  {n}/{len(bins)} bins, {readings:,} readings, {alerts:,} alerts "
+                  f"({readings / elapsed * 60:,.0f} rows/min)", flush=True)
+    
+    conn.executemany(
+        """UPDATE current_inventory
+           SET weight_grams = ?, calculated_quantity = ?, last_updated = ?
+           WHERE bin_id = ?""",
+        snapshots
+    )
+    conn.execute("COMMIT")
+    insert_seconds = time.perf_counter() - started
+    
+    print("Rebuilding indexes...", flush=True)
+    for sql in index_sql:
+        conn.execute(sql)
+    conn.close()
+    
+    total_seconds = time.perf_counter() - started
+    return {
+        "bins": len(bins),
+        "readings": readings,
+        "alerts": alerts,
+        "insert_seconds": round(insert_seconds, 1),
+        "total_seconds": round(total_seconds, 1),
+        "rows_per_minute": round((readings + alerts) / insert_seconds * 60)
+    }
+
+
+async def prepare(bins: int, truncate: bool, seed: int) -> list[dict]:
+    """Create the schema, provision the layout and return every bin's configuration"""
+    await init_database()
+    try:
+        await run_migrations()
+        db = await get_database()
+        if truncate:
+            async with db.transaction():
+                for table in HISTORY_TABLES:
+                    await db.execute(f"DELETE FROM {table}")
+        if bins:
+            await provisioning_service.provision(build_layout(bins, np.random.default_rng(seed)))
+        return await db.fetch_all(
+            """SELECT bin_id, article_name, article_weight_grams, min_threshold, critical_threshold, max_capacity
+               FROM bin_configurations ORDER BY bin_id"""
+        )
+    finally:
+        await close_database()
+
+
+async def finish() -> None:
+    """Recompute statuses and summary counters, then refresh planner statistics"""
+    await init_database()
+    try:
+        db = await get_database()
+        await rebuild_inventory_summary(db)
+        await db.optimize(analyze=True)
+    finally:
+        await close_database()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk-generate synthetic inventory history")
+    parser.add_argument("--database", help="SQLite file (defaults to DATABASE_URL)")
+    parser.add_argument("--bins", type=int, default=1000, help="Bins to provision (0 uses existing bins only)")
+    parser.add_argument("--days", type=int, default=90, help="Days of history")
+    parser.add_argument("--interval-minutes", type=int, default=15, help="Minutes between readings per bin")
+    parser.add_argument("--active-alert-hours", type=float, default=24,
+                        help="Alerts newer than this stay unacknowledged")
+    parser.add_argument("--truncate", action="store_true", help="Delete existing history and alerts first")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    if args.database:
+        settings.database_url = args.database
+    if settings.use_d1:
+        sys.exit("The dataset generator writes to a local SQLite file; unset the D1 settings")
+    
+    bins = asyncio.run(prepare(args.bins, args.truncate, args.seed))
+    steps = int(args.days * 24 * 60 / args.interval_minutes)
+    print(f"Generating ~{len(bins) * steps:,} readings for {len(bins)} bins into {settings.database_url}", flush=True)
+    
+    result = generate(settings.database_url, bins, args.days, args.interval_minutes,
+                      args.active_alert_hours, args.seed)
+    asyncio.run(finish())
+    
+    print(f"Wrote {result['readings']:,} readings and {result['alerts']:,} alerts in {result['total_seconds']}s "
+          f"({result['rows_per_minute']:,} rows/min while inserting)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Bulk provision bins from a CSV or JSON warehouse layout.
+
+CSV layouts need a header row with at least ``bin_id,row,position``;
+optional columns are ``article_type``, ``article_name``,
+``article_weight_grams``, ``min_threshold``, ``critical_threshold`` and
+``max_capacity``. JSON layouts are a list of objects with the same keys
+(or ``{"bins": [...]}``).
+
+Usage (from the backend directory):
+    python -m tools.provision_bins layout.csv --dry-run
+    python -m tools.provision_bins layout.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from pathlib import Path
+
+from database import init_database, close_database, run_migrations
+from services import provisioning_service, LayoutValidationError
+
+
+async def run(path: Path, fmt: str, dry_run: bool) -> int:
+    entries = provisioning_service.parse_layout(path.read_bytes(), fmt)
+    
+    await init_database()
+    try:
+        await run_migrations()
+        report = await provisioning_service.provision(entries, dry_run=dry_run)
+    except LayoutValidationError as e:
+        print(json.dumps({"error": str(e), "errors": e.errors}, indent=2), file=sys.stderr)
+        return 1
+    finally:
+        await close_database()
+    
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk provision bins from a layout file")
+    parser.add_argument("layout", type=Path, help="CSV or JSON layout file")
+    parser.add_argument("--format", choices=["csv", "json"], help="Layout format (default: from file extension)")
+    parser.add_argument("--dry-run", action="store_true", help="Validate and report the diff without writing")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    
+    fmt = args.format or ("json" if args.layout.suffix.lower() == ".json" else "csv")
+    sys.exit(asyncio.run(run(args.layout, fmt, args.dry_run)))
+
+
+if __name__ == "__main__":
+    main()
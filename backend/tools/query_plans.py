@@ -0,0 +1,494 @@
+"""
+Query-plan check for hot service queries.
+
+Builds a throwaway SQLite database from schema.sql, fills it with a large
+alert and reading history, then runs each hot service call through an
+adapter that records ``EXPLAIN QUERY PLAN`` for every statement it issues.
+A check fails when a guarded table is read with a full scan or the
+expected index is not used, so an index or query change that silently
+reintroduces a table scan is caught before it ships.
+
+The adapter also counts virtual machine steps while each statement runs.
+Steps grow with the rows a statement visits, so at the reference data
+size every check has a step budget; a query that still uses its index
+but reads far more rows than before fails too. Budgets are only enforced
+at the default sizes; other sizes report steps without judging them.
+
+The same checks run under pytest as tests/test_query_plans.py.
+
+Usage (from the backend directory):
+    python -m tools.query_plans
+    python -m tools.query_plans --alert-rows 200000 --readings-per-bin 20000 --verbose
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import re
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import database.connection as connection
+from config import settings
+from database import SQLiteAdapter, rebuild_inventory_summary, run_migrations, seed_default_bins
+
+logger = logging.getLogger(__name__)
+
+_PLANNABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+# Reference data size the step budgets are calibrated against
+REFERENCE_ALERT_ROWS = 50_000
+REFERENCE_READINGS_PER_BIN = 5_000
+READING_INTERVAL_MINUTES = 10
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace so statements read on one line"""
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+class PlanRecordingAdapter(SQLiteAdapter):
+    """SQLite adapter that records the query plan of every statement it runs"""
+    
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self.records: list[dict] = []
+        self._ticks = 0
+    
+    async def count_steps(self) -> None:
+        """Count every VM instruction from now on; left off while populating to keep bulk loads fast"""
+        await self.connection.set_progress_handler(self._on_progress, 1)
+    
+    def _on_progress(self) -> int:
+        # Runs on the connection thread; returning 0 lets the statement continue
+        self._ticks += 1
+        return 0
+    
+    async def _record(self, sql: str, params: tuple = ()) -> Optional[dict]:
+        if not sql.lstrip().upper().startswith(_PLANNABLE):
+            return None
+        cursor = await self.connection.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        rows = await cursor.fetchall()
+        record = {"sql": normalize_sql(sql), "plan": [row[3] for row in rows], "steps": 0}
+        self.records.append(record)
+        return record
+    
+    async def _measured(self, sql: str, params: tuple, statement: Awaitable):
+        """Run a statement, recording its plan and the VM steps it took"""
+        record = await self._record(sql, params)
+        self._ticks = 0
+        result = await statement
+        if record is not None:
+            record["steps"] = self._ticks
+        return result
+    
+    async def execute(self, sql: str, params: tuple = ()) -> int:
+        return await self._measured(sql, params, super().execute(sql, params))
+    
+    async def execute_many(self, sql: str, params_list: list) -> int:
+        if not params_list:
+            return await super().execute_many(sql, params_list)
+        return await self._measured(sql, tuple(params_list[0]), super().execute_many(sql, params_list))
+    
+    async def fetch_one(self, sql: str, params: tuple = ()) -> Optional[dict]:
+        return await self._measured(sql, params, super().fetch_one(sql, params))
+    
+    async def fetch_all(self, sql: str, params: tuple = ()) -> list[dict]:
+        return await self._measured(sql, params, super().fetch_all(sql, params))
+    
+    async def fetch_rows(self, sql: str, params: tuple = ()) -> list[tuple]:
+        return await self._measured(sql, params, super().fetch_rows(sql, params))
+
+
+@dataclass
+class PlanCheck:
+    """A hot service call and the index each guarded table must use"""
+    name: str
+    call: Callable[[], Awaitable]
+    expected: dict[str, str]  # table -> index name that must appear in the plan
+    max_steps: Optional[int] = None  # VM step budget at the reference data size
+    records: list[dict] = field(default_factory=list)
+    failures: list[str] = field(default_factory=list)
+    
+    @property
+    def steps(self) -> int:
+        return sum(record["steps"] for record in self.records)
+
+
+def _table_aliases(sql: str, table: str) -> set[str]:
+    """Names a table can appear under in plan output (itself and any alias)"""
+    names = {table}
+    pattern = rf"\b(?:FROM|JOIN|UPDATE|INTO)\s+{table}\b(?:\s+(?:AS\s+)?(\w+))?"
+    for match in re.finditer(pattern, sql, re.IGNORECASE):
+        alias = match.group(1)
+        if alias and alias.upper() not in ("WHERE", "SET", "ORDER", "JOIN", "LEFT", "INNER", "ON", "VALUES", "LIMIT"):
+            names.add(alias)
+    return names
+
+
+def evaluate(check: PlanCheck, enforce_budgets: bool = True) -> None:
+    """Fill check.failures from the recorded plans and step counts"""
+    for table, index in check.expected.items():
+        touching = [r for r in check.records if re.search(rf"\b{table}\b", r["sql"])]
+        if not touching:
+            check.failures.append(f"no statement touched {table}")
+            continue
+        
+        index_used = False
+        for record in touching:
+            names = _table_aliases(record["sql"], table)
+            for line in record["plan"]:
+                match = re.match(r"(SCAN|SEARCH) (\w+)(.*)", line)
+                if not match or match.group(2) not in names:
+                    continue
+                if match.group(1) == "SCAN" and "USING" not in match.group(3):
+                    check.failures.append(f"full scan of {table}: {record['sql']}")
+                if index in line:
+                    index_used = True
+        
+        if not index_used:
+            check.failures.append(f"{table} did not use {index}")
+    
+    if enforce_budgets and check.max_steps is not None and check.steps > check.max_steps:
+        check.failures.append(f"took {check.steps} VM steps, budget is {check.max_steps}")
+
+
+async def populate(db: SQLiteAdapter, alert_rows: int, readings_per_bin: int, seed: int = 42) -> None:
+    """Fill the check database with reading history and a long, mostly acknowledged alert history"""
+    await run_migrations(db)
+    await seed_default_bins(db)
+    
+    rng = random.Random(seed)
+    bins = [row["bin_id"] for row in await db.fetch_all("SELECT bin_id FROM bin_configurations")]
+    
+    # One reading every READING_INTERVAL_MINUTES per bin, ending now
+    now = datetime.now()
+    readings = []
+    for bin_id in bins:
+        for i in range(readings_per_bin):
+            quantity = rng.randint(0, 100)
+            timestamp = now - timedelta(minutes=(readings_per_bin - 1 - i) * READING_INTERVAL_MINUTES)
+            readings.append((bin_id, quantity * 100.0, quantity, timestamp.isoformat()))
+    alert_types = ["low_stock", "critical_stock", "empty", "overfill"]
+    
+    rows = []
+    for i in range(alert_rows):
+        # Spread history over roughly two years; the newest 0.1% stay unacknowledged
+        minutes_ago = (alert_rows - i) * 5
+        acknowledged = i < alert_rows * 0.999
+        rows.append((
+            rng.choice(bins), rng.choice(alert_types), "synthetic alert",
+            rng.randint(0, 20), 10, 1 if acknowledged else 0, f"-{minutes_ago} minutes"
+        ))
+    
+    async with db.transaction():
+        await db.execute_many(
+            """INSERT INTO alert_logs
+               (bin_id, alert_type, message, quantity_at_alert, threshold_value, is_acknowledged, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, datetime('now', ?))""",
+            rows
+        )
+        await db.execute_many(
+            """INSERT INTO inventory_data (bin_id, weight_grams, calculated_quantity, timestamp)
+               VALUES (?, ?, ?, ?)""",
+            readings
+        )
+        # Point each bin's snapshot at its newest reading
+        await db.execute(
+            """INSERT OR REPLACE INTO current_inventory (bin_id, weight_grams, calculated_quantity, last_updated)
+               SELECT bin_id, weight_grams, calculated_quantity, MAX(timestamp)
+               FROM inventory_data GROUP BY bin_id"""
+        )
+        await rebuild_inventory_summary(db)
+    await db.execute("ANALYZE")
+
+
+def alert_checks() -> list[PlanCheck]:
+    """Hot AlertService queries and the index each must hit"""
+    from services import alert_service, inventory_service
+    
+    async def check_alerts():
+        bin_data = await inventory_service.get_bin_display_data("BIN-R1P1")
+        await alert_service.check_alerts(bin_data)
+    
+    return [
+        PlanCheck(
+            "cooldown lookup",
+            lambda: alert_service.is_in_cooldown("BIN-R1P1", "low_stock", 30),
+            {"alert_logs": "COVERING INDEX idx_alert_logs_cooldown"},
+            max_steps=50
+        ),
+        PlanCheck(
+            "recent alert",
+            lambda: alert_service.get_recent_alert("BIN-R1P1", "low_stock", 30),
+            {"alert_logs": "idx_alert_logs_cooldown"},
+            max_steps=60
+        ),
+        PlanCheck(
+            "check alerts",
+            check_alerts,
+            {"alert_configurations": "sqlite_autoindex_alert_configurations_1"},
+            max_steps=150
+        ),
+        PlanCheck(
+            "active alerts",
+            alert_service.get_active_alerts,
+            {"alert_logs": "idx_alert_logs_active"},
+            max_steps=2000
+        ),
+        PlanCheck(
+            "alert history",
+            lambda: alert_service.get_alert_history(1, 50),
+            {"alert_logs": "idx_alert_logs_created_at"},
+            max_steps=1500
+        ),
+        PlanCheck(
+            "alert history by bin",
+            lambda: alert_service.get_alert_history(1, 50, "BIN-R1P1"),
+            {"alert_logs": "idx_alert_logs_bin_created"},
+            max_steps=25000
+        ),
+        PlanCheck(
+            "acknowledge alert",
+            lambda: alert_service.acknowledge_alert(1),
+            {"alert_logs": "INTEGER PRIMARY KEY"},
+            max_steps=50
+        ),
+        PlanCheck(
+            "acknowledge all",
+            alert_service.acknowledge_all_alerts,
+            {"alert_logs": "idx_alert_logs_active"},
+            max_steps=3000
+        ),
+    ]
+
+
+def inventory_checks() -> list[PlanCheck]:
+    """Hot InventoryService, ForecastService, AggregationService and AnomalyService queries and the index each must hit"""
+    from models import BinConfigUpdate
+    from services import aggregation_service, anomaly_service, forecast_service, inventory_service
+    
+    now = datetime.now()
+    day_ago = (now - timedelta(days=1)).isoformat()
+    
+    return [
+        PlanCheck(
+            "bin configuration",
+            lambda: inventory_service.get_bin_configuration("BIN-R1P1"),
+            {"bin_configurations": "sqlite_autoindex_bin_configurations_1"},
+            max_steps=50
+        ),
+        PlanCheck(
+            "bin display data",
+            lambda: inventory_service.get_bin_display_data("BIN-R1P1"),
+            {
+                "bin_configurations": "sqlite_autoindex_bin_configurations_1",
+                "current_inventory": "sqlite_autoindex_current_inventory_1"
+            },
+            max_steps=75
+        ),
+        PlanCheck(
+            "current inventory",
+            inventory_service.get_current_inventory,
+            {"current_inventory": "sqlite_autoindex_current_inventory_1"},
+            max_steps=500
+        ),
+        PlanCheck(
+            "inventory summary",
+            inventory_service.get_inventory_summary,
+            {"inventory_summary": "INTEGER PRIMARY KEY"},
+            max_steps=30
+        ),
+        PlanCheck(
+            "record reading",
+            lambda: inventory_service.record_inventory_data("BIN-R1P1", 4200.0, 42, now.isoformat()),
+            {
+                "bin_configurations": "sqlite_autoindex_bin_configurations_1",
+                "current_inventory": "sqlite_autoindex_current_inventory_1",
+                "inventory_data": "idx_inventory_bin_timestamp",
+                "inventory_summary": "INTEGER PRIMARY KEY"
+            },
+            max_steps=300
+        ),
+        PlanCheck(
+            "record reading batch",
+            lambda: inventory_service.record_inventory_batch([
+                (f"BIN-R1P{i % 5 + 1}", 4000.0 + i, 40 + i, (now + timedelta(seconds=i)).isoformat(), f"seq:{i}")
+                for i in range(1, 51)
+            ]),
+            # bin_configurations is left unguarded: with ten seeded bins an IN
+            # list is cheaper to scan, and the planner switches to the index at fleet sizes
+            {
+                "current_inventory": "sqlite_autoindex_current_inventory_1",
+                "inventory_data": "idx_inventory_bin_timestamp",
+                "inventory_summary": "INTEGER PRIMARY KEY"
+            },
+            max_steps=7500
+        ),
+        PlanCheck(
+            "backfill baseline",
+            lambda: inventory_service.get_latest_timestamps([f"BIN-R1P{i}" for i in range(1, 6)]),
+            {"inventory_data": "idx_inventory_bin_timestamp"},
+            max_steps=500
+        ),
+        PlanCheck(
+            "anomaly window seed",
+            lambda: anomaly_service._recent_quantities("BIN-R1P1"),
+            {"inventory_data": "idx_inventory_bin_timestamp"},
+            max_steps=200
+        ),
+        PlanCheck(
+            "update thresholds",
+            lambda: inventory_service.update_bin_configuration("BIN-R1P1", BinConfigUpdate(min_threshold=12)),
+            {
+                "bin_configurations": "sqlite_autoindex_bin_configurations_1",
+                "current_inventory": "sqlite_autoindex_current_inventory_1"
+            },
+            max_steps=120
+        ),
+        PlanCheck(
+            "historical data",
+            lambda: inventory_service.get_historical_data("BIN-R1P1", day_ago, now.isoformat()),
+            {"inventory_data": "idx_inventory_bin_timestamp"},
+            max_steps=2500
+        ),
+        PlanCheck(
+            "all historical data",
+            lambda: inventory_service.get_all_historical_data(day_ago, now.isoformat()),
+            {"inventory_data": "idx_inventory_bin_timestamp"},
+            max_steps=20000
+        ),
+        PlanCheck(
+            "history aggregate",
+            lambda: aggregation_service.aggregate(
+                day_ago, now.isoformat(), "1h", "min,max,avg,last,count,consumption", bin_ids=["BIN-R1P1"]
+            ),
+            {"inventory_data": "idx_inventory_bin_timestamp"},
+            max_steps=40000
+        ),
+        PlanCheck(
+            "row stock aggregate",
+            lambda: aggregation_service.aggregate(
+                day_ago, now.isoformat(), "1h", "last,consumption", group_by="row", row=1
+            ),
+            {"inventory_data": "idx_inventory_bin_timestamp"},
+            max_steps=200000
+        ),
+        PlanCheck(
+            "consumption rate",
+            lambda: inventory_service.get_consumption_rate("BIN-R1P1"),
+            {"inventory_data": "idx_inventory_bin_timestamp"},
+            max_steps=40000
+        ),
+        PlanCheck(
+            "forecast load",
+            forecast_service.load,
+            {"inventory_data": "idx_inventory_bin_timestamp"},
+            max_steps=100000
+        ),
+        PlanCheck(
+            "retention purge",
+            lambda: inventory_service.cleanup_old_data(90),
+            {"inventory_data": "idx_inventory_timestamp"},
+            max_steps=50
+        ),
+    ]
+
+
+# Every check suite, as run by the CLI and by tests/test_query_plans.py
+CHECK_FACTORIES = [alert_checks, inventory_checks]
+
+
+async def run_checks(checks: list[PlanCheck], db: PlanRecordingAdapter, enforce_budgets: bool = True) -> None:
+    """Run each check's service call and evaluate the statements it issued"""
+    for check in checks:
+        start = len(db.records)
+        await check.call()
+        check.records = db.records[start:]
+        evaluate(check, enforce_budgets)
+
+
+def report(checks: list[PlanCheck], verbose: bool) -> int:
+    """Print results and return the number of failed checks"""
+    failed = 0
+    for check in checks:
+        status = "FAIL" if check.failures else "ok"
+        budget = f" / {check.max_steps}" if check.max_steps is not None else ""
+        print(f"[{status:>4}] {check.name:<28} {check.steps:>8} steps{budget}")
+        for failure in check.failures:
+            print(f"         - {failure}")
+        if verbose or check.failures:
+            for record in check.records:
+                print(f"         {record['sql']}  ({record['steps']} steps)")
+                for line in record["plan"]:
+                    print(f"           -> {line}")
+        failed += bool(check.failures)
+    return failed
+
+
+async def collect(
+    alert_rows: int,
+    readings_per_bin: int,
+    check_factories: list[Callable[[], list[PlanCheck]]]
+) -> list[PlanCheck]:
+    """Build and populate a throwaway database, then run and evaluate every check against it"""
+    enforce_budgets = (alert_rows, readings_per_bin) == (REFERENCE_ALERT_ROWS, REFERENCE_READINGS_PER_BIN)
+    # Checks measure the queries themselves, never a cached result
+    cache_enabled, settings.cache_enabled = settings.cache_enabled, False
+    
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = PlanRecordingAdapter(str(Path(tmp) / "plans.db"))
+            await db.connect()
+            previous, connection._db = connection._db, db
+            try:
+                await populate(db, alert_rows, readings_per_bin)
+                await db.count_steps()
+                checks = [check for factory in check_factories for check in factory()]
+                await run_checks(checks, db, enforce_budgets)
+            finally:
+                connection._db = previous
+                await db.disconnect()
+    finally:
+        settings.cache_enabled = cache_enabled
+    return checks
+
+
+async def run(
+    alert_rows: int,
+    readings_per_bin: int,
+    verbose: bool,
+    check_factories: list[Callable[[], list[PlanCheck]]]
+) -> int:
+    checks = await collect(alert_rows, readings_per_bin, check_factories)
+    
+    failed = report(checks, verbose)
+    print(f"\n{len(checks) - failed}/{len(checks)} query plan checks passed")
+    if (alert_rows, readings_per_bin) != (REFERENCE_ALERT_ROWS, REFERENCE_READINGS_PER_BIN):
+        print("Step budgets not enforced: data size differs from the reference size")
+    return 1 if failed else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Verify hot queries use their indexes")
+    parser.add_argument(
+        "--alert-rows", type=int, default=REFERENCE_ALERT_ROWS, help="Alert history rows to generate"
+    )
+    parser.add_argument(
+        "--readings-per-bin", type=int, default=REFERENCE_READINGS_PER_BIN,
+        help="Inventory readings to generate per bin"
+    )
+    parser.add_argument("--verbose", action="store_true", help="Print every statement and plan")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.ERROR)
+    sys.exit(asyncio.run(run(args.alert_rows, args.readings_per_bin, args.verbose, CHECK_FACTORIES)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,13 @@
 import asyncio
 import json
 import logging
+import time
 from typing import Set
 from datetime import datetime
 from fastapi import WebSocket, WebSocketDisconnect
 
-from models import BinDisplayData, AlertLog, WSMessageType
+from models import BinDisplayData, AlertLog, QuarantinedReading, WSMessageType
+from monitoring import WS_BROADCAST_SECONDS, WS_BROADCAST_CLIENTS, traced, current_span
 
 logger = logging.getLogger(__name__)
 
@@ -55,6 +57,14 @@ class ConnectionManager:
             return
         
         disconnected = set()
+        start = time.perf_counter()
+        clients = len(self.active_connections)
+        
+        # Clients can link what they render back to the trace that caused it
+        span = current_span()
+        if span:
+            span.set_attribute("ws.clients", clients)
+            message["traceparent"] = span.traceparent
         
         async with self._lock:
             for connection in self.active_connections:
@@ -64,11 +74,15 @@ class ConnectionManager:
                     logger.warning(f"Failed to send to client: {e}")
                     disconnected.add(connection)
         
+        WS_BROADCAST_SECONDS.observe(time.perf_counter() - start, message.get("type", "unknown"))
+        WS_BROADCAST_CLIENTS.observe(clients)
+        
         # Remove disconnected clients
         if disconnected:
             async with self._lock:
                 self.active_connections -= disconnected
     
+    @traced("ws.broadcast_bin_update")
     async def broadcast_bin_update(self, bin_data: BinDisplayData) -> None:
         """Broadcast bin update to all clients"""
         message = {
@@ -79,6 +93,7 @@ class ConnectionManager:
         await self.broadcast(message)
         logger.debug(f"Broadcasted bin update for {bin_data.bin_id}")
     
+    @traced("ws.broadcast_alert")
     async def broadcast_alert(self, alert: AlertLog) -> None:
         """Broadcast alert to all clients"""
         message = {
@@ -89,6 +104,17 @@ class ConnectionManager:
         await self.broadcast(message)
         logger.info(f"Broadcasted alert: {alert.alert_type} for {alert.bin_id}")
     
+    @traced("ws.broadcast_anomaly")
+    async def broadcast_anomaly(self, reading: QuarantinedReading) -> None:
+        """Broadcast a flagged sensor reading to all clients"""
+        message = {
+            "type": WSMessageType.ANOMALY.value,
+            "payload": reading.model_dump(),
+            "timestamp": datetime.now().isoformat()
+        }
+        await self.broadcast(message)
+        logger.debug(f"Broadcasted anomaly for {reading.bin_id}")
+    
     def get_connection_count(self) -> int:
         """Get number of active connections"""
         return len(self.active_connections)
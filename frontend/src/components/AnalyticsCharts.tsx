@@ -19,6 +19,9 @@ import { analyticsApi, binsApi } from '../services/api';
 import { BinDisplayData, StatusDistribution, HistoricalDataPoint } from '../types';
 import { getDaysAgoISO, getTodayISO } from '../utils/helpers';
 
+// The trend chart is a few hundred pixels wide; the server keeps each bucket's min and max
+const CHART_MAX_POINTS = 500;
+
 interface AnalyticsChartsProps {
   bins: BinDisplayData[];
 }
@@ -41,7 +44,8 @@ export const AnalyticsCharts: React.FC<AnalyticsChartsProps> = ({ bins }) => {
         const historyResponse = await binsApi.getHistory(
           selectedBin,
           getDaysAgoISO(7),
-          getTodayISO()
+          getTodayISO(),
+          CHART_MAX_POINTS
         );
         if (historyResponse.success) {
           setHistoricalData(historyResponse.data as HistoricalDataPoint[]);
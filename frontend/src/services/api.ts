@@ -44,10 +44,14 @@ export const binsApi = {
       body: JSON.stringify(config),
     }),
   
-  getHistory: (binId: string, startDate: string, endDate: string) =>
-    fetchApi<{ success: boolean; data: unknown[] }>(
-      `/bins/${binId}/history?start_date=${startDate}&end_date=${endDate}`
-    ),
+  getHistory: (binId: string, startDate: string, endDate: string, maxPoints?: number) => {
+    const params = new URLSearchParams({ start_date: startDate, end_date: endDate });
+    if (maxPoints) {
+      params.append('limit', '10000');
+      params.append('max_points', String(maxPoints));
+    }
+    return fetchApi<{ success: boolean; data: unknown[] }>(`/bins/${binId}/history?${params}`);
+  },
   
   getConsumption: (binId: string) =>
     fetchApi<{ success: boolean; data: unknown }>(`/bins/${binId}/consumption`),
@@ -94,10 +98,11 @@ export const alertsApi = {
 
 // Analytics API
 export const analyticsApi = {
-  getTrends: (startDate: string, endDate: string) =>
-    fetchApi<{ success: boolean; data: unknown[] }>(
-      `/analytics/trends?start_date=${startDate}&end_date=${endDate}`
-    ),
+  getTrends: (startDate: string, endDate: string, maxPoints?: number) => {
+    const params = new URLSearchParams({ start_date: startDate, end_date: endDate });
+    if (maxPoints) params.append('max_points', String(maxPoints));
+    return fetchApi<{ success: boolean; data: unknown[] }>(`/analytics/trends?${params}`);
+  },
   
   getConsumption: () =>
     fetchApi<{ success: boolean; data: unknown[] }>('/analytics/consumption'),